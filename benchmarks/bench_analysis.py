@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from signals import analysis
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+
+def queries(signals):
+    # Name and function of every query timed.
+    pxl = signals["PXL_CLK"]
+    tc = signals["TC"]
+    yield "edges", lambda: analysis.edges(pxl, "HIGH")
+    yield "min_pulse_width", lambda: analysis.min_pulse_width(pxl)
+    yield "glitches", lambda: analysis.glitches(pxl, 20)
+    yield "edge_to_edge", lambda: analysis.edge_to_edge(
+        pxl, tc, 100, "HIGH", "HIGH")
+    yield "setup_hold", lambda: analysis.setup_hold(
+        signals["CHAR"], signals["CHR_CLK"])
+    yield "state_at", lambda: analysis.state_at(
+        tc, analysis.edges(pxl, "HIGH"))
+    yield "cause_latencies", lambda: analysis.cause_latencies(
+        signals["CHAR"], "MA")
+    yield "assert_causality", lambda: analysis.assert_causality(signals)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the analysis queries over long histories.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, nargs="*",
+                        default=[10**6, 10**7, 10**8])
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+
+    for until_time in args.time:
+        sc = SignalCollection(periodic=True)
+        for signal in deserialize(data["signals"]):
+            sc.add(signal)
+        sc.compile()
+        sc.run(until_time)
+        edges = len(sc.all["PXL_CLK"].history) - 1
+        print(f"time {until_time:.0f}, {edges} PXL_CLK edges")
+        for name, query in queries(sc.all):
+            start = time.perf_counter()
+            query()
+            print(f"  {name:<18} {(time.perf_counter() - start) * 1e3:>9.1f} ms")
+        del sc
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from canvas import Canvas
+from signals.causes import CauseTable
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+
+def loop_lines(canvas, causes):
+    # Cause lines as found by going through every _Cause, for comparison.
+    first, last = canvas._get_range()
+    starts = canvas.get_starts()
+    cause_lines = []
+    for cause in causes:
+        name, time = cause.event
+        if name not in starts:
+            continue
+        if time >= last or time < first:
+            continue
+        end_x = (time - first) * canvas.time_multiplier + canvas.h_spacing
+        end_y = starts[name] + canvas.height/2
+        for d_name, d_time in cause.dependencies.items():
+            if d_name not in starts:
+                continue
+            start_x = ((d_time - first) * canvas.time_multiplier +
+                       canvas.h_spacing)
+            start_y = starts[d_name] + canvas.height/2
+            cause_lines.append([start_x, start_y, end_x, end_y])
+    return cause_lines
+
+
+def add_causes(table, signals):
+    for signal in signals:
+        table.add(signal.name, signal.causes)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the cause table with a list of _Causes for "
+                    "memory and for finding the cause lines to draw.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, nargs="*",
+                        default=[10**5, 10**6, 10**7])
+    parser.add_argument("--window", type=float, default=0.01,
+                        help="part of the run drawn by the windowed render")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+
+    print(f"{'time':>10} {'rows':>9} {'list MB':>8} {'table MB':>9} "
+          f"{'add ms':>8} {'loop ms':>8} {'full ms':>8} {'window ms':>10}")
+    for until_time in args.time:
+        sc = SignalCollection(periodic=True)
+        signals = deserialize(data["signals"])
+        for signal in signals:
+            sc.add(signal)
+        sc.run(until_time)
+        shown = [signal for signal in signals
+                 if signal.visible and signal.show_cause]
+
+        tracemalloc.start()
+        causes = [cause.shifted(0) for signal in shown
+                  for cause in signal.causes]
+        list_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        canvas = Canvas(data["canvas"])
+        for signal in signals:
+            if signal.visible:
+                canvas.signals.append((signal.name, signal.history))
+                age, _ = signal.history[-1]
+                canvas.oldest = max(canvas.oldest or 0, age)
+        table = CauseTable()
+        add, _ = timed(add_causes, table, shown)
+        table_bytes = sum(column.nbytes for column in table.get_columns())
+        canvas.causes = table
+
+        loop, expected = timed(loop_lines, canvas, causes)
+        table.between(0, 0)
+        full, lines = timed(canvas.get_cause_lines)
+        assert lines == expected
+        canvas.window_start = until_time * (1 - args.window) / 2
+        canvas.window_end = until_time * (1 + args.window) / 2
+        window, _ = timed(canvas.get_cause_lines)
+        print(f"{until_time:>10.0f} {len(table):>9} {list_bytes / 1e6:>8.1f} "
+              f"{table_bytes / 1e6:>9.1f} {add * 1e3:>8.1f} "
+              f"{loop * 1e3:>8.1f} {full * 1e3:>8.1f} {window * 1e3:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
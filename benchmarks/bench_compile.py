@@ -0,0 +1,72 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+
+def scale(signals, copies):
+    # `copies` independent copies of the signals, renamed with a suffix.
+    scaled = []
+    for copy in range(copies):
+        names = {data["name"]: f"{data['name']}_{copy}" for data in signals}
+        for data in signals:
+            data = dict(data, name=names[data["name"]])
+            if "dependencies" in data:
+                data["dependencies"] = [names[name]
+                                        for name in data["dependencies"]]
+            if "true_state" in data:
+                data["true_state"] = {names[name]: state for name, state
+                                      in data["true_state"].items()}
+            scaled.append(data)
+    return scaled
+
+
+def simulate(signals, until_time, compiled):
+    signals = deserialize(signals)
+    sc = SignalCollection()
+    for signal in signals:
+        sc.add(signal)
+    if compiled:
+        sc.compile()
+    start = time.perf_counter()
+    stats = sc.run(until_time)
+    return signals, stats.events, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the event loop with and without compiling "
+                    "the SignalCollection.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--copies", type=int, nargs="*",
+                        default=[1, 10, 50])
+    parser.add_argument("--time", type=float, default=10**5)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+
+    print(f"{'signals':>8} {'events':>9} {'plain us':>9} {'compiled us':>12} "
+          f"{'speedup':>8} {'same':>5}")
+    for copies in args.copies:
+        signals = scale(data["signals"], copies)
+        plain, events, plain_s = simulate(signals, args.time, False)
+        compiled, _, compiled_s = simulate(signals, args.time, True)
+        same = all(a.history == b.history for a, b in zip(plain, compiled))
+        print(f"{len(signals):>8} {events:>9} "
+              f"{plain_s / events * 1e6:>9.3f} "
+              f"{compiled_s / events * 1e6:>12.3f} "
+              f"{plain_s / compiled_s:>8.2f} {str(same):>5}")
+
+
+if __name__ == "__main__":
+    main()
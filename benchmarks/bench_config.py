@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench_compile import scale
+from signals.schema import load
+
+
+def best(function, repeats):
+    elapsed = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed.append(time.perf_counter() - start)
+    return min(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare loading a config with and without the cache.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--copies", type=int, nargs="*",
+                        default=[10, 100, 1000, 5000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+
+    print(f"{'signals':>8} {'MB':>6} {'parse ms':>9} {'cached ms':>10} "
+          f"{'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "config.json")
+        cache_dir = os.path.join(directory, "cache")
+        for copies in args.copies:
+            signals = scale(data["signals"], copies)
+            with open(filename, "w") as json_file:
+                json.dump(dict(data, signals=signals), json_file)
+            parsed = best(lambda: load(filename), args.repeats)
+            load(filename, cache_dir)
+            cached = best(lambda: load(filename, cache_dir), args.repeats)
+            size = os.path.getsize(filename) / 10**6
+            print(f"{len(signals):>8} {size:>6.1f} {parsed * 1e3:>9.1f} "
+                  f"{cached * 1e3:>10.1f} {parsed / cached:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
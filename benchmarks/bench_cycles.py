@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+
+def simulate(signals, until_time, cycles):
+    sc = SignalCollection(cycles=cycles)
+    for signal in deserialize(signals):
+        sc.add(signal)
+    sc.compile()
+    start = time.perf_counter()
+    stats = sc.run(until_time)
+    return sc, stats.events, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare simulating every event with copying periods "
+                    "once the collection repeats itself.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, nargs="*",
+                        default=[10**4, 10**5, 10**6, 10**7])
+    parser.add_argument("--grid", action="store_true",
+                        help="round ticker periods to whole numbers, as "
+                             "periods are only copied when times are exact")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+    if args.grid:
+        for signal in data["signals"]:
+            if "frequency" in signal:
+                signal["period"] = round(1 / signal.pop("frequency"))
+            elif "period" in signal:
+                signal["period"] = round(signal["period"])
+
+    print(f"{'time':>10} {'events':>9} {'plain s':>8} {'cycles s':>9} "
+          f"{'speedup':>8} {'period':>9} {'max diff':>9}")
+    for until_time in args.time:
+        plain, events, plain_s = simulate(data["signals"], until_time, False)
+        cyclic, _, cyclic_s = simulate(data["signals"], until_time, True)
+        diff = max((abs(a[0] - b[0]) for x, y in zip(
+            plain.all.values(), cyclic.all.values())
+            for a, b in zip(x.history[1:], y.history[1:])), default=0)
+        period = cyclic.cycle[1] if cyclic.cycle else 0
+        print(f"{until_time:>10.0f} {events:>9} {plain_s:>8.3f} "
+              f"{cyclic_s:>9.3f} {plain_s / cyclic_s:>8.1f} {period:>9.2f} "
+              f"{diff:>9.2g}")
+
+
+if __name__ == "__main__":
+    main()
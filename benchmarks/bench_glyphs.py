@@ -0,0 +1,66 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import glyphs
+from canvas import Canvas
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+
+def simulate(data, until_time):
+    signals = deserialize(data["signals"])
+    sc = SignalCollection(periodic=True)
+    for signal in signals:
+        sc.add(signal)
+    sc.run(until_time)
+    return signals
+
+
+def batch(data, signals, count, cold):
+    start = time.perf_counter()
+    for _ in range(count):
+        if cold:
+            glyphs.cache_clear()
+        cvs = Canvas(data["canvas"])
+        for signal in signals:
+            cvs.add_signal(signal)
+        cvs.render()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time batches of small diagrams with cold and warm "
+                    "font and label caches.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, default=600)
+    parser.add_argument("--count", type=int, default=1000)
+    args = parser.parse_args()
+
+    # Font paths in the configs are relative to the repository root.
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+    signals = simulate(data, args.time)
+
+    cold = batch(data, signals, args.count, cold=True)
+    glyphs.cache_clear()
+    warm = batch(data, signals, args.count, cold=False)
+    print(f"{args.count} diagrams: cold {cold:.3f}s "
+          f"({cold / args.count * 1000:.2f} ms each), warm {warm:.3f}s "
+          f"({warm / args.count * 1000:.2f} ms each), "
+          f"{cold / warm:.1f}x")
+    for name, info in glyphs.cache_info().items():
+        print(f"{name:>10}: {info.hits} hits, {info.misses} misses, "
+              f"{info.currsize}/{info.maxsize} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from signals import utils
+from signals.json import deserialize
+from signals.utils import SignalCollection, SignalHeap, CalendarQueue
+
+QUEUES = {"heap": SignalHeap, "calendar": CalendarQueue}
+
+
+def clocks(queue, count, operations):
+    # `count` clocks with periods on a grid of 1, each popped and pushed
+    # back half a period later, as the event loop does with tickers.
+    rng = random.Random(0)
+    periods = [rng.randint(1, 32) * 2 for _ in range(count)]
+    signals = list(range(count))
+    for signal in signals:
+        queue.add_signal(signal, periods[signal] / 2)
+    start = time.perf_counter()
+    for _ in range(operations):
+        at, signal = queue.pop_signal()
+        queue.add_signal(signal, at + periods[signal] / 2)
+    return time.perf_counter() - start
+
+
+def reschedule(queue, count, operations):
+    # Every pop moves ten other entries, leaving REMOVED entries behind.
+    rng = random.Random(0)
+    signals = list(range(count))
+    for signal in signals:
+        queue.add_signal(signal, rng.randint(1, 1000))
+    high_water = len(queue)
+    start = time.perf_counter()
+    for _ in range(operations):
+        at, signal = queue.pop_signal()
+        queue.add_signal(signal, at + rng.randint(1, 1000))
+        for moved in rng.sample(signals, min(10, count)):
+            if moved in queue.entry_finder:
+                queue.add_signal(moved, at + rng.randint(1, 1000))
+        high_water = max(high_water, len(queue))
+    return time.perf_counter() - start, high_water
+
+
+def simulate(count, until_time, queue):
+    signals = [{"type": "ticker", "name": f"CLK{index}",
+                "period": 2 * (index % 16 + 1)} for index in range(count)]
+    sc = SignalCollection(queue=queue)
+    for signal in deserialize(signals):
+        sc.add(signal)
+    sc.compile()
+    stats = sc.run(until_time)
+    return stats.events, stats.elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the event queues on clock-heavy workloads and "
+                    "the heap with and without compaction.")
+    parser.add_argument("--sizes", type=int, nargs="*",
+                        default=[10, 1000, 100000])
+    parser.add_argument("--operations", type=int, default=10**6)
+    args = parser.parse_args()
+
+    print("pop and push of clock edges, operations/s")
+    print(f"{'pending':>8} " + " ".join(f"{name:>10}" for name in QUEUES))
+    for size in args.sizes:
+        rates = [args.operations / clocks(cls(), size, args.operations)
+                 for cls in QUEUES.values()]
+        print(f"{size:>8} " + " ".join(f"{rate:>10.0f}" for rate in rates))
+
+    print("\nsimulated tickers, events/s")
+    print(f"{'signals':>8} " + " ".join(f"{name:>10}" for name in QUEUES))
+    for size in args.sizes:
+        until_time = 2 * args.operations / size
+        rates = []
+        for queue in QUEUES:
+            events, elapsed = simulate(size, until_time, queue)
+            rates.append(events / elapsed)
+        print(f"{size:>8} " + " ".join(f"{rate:>10.0f}" for rate in rates))
+
+    print("\nrescheduling, operations/s and largest heap")
+    print(f"{'pending':>8} {'compact':>10} {'size':>10} {'plain':>10} "
+          f"{'size':>10}")
+    compact_min = utils.COMPACT_MIN
+    for size in args.sizes:
+        operations = args.operations // 10
+        row = []
+        for limit in (compact_min, float("inf")):
+            utils.COMPACT_MIN = limit
+            elapsed, high_water = reschedule(SignalHeap(), size, operations)
+            row += [operations / elapsed, high_water]
+        utils.COMPACT_MIN = compact_min
+        print(f"{size:>8} {row[0]:>10.0f} {row[1]:>10} {row[2]:>10.0f} "
+              f"{row[3]:>10}")
+
+
+if __name__ == "__main__":
+    main()
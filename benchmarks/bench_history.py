@@ -0,0 +1,53 @@
+import argparse
+import sys
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from signals.history import History
+from signals.signal import Signal
+
+STATES = [Signal.LOW, Signal.HIGH]
+
+
+def _tuple_list(edges):
+    history = [(None, Signal.LOW)]
+    for i in range(edges):
+        history.append((i * 19.86, STATES[i & 1]))
+    return history
+
+
+def _history(edges):
+    history = History(Signal.LOW)
+    for i in range(edges):
+        history.add(i * 19.86, STATES[i & 1])
+    return history
+
+
+def measure(build, edges):
+    tracemalloc.start()
+    history = build(edges)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del history
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare Signal.history memory use per stored edge.")
+    parser.add_argument("sizes", nargs="*", type=int,
+                        default=[10**6, 10**7])
+    args = parser.parse_args()
+
+    print(f"{'edges':>10} {'store':>8} {'MiB':>10} {'bytes/edge':>11}")
+    for edges in args.sizes:
+        for label, build in (("tuples", _tuple_list), ("History", _history)):
+            size = measure(build, edges)
+            print(f"{edges:>10} {label:>8} {size / 2**20:>10.1f} "
+                  f"{size / edges:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from canvas import Canvas
+from live import LiveRenderer
+from main import simulate
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the frames of a live render against rendering "
+                    "the whole diagram, as the run gets longer.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, nargs="*",
+                        default=[10**5, 10**6])
+    parser.add_argument("--steps", type=int, default=1000)
+    parser.add_argument("--time-multiplier", type=float, default=0.01)
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+    data["canvas"] = dict(data["canvas"], output=None,
+                          time_multiplier=args.time_multiplier)
+
+    print(f"{'time':>10} {'frames':>7} {'frame ms':>9} {'last 10% ms':>12} "
+          f"{'full render ms':>15}")
+    for until_time in args.time:
+        data["time"] = until_time
+        canvas = Canvas(data["canvas"])
+        live = LiveRenderer(canvas, {"fps": 10**6, "steps": args.steps})
+        elapsed = []
+        frame = live.frame
+
+        def timed_frame():
+            start = time.perf_counter()
+            frame()
+            elapsed.append(time.perf_counter() - start)
+        live.frame = timed_frame
+        simulate(data, run=live.run)
+
+        full = Canvas(data["canvas"])
+        full.signals = canvas.signals
+        full.causes = canvas.causes
+        full.oldest = canvas.oldest
+        start = time.perf_counter()
+        full.render()
+        rendered = time.perf_counter() - start
+        assert full.image.tobytes() == canvas.image.tobytes()
+
+        tail = elapsed[-max(1, len(elapsed) // 10):]
+        print(f"{until_time:>10.0f} {live.frames:>7} "
+              f"{sum(elapsed) / len(elapsed) * 1e3:>9.2f} "
+              f"{sum(tail) / len(tail) * 1e3:>12.2f} {rendered * 1e3:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+
+def decoders(width, count):
+    # `count` parameters, each over the same `width` clocks, waiting for a
+    # different combination of them.
+    signals = [{"type": "ticker", "name": f"IN{index}",
+                "period": 2 + index / width} for index in range(width)]
+    for decoder in range(count):
+        signals.append({"type": "parameter", "name": f"DEC{decoder}",
+                        "delay": 1, "show_cause": False,
+                        "true_state": {
+                            f"IN{index}": ("HIGH" if (decoder >> index) & 1
+                                           else "LOW")
+                            for index in range(width)}})
+    return signals
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure parameter evaluation against the number of "
+                    "inputs.")
+    parser.add_argument("--widths", type=int, nargs="*",
+                        default=[2, 8, 32, 128])
+    parser.add_argument("--parameters", type=int, default=100)
+    parser.add_argument("--evaluations", type=float, default=10**6)
+    args = parser.parse_args()
+
+    print(f"{'width':>6} {'events':>8} {'evaluations':>12} "
+          f"{'evaluations/s':>14}")
+    for width in args.widths:
+        sc = SignalCollection()
+        for signal in deserialize(decoders(width, args.parameters)):
+            sc.add(signal)
+        sc.compile()
+        # Every input edge is one evaluation of every parameter.
+        until_time = args.evaluations / args.parameters / width
+        stats = sc.run(until_time)
+        evaluations = sum(len(sc.all[f"IN{index}"].history) - 1
+                          for index in range(width)) * args.parameters
+        print(f"{width:>6} {stats.events:>8} {evaluations:>12} "
+              f"{evaluations / stats.elapsed:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
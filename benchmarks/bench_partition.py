@@ -0,0 +1,101 @@
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from signals.json import deserialize
+from signals.partition import PartitionedCollection
+from signals.utils import SignalCollection
+
+
+def domain(signals, number):
+    # A copy of the signals with their own names and clock.
+    signals = copy.deepcopy(signals)
+    for signal in signals:
+        signal["name"] = f"{signal['name']}_{number}"
+        if "dependencies" in signal:
+            signal["dependencies"] = [f"{name}_{number}"
+                                      for name in signal["dependencies"]]
+        if "true_state" in signal:
+            signal["true_state"] = {f"{name}_{number}": state for name, state
+                                    in signal["true_state"].items()}
+        if "frequency" in signal:
+            signal["frequency"] *= 1 + number / 7
+    return signals
+
+
+def coupled(signals, count, delay):
+    # A counter in every domain but the first, triggered by the one before.
+    for number in range(1, count):
+        signals.append({"type": "counter", "name": f"SYNC_{number}",
+                        "dependencies": [f"CHR_CLK_{number - 1}"],
+                        "old_state_trigger": "HIGH",
+                        "new_state_trigger": "LOW",
+                        "delay": delay})
+        signals.append({"type": "counter", "name": f"SYNC_CNT_{number}",
+                        "dependencies": [f"SYNC_{number}", f"CNT_1_{number}"]})
+    return [f"SYNC_{number}" for number in range(1, count)]
+
+
+def timed(sc, signals, until_time):
+    for signal in deserialize(signals):
+        sc.add(signal)
+    sc.compile()
+    start = time.perf_counter()
+    stats = sc.run(until_time)
+    return stats.events, time.perf_counter() - start
+
+
+def histories(sc):
+    return [(signal.name, signal.history.times, signal.history.codes)
+            for signal in sc.all.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare one collection with a partitioned one, a "
+                    "domain per copy of the config's signals, as the "
+                    "number of workers grows.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--domains", type=int, default=8)
+    parser.add_argument("--time", type=float, default=10**6)
+    parser.add_argument("--workers", type=int, nargs="*",
+                        default=[1, 2, 4, 8])
+    parser.add_argument("--delay", type=float,
+                        help="couple the domains by counters with this delay")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+    signals = []
+    for number in range(args.domains):
+        signals += domain(data["signals"], number)
+    boundaries = ()
+    if args.delay is not None:
+        boundaries = coupled(signals, args.domains, args.delay)
+
+    sc = SignalCollection()
+    events, single = timed(sc, signals, args.time)
+    expected = histories(sc)
+    print(f"{os.cpu_count()} CPUs, {args.domains} domains, {events} events")
+    print(f"{'workers':>8} {'windows':>8} {'s':>8} {'speedup':>8}")
+    print(f"{'-':>8} {'-':>8} {single:>8.3f} {1:>8.2f}")
+    for workers in args.workers:
+        sc = PartitionedCollection(workers=workers, boundaries=boundaries)
+        _, elapsed = timed(sc, signals, args.time)
+        assert histories(sc) == expected
+        windows = (int(-(-args.time // sc.lookahead)) if sc.lookahead
+                   else 1)
+        print(f"{workers:>8} {windows:>8} {elapsed:>8.3f} "
+              f"{single / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from canvas import Canvas
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+
+def simulate(data, until_time):
+    signals = deserialize(data["signals"])
+    sc = SignalCollection(periodic=True)
+    for signal in signals:
+        sc.add(signal)
+    sc.run(until_time)
+    return signals
+
+
+def render(data, signals, polyline):
+    cvs = Canvas(dict(data["canvas"], polyline=polyline))
+    for signal in signals:
+        cvs.add_signal(signal)
+    start = time.perf_counter()
+    cvs.render()
+    return time.perf_counter() - start, cvs.image
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare per-segment and polyline Canvas rendering.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, nargs="*",
+                        default=[10**4, 10**5, 10**6])
+    args = parser.parse_args()
+
+    # Font paths in the configs are relative to the repository root.
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+
+    print(f"{'time':>10} {'edges':>9} {'segments s':>11} "
+          f"{'polyline s':>11} {'speedup':>8} {'identical':>10}")
+    for until_time in args.time:
+        signals = simulate(data, until_time)
+        edges = sum(len(signal.history) - 1 for signal in signals
+                    if signal.visible)
+        segments, expected = render(data, signals, polyline=False)
+        polyline, actual = render(data, signals, polyline=True)
+        identical = expected.tobytes() == actual.tobytes()
+        print(f"{until_time:>10.0f} {edges:>9} {segments:>11.3f} "
+              f"{polyline:>11.3f} {segments / polyline:>7.1f}x "
+              f"{str(identical):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from service import RenderService, ResultCache
+
+
+async def batches(filenames, cache_dir, workers, changed):
+    # A cold batch, then the same batch with `changed` configs edited.
+    async with RenderService(ResultCache(cache_dir), workers,
+                             config_cache=None) as service:
+        _, cold = await service.render_batch(filenames)
+        for filename in filenames[:changed]:
+            with open(filename) as json_file:
+                data = json.load(json_file)
+            data["signals"][0]["frequency"] *= 1.01
+            with open(filename, "w") as json_file:
+                json.dump(data, json_file)
+        _, warm = await service.render_batch(filenames)
+    return cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render a batch of configs cold, then again with some "
+                    "of them changed.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--configs", type=int, default=200)
+    parser.add_argument("--unique", type=int, default=50)
+    parser.add_argument("--changed", type=int, default=10)
+    parser.add_argument("--time", type=float, default=10**4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        base = json.load(json_file)
+    base["time"] = args.time
+    with tempfile.TemporaryDirectory() as directory:
+        filenames = []
+        for index in range(args.configs):
+            data = json.loads(json.dumps(base))
+            data["signals"][0]["frequency"] = (
+                0.02 + 0.0001 * (index % args.unique))
+            data["canvas"]["output"] = os.path.join(directory,
+                                                    f"{index}.png")
+            filename = os.path.join(directory, f"{index}.json")
+            with open(filename, "w") as json_file:
+                json.dump(data, json_file)
+            filenames.append(filename)
+        cold, warm = asyncio.run(batches(
+            filenames, os.path.join(directory, "cache"), args.workers,
+            args.changed))
+    print(f"cold: {cold}")
+    print(f"warm: {warm}")
+
+
+if __name__ == "__main__":
+    main()
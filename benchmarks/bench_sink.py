@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from signals.json import deserialize
+from signals.sink import HistorySink
+from signals.utils import SignalCollection
+
+
+def simulate(data, until_time, periodic, directory=None):
+    signals = deserialize(data["signals"])
+    sink = None if directory is None else HistorySink(directory)
+    sc = SignalCollection(periodic=periodic, sink=sink)
+    for signal in signals:
+        sc.add(signal)
+    tracemalloc.start()
+    start = time.perf_counter()
+    stats = sc.run(until_time)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if sink is not None:
+        sink.close()
+    return signals, stats.events, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare simulation memory with and without a "
+                    "HistorySink.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, nargs="*",
+                        default=[10**4, 10**5, 10**6])
+    parser.add_argument("--periodic", action="store_true")
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+
+    print(f"{'time':>10} {'events':>10} {'store':>7} {'peak MiB':>9} "
+          f"{'run s':>7} {'disk MiB':>9} {'query s':>8}")
+    for until_time in args.time:
+        with tempfile.TemporaryDirectory() as directory:
+            for label, sink in (("memory", None), ("sink", directory)):
+                signals, events, elapsed, peak = simulate(
+                    data, until_time, args.periodic, sink)
+                disk = 0.0
+                if sink is not None:
+                    disk = sum(entry.stat().st_size
+                               for entry in os.scandir(directory)) / 2**20
+                # A query in the middle of the run, touching only a few
+                # pages of the mapped files.
+                start = time.perf_counter()
+                for signal in signals:
+                    signal.history.value_at(until_time / 2)
+                    signal.history.slice(until_time / 2,
+                                         until_time / 2 + 100)
+                query = time.perf_counter() - start
+                print(f"{until_time:>10.0f} {events:>10} {label:>7} "
+                      f"{peak / 2**20:>9.1f} {elapsed:>7.2f} {disk:>9.1f} "
+                      f"{query:>8.4f}")
+                del signals
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from canvas import Canvas
+from signals.json import deserialize
+from signals.utils import SignalCollection, SignalHeap
+
+BASELINE = ROOT / "benchmarks" / "baseline.json"
+# Slower or larger than the baseline by more than this is a regression.
+TOLERANCE = 0.2
+# Cases with fewer operations than this are timed as the best of repeats.
+REPEAT_BELOW = 10**6
+REPEATS = 3
+
+
+def ticker(edges):
+    # One edge per time unit.
+    return [{"type": "ticker", "name": "CLK", "period": 2}], edges
+
+
+def chain(depth, edges):
+    # Every rising edge of the clock runs down the whole chain.
+    signals = [{"type": "ticker", "name": "CLK", "period": 2}]
+    previous = "CLK"
+    for index in range(depth):
+        name = f"C{index}"
+        signal = {"type": "counter", "name": name, "delay": 1,
+                  "dependencies": [previous], "initial_state": "DATA",
+                  "states": ["DATA"]}
+        if index:
+            signal["old_state_trigger"] = "DATA"
+            signal["new_state_trigger"] = "DATA"
+        signals.append(signal)
+        previous = name
+    return signals, edges / (depth + 1) * 2
+
+
+def fan_in(width, edges):
+    # A parameter on every clock, with periods spread so few edges meet.
+    signals = [{"type": "ticker", "name": f"CLK{index}",
+                "period": 2 + index / width} for index in range(width)]
+    signals.append({"type": "parameter", "name": "ALL", "delay": 1,
+                    "true_state": {signal["name"]: "HIGH"
+                                   for signal in signals}})
+    return signals, edges / width
+
+
+def bench_deserialize(workload, count):
+    signals, _ = workload
+    start = time.perf_counter()
+    for _ in range(count):
+        deserialize(signals)
+    return count * len(signals), time.perf_counter() - start
+
+
+def _collection(workload, compiled):
+    signals, until_time = workload
+    sc = SignalCollection()
+    for signal in deserialize(signals):
+        sc.add(signal)
+    if compiled:
+        sc.compile()
+    return sc, until_time
+
+
+def bench_tick(workload):
+    sc, until_time = _collection(workload, False)
+    events = 0
+    start = time.perf_counter()
+    while sc.tick(until_time):
+        events += 1
+    return events, time.perf_counter() - start
+
+
+def bench_run(workload):
+    sc, until_time = _collection(workload, True)
+    start = time.perf_counter()
+    stats = sc.run(until_time)
+    return stats.events, time.perf_counter() - start
+
+
+def bench_heap(size):
+    # Adds, moves (a remove and an add) and pops, as the event loop does.
+    rng = random.Random(0)
+    signals = [object() for _ in range(size)]
+    times = [rng.random() for _ in range(size * 3)]
+    heap = SignalHeap()
+    start = time.perf_counter()
+    for signal, at in zip(signals, times):
+        heap.add_signal(signal, at)
+    for signal, at in zip(signals, times[size:]):
+        heap.add_signal(signal, at)
+    while len(heap.entry_finder):
+        heap.pop_signal()
+    return size * 3, time.perf_counter() - start
+
+
+def bench_render(workload, canvas):
+    sc, until_time = _collection(workload, True)
+    sc.run(until_time)
+    cvs = Canvas(canvas)
+    edges = 0
+    for signal in sc.all.values():
+        cvs.add_signal(signal)
+        edges += len(signal.history) - 1
+    start = time.perf_counter()
+    cvs.render()
+    return edges, time.perf_counter() - start
+
+
+def cases(canvas):
+    # Name, unit and function of every case.
+    for exponent in range(4, 8):
+        edges = 10**exponent
+        yield f"tick/ticker/1e{exponent}", "events", (
+            lambda edges=edges: bench_tick(ticker(edges)))
+        yield f"run/ticker/1e{exponent}", "events", (
+            lambda edges=edges: bench_run(ticker(edges)))
+    for depth in (10, 100):
+        yield f"tick/chain/{depth}", "events", (
+            lambda depth=depth: bench_tick(chain(depth, 10**5)))
+        yield f"run/chain/{depth}", "events", (
+            lambda depth=depth: bench_run(chain(depth, 10**5)))
+    for width in (10, 100):
+        yield f"tick/fan_in/{width}", "events", (
+            lambda width=width: bench_tick(fan_in(width, 10**5)))
+        yield f"run/fan_in/{width}", "events", (
+            lambda width=width: bench_run(fan_in(width, 10**5)))
+    for size in (10**4, 10**5, 10**6):
+        yield f"heap/{size:.0e}".replace("+0", ""), "operations", (
+            lambda size=size: bench_heap(size))
+    yield "deserialize/chain/1000", "signals", (
+        lambda: bench_deserialize(chain(1000, 0), 100))
+    yield "deserialize/fan_in/1000", "signals", (
+        lambda: bench_deserialize(fan_in(1000, 0), 100))
+    for exponent in (4, 5):
+        edges = 10**exponent
+        yield f"render/ticker/1e{exponent}", "edges", (
+            lambda edges=edges: bench_render(ticker(edges), canvas))
+    yield "render/chain/10", "edges", (
+        lambda: bench_render(chain(10, 10**4), canvas))
+
+
+def measure(function):
+    # The rate from the best of a few untraced runs, then the peak memory
+    # of a traced one.
+    count, elapsed = function()
+    if count < REPEAT_BELOW:
+        for _ in range(REPEATS - 1):
+            elapsed = min(elapsed, function()[1])
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"count": count, "rate": count / elapsed,
+            "peak_mb": peak / 2**20}
+
+
+def compare(result, baseline, tolerance):
+    flags = []
+    if result["rate"] < baseline["rate"] * (1 - tolerance):
+        flags.append("SLOWER")
+    if result["peak_mb"] > baseline["peak_mb"] * (1 + tolerance) + 0.1:
+        flags.append("LARGER")
+    return flags
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the simulation, deserialization and rendering "
+                    "hot paths and compare against a baseline.")
+    parser.add_argument("--only", default="",
+                        help="regular expression for the cases to run")
+    parser.add_argument("--quick", action="store_true",
+                        help="skip the cases with 10^6 edges or more")
+    parser.add_argument("--baseline", default=str(BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--output", help="JSON file for the results")
+    args = parser.parse_args()
+
+    # Font paths in the configs are relative to the repository root.
+    os.chdir(ROOT)
+    with open("tickers.json") as json_file:
+        canvas = json.load(json_file)["canvas"]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as json_file:
+            baseline = json.load(json_file)
+
+    results = {}
+    regressions = 0
+    print(f"{'case':<26} {'count':>9} {'rate/s':>12} {'peak MiB':>9} "
+          f"{'vs base':>8} flags")
+    for name, unit, function in cases(canvas):
+        if not re.search(args.only, name):
+            continue
+        if args.quick and re.search(r"1e[67]$", name):
+            continue
+        result = measure(function)
+        result["unit"] = unit
+        results[name] = result
+        change = ""
+        flags = []
+        if name in baseline:
+            change = f"{result['rate'] / baseline[name]['rate']:.2f}x"
+            flags = compare(result, baseline[name], args.tolerance)
+            regressions += bool(flags)
+        print(f"{name:<26} {result['count']:>9} {result['rate']:>12.0f} "
+              f"{result['peak_mb']:>9.1f} {change:>8} {' '.join(flags)}",
+              flush=True)
+
+    if args.output:
+        with open(args.output, "w") as json_file:
+            json.dump(results, json_file, indent=1)
+    if args.save_baseline:
+        # Only the cases that were run are replaced.
+        baseline.update(results)
+        with open(args.baseline, "w") as json_file:
+            json.dump(baseline, json_file, indent=1)
+        return
+    if regressions:
+        print(f"{regressions} regressions against {args.baseline}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from canvas import Canvas
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+
+def simulate(data, until_time):
+    signals = deserialize(data["signals"])
+    sc = SignalCollection(periodic=True)
+    for signal in signals:
+        sc.add(signal)
+    sc.run(until_time)
+    return signals
+
+
+def render(data, signals, backend, time_multiplier):
+    cvs = Canvas(dict(data["canvas"], backend=backend,
+                      time_multiplier=time_multiplier))
+    for signal in signals:
+        cvs.add_signal(signal)
+    output = io.StringIO() if backend == "svg" else None
+    start = time.perf_counter()
+    cvs.render(output)
+    elapsed = time.perf_counter() - start
+    size = len(output.getvalue()) if output else 0
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare raster and svg Canvas rendering.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, nargs="*",
+                        default=[10**5, 10**6, 10**7])
+    parser.add_argument("--time-multiplier", type=float, default=0.02,
+                        help="Keeps the raster image within memory.")
+    args = parser.parse_args()
+
+    # Font paths in the configs are relative to the repository root.
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+
+    print(f"{'time':>10} {'edges':>9} {'raster s':>9} {'svg s':>7} "
+          f"{'speedup':>8} {'svg MB':>7}")
+    for until_time in args.time:
+        signals = simulate(data, until_time)
+        edges = sum(len(signal.history) - 1 for signal in signals
+                    if signal.visible)
+        raster, _ = render(data, signals, "raster", args.time_multiplier)
+        svg, size = render(data, signals, "svg", args.time_multiplier)
+        print(f"{until_time:>10.0f} {edges:>9} {raster:>9.3f} {svg:>7.3f} "
+              f"{raster / svg:>7.1f}x {size / 2**20:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
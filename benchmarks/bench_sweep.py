@@ -0,0 +1,49 @@
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sweep import Sweep
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure sweep throughput against the number of "
+                    "workers.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--variants", type=int, default=64)
+    parser.add_argument("--time", type=float, default=10**5)
+    parser.add_argument("--workers", type=int, nargs="*",
+                        default=sorted({1, 2, os.cpu_count()}))
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        base = json.load(json_file)
+    base["time"] = args.time
+    frequency = {"start": 0.02, "stop": 0.03, "num": args.variants}
+
+    print(f"{'workers':>8} {'variants':>9} {'s':>7} {'variants/s':>11} "
+          f"{'scaling':>8}")
+    single = None
+    for workers in args.workers:
+        sweep = Sweep(base, {"parameters": {
+            "signals.PXL_CLK.frequency": frequency}, "workers": workers})
+        start = time.perf_counter()
+        count = sum(1 for _ in sweep.run())
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed
+        if single is None:
+            single = rate / workers
+        print(f"{workers:>8} {count:>9} {elapsed:>7.2f} {rate:>11.2f} "
+              f"{rate / single:>8.2f}")
+    print(f"{os.cpu_count()} CPUs")
+
+
+if __name__ == "__main__":
+    main()
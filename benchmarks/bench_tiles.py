@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from PIL import Image
+
+from canvas import Canvas
+from signals.json import deserialize
+from signals.utils import SignalCollection
+from tiles import TileRenderer
+
+
+def simulate(data, until_time):
+    signals = deserialize(data["signals"])
+    sc = SignalCollection(periodic=True)
+    for signal in signals:
+        sc.add(signal)
+    sc.run(until_time)
+    cvs = Canvas(data["canvas"])
+    for signal in signals:
+        cvs.add_signal(signal)
+    return cvs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare full and tiled Canvas rendering.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, nargs="*",
+                        default=[10**4, 10**5])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--tile-size", type=int, default=256)
+    parser.add_argument("--no-full", action="store_true",
+                        help="Only render tiles, for sizes too large for "
+                             "a single image.")
+    args = parser.parse_args()
+
+    # Font paths in the configs are relative to the repository root.
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+    Image.MAX_IMAGE_PIXELS = None
+
+    print(f"{'time':>10} {'size':>15} {'full MB':>8} {'tile MB':>8} "
+          f"{'full s':>7} {'tiled s':>8} {'identical':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "diagram.tif")
+        for until_time in args.time:
+            cvs = simulate(data, until_time)
+            renderer = TileRenderer(cvs, {"tile_size": args.tile_size,
+                                          "workers": args.workers})
+            start = time.perf_counter()
+            renderer.save(output)
+            tiled = time.perf_counter() - start
+
+            width, height = renderer.width, renderer.height
+            full_mb = width * height * 3 / 2**20
+            tile_mb = args.tile_size**2 * 3 / 2**20
+            full = float("nan")
+            identical = "-"
+            if not args.no_full:
+                start = time.perf_counter()
+                cvs.render()
+                full = time.perf_counter() - start
+                with Image.open(output) as image:
+                    identical = str(image.tobytes() == cvs.image.tobytes())
+                cvs.image = None
+                cvs.draw = None
+            print(f"{until_time:>10.0f} {f'{width}x{height}':>15} "
+                  f"{full_mb:>8.1f} {tile_mb:>8.2f} {full:>7.3f} "
+                  f"{tiled:>8.3f} {identical:>10}")
+
+
+if __name__ == "__main__":
+    main()
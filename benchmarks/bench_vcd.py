@@ -0,0 +1,62 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from signals import vcd
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+
+def simulate(data, until_time):
+    signals = deserialize(data["signals"])
+    sc = SignalCollection(periodic=True)
+    for signal in signals:
+        sc.add(signal)
+    sc.run(until_time)
+    return sc
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Measure VCD write and read throughput.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--time", type=float, nargs="*",
+                        default=[10**6, 10**7])
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    with open(args.config) as json_file:
+        data = json.load(json_file)
+
+    print(f"{'time':>10} {'edges':>10} {'MB':>8} {'write s':>8} "
+          f"{'write MB/s':>11} {'read s':>7} {'read MB/s':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "dump.vcd")
+        for until_time in args.time:
+            sc = simulate(data, until_time)
+            edges = sum(len(signal.history) - 1
+                        for signal in sc.all.values())
+            start = time.perf_counter()
+            vcd.write(filename, sc.all)
+            written = time.perf_counter() - start
+            del sc
+
+            size = os.path.getsize(filename) / 10**6
+            start = time.perf_counter()
+            signals = vcd.read(filename)
+            read = time.perf_counter() - start
+            del signals
+            print(f"{until_time:>10.0f} {edges:>10} {size:>8.1f} "
+                  f"{written:>8.2f} {size / written:>11.1f} {read:>7.2f} "
+                  f"{size / read:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
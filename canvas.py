@@ -1,5 +1,15 @@
-from PIL import Image, ImageDraw, ImageFont
+from array import array
+
+import numpy as np
+from PIL import Image, ImageDraw
+from glyphs import draw_label, get_font, get_text_bbox
+from signals.causes import CauseTable
+from signals.history import History
 from signals.signal import Signal
+from svg import SvgDraw
+
+# Cause lines worked out at a time.
+LINES_CHUNK = 1 << 12
 
 
 class Canvas:
@@ -15,6 +25,13 @@ class Canvas:
         self.linecolor = (64, 64, 255)
         self.font_file = "fonts/Roboto-Regular.ttf"
         self.font_size = 15
+        self.polyline = True
+        self.decimate = False
+        self.min_edge_spacing = None
+        self.window_start = None
+        self.window_end = None
+        self.backend = "raster"
+        self.output = None
 
         if data:
             if "height" in data:
@@ -42,14 +59,34 @@ class Canvas:
                 self.font_file = data["font_file"]
             if "font_size" in data:
                 self.font_size = data["font_size"]
-
-        self.font = ImageFont.truetype(self.font_file, self.font_size)
+            if "polyline" in data:
+                self.polyline = data["polyline"]
+            if "decimate" in data:
+                self.decimate = data["decimate"]
+            if "min_edge_spacing" in data:
+                self.min_edge_spacing = data["min_edge_spacing"]
+            if "window_start" in data:
+                self.window_start = data["window_start"]
+            if "window_end" in data:
+                self.window_end = data["window_end"]
+            if "backend" in data:
+                self.backend = data["backend"]
+            if "output" in data:
+                self.output = data["output"]
+
+        if self.backend not in ("raster", "svg"):
+            raise ValueError(f"Unknown backend '{self.backend}'.")
+
+        self.font = get_font(self.font_file, self.font_size)
 
         self.image = None
         self.draw = None
         self.signals = []
-        self.causes = []
+        self.causes = CauseTable()
         self.oldest = None
+        self.end = None
+        self.clip = None
+        self.instrument = None
 
     def add_signal(self, signal):
         if not signal.visible:
@@ -57,76 +94,468 @@ class Canvas:
         name = signal.name
         history = signal.history
         self.signals.append((name, history))
-        if signal.show_cause:
-            for cause in signal.causes:
-                self.causes.append(cause)
+        if signal.show_cause and signal.causes is not None:
+            self.causes.add(name, signal.causes)
 
         age, _ = history[-1]
         if age is not None:
             if not self.oldest or self.oldest < age:
                 self.oldest = age
 
-    def render(self):
-        width = int(self.h_spacing +
-                    self.time_multiplier * self.oldest +
-                    self.h_spacing)
-        height = int(self.start + len(self.signals) *
-                     (self.height + self.v_spacing))
+    def render(self, file=None):
+        # The raster backend draws into self.image and saves it to `file`
+        # if given. The svg backend writes to `file` while drawing.
+        if file is None:
+            file = self.output
+        width, height = self.get_size()
+
+        if self.backend == "svg":
+            if file is None:
+                raise ValueError("The svg backend needs an output file.")
+            if isinstance(file, str):
+                with open(file, "w") as svg_file:
+                    self._render_svg(svg_file, width, height)
+            else:
+                self._render_svg(file, width, height)
+            return
 
         self.image = Image.new("RGB", (width, height), color=self.background)
         self.draw = ImageDraw.Draw(self.image)
+        self._draw()
+        if file is not None:
+            if self.instrument is None:
+                self.image.save(file)
+            else:
+                with self.instrument.phase("render.save"):
+                    self.image.save(file)
+
+    def _render_svg(self, file, width, height):
+        self.image = None
+        self.draw = SvgDraw(file, width, height, self.background)
+        self._draw()
+        self.draw.close()
+
+    def _draw(self):
+        first, last = self._get_range()
+        # With a window, only the transitions inside it are drawn and the
+        # time axis starts at window_start.
+        window = self.window_start is not None or self.window_end is not None
         start = self.start
-        starts = {}
+        instrument = self.instrument
         for name, history in self.signals:
-            starts[name] = start
-            size = self.draw.textsize(name, font=self.font)
-            x = self.h_spacing - size[0]
-            y = start + self.height/2 - (size[1]/2)
-            self.draw.text((x, y), name, fill=self.foreground, font=self.font)
-
-            lines = []
-            prev_time = None
-            prev_state = None
-            for (curr_time, curr_state) in history:
-                if curr_time:
-                    lines += self._get_shape(prev_time, prev_state,
-                                     curr_time, curr_state)
-                else:
-                    curr_time = 0
-
-                prev_time = curr_time
-                prev_state = curr_state
-
-            if prev_time and prev_time < self.oldest:
-                lines += self._get_shape(prev_time, prev_state,
-                                         self.oldest, prev_state,
-                                         last=True)
+            if window:
+                history = self._get_window(history, first, last)
+            if instrument is None:
+                self._draw_signal(self.draw, name, history, start)
+            else:
+                self._draw_signal_instrumented(self.draw, name, history,
+                                               start, instrument)
+            start = start + self.height + self.v_spacing
 
+        if instrument is None:
+            for line in self.get_cause_lines():
+                self.draw.line(line, fill=self.linecolor)
+            return
+        with instrument.phase("render.causes"):
+            lines = self.get_cause_lines()
             for line in lines:
-              line = [(x + self.h_spacing, y + start) for
-                      (x, y) in line]
-              self.draw.line(line, fill=self.foreground)
+                self.draw.line(line, fill=self.linecolor)
+        instrument.count("render", "cause_lines", len(lines))
 
-            start = start + self.height + self.v_spacing
+    def get_size(self):
+        self._get_range()
+        width = int(self.h_spacing +
+                    self.time_multiplier * self.end +
+                    self.h_spacing)
+        height = int(self.start + len(self.signals) *
+                     (self.height + self.v_spacing))
+        return width, height
 
+    def get_starts(self):
+        starts = {}
+        start = self.start
+        for name, _ in self.signals:
+            starts[name] = start
+            start = start + self.height + self.v_spacing
+        return starts
+
+    def get_cause_lines(self, start=None, end=None):
+        # A line from every origin to the event it caused, for the events
+        # in range between signals that are drawn. With start and end, only
+        # the lines spanning some of the time between them.
+        first, last = self._get_range()
+        causes = self.causes
+        if start is None:
+            rows = causes.between(first, last)
+        else:
+            rows = causes.crossing(start, end)
+            event_times = rows[1]
+            inside = (event_times >= first) & (event_times < last)
+            rows = tuple(column[inside] for column in rows)
+        events, event_times, origs, orig_times = rows
+        ys = np.full(len(causes.names), np.nan)
+        for name, start in self.get_starts().items():
+            if name in causes.ids:
+                ys[causes.ids[name]] = start + self.height/2
+        # A chunk at a time, so only the list of lines is as long as the
+        # causes.
         cause_lines = []
-        for cause in self.causes:
-            name, time = cause.event
-            if name not in starts:
-                continue
-            if time >= self.oldest:
-                continue
-            end_x = time * self.time_multiplier + self.h_spacing
-            end_y = starts[name] + self.height/2
-
-            for d_name, d_time in cause.dependencies.items():
-                if d_name not in starts:
-                    continue
-                start_x = d_time * self.time_multiplier + self.h_spacing
-                start_y = starts[d_name] + self.height/2
-                cause_lines.append([(start_x, start_y), (end_x, end_y)])
-        for line in cause_lines:
-            self.draw.line(line, fill=self.linecolor)
+        multiplier = self.time_multiplier
+        for low in range(0, len(events), LINES_CHUNK):
+            high = low + LINES_CHUNK
+            lines = np.empty((len(events[low:high]), 4))
+            lines[:, 0] = orig_times[low:high]
+            lines[:, 0] -= first
+            lines[:, 0] *= multiplier
+            lines[:, 0] += self.h_spacing
+            lines[:, 1] = ys[origs[low:high]]
+            lines[:, 2] = event_times[low:high]
+            lines[:, 2] -= first
+            lines[:, 2] *= multiplier
+            lines[:, 2] += self.h_spacing
+            lines[:, 3] = ys[events[low:high]]
+            shown = ~np.isnan(lines[:, 1]) & ~np.isnan(lines[:, 3])
+            if not shown.all():
+                lines = lines[shown]
+            cause_lines.extend(lines.tolist())
+        return cause_lines
+
+    def _get_range(self):
+        first = self.window_start or 0
+        last = self.oldest if self.window_end is None else self.window_end
+        self.end = last - first
+        return first, last
+
+    def _draw_signal(self, draw, name, history, start, origin=0):
+        xy = self._get_label(name, start)
+        if self.backend == "svg":
+            draw.text(xy, name, fill=self.foreground, font=self.font)
+        else:
+            draw_label(draw, xy, name, self.font_file, self.font_size,
+                       self.foreground)
+        lines, bands = self._get_shapes(history, start, origin)
+        for band in bands:
+            draw.rectangle(band, fill=self.foreground)
+        for line in lines:
+            draw.line(line, fill=self.foreground)
+
+    def _draw_signal_instrumented(self, draw, name, history, start,
+                                  instrument, origin=0):
+        # _draw_signal, timing the shapes apart from the drawing and
+        # counting the transitions drawn by type.
+        _count_transitions(instrument, history)
+        with instrument.phase("render.labels"):
+            xy = self._get_label(name, start)
+            if self.backend == "svg":
+                draw.text(xy, name, fill=self.foreground, font=self.font)
+            else:
+                draw_label(draw, xy, name, self.font_file, self.font_size,
+                           self.foreground)
+        with instrument.phase("render.shapes"):
+            lines, bands = self._get_shapes(history, start, origin)
+        with instrument.phase("render.draw"):
+            for band in bands:
+                draw.rectangle(band, fill=self.foreground)
+            for line in lines:
+                draw.line(line, fill=self.foreground)
+        instrument.count("render", "lines", len(lines))
+        instrument.count("render", "points", sum(len(line) for line in lines))
+        instrument.count("render", "bands", len(bands))
+
+    def _get_label(self, name, start):
+        _, _, right, bottom = get_text_bbox(name, self.font_file,
+                                            self.font_size)
+        x = self.h_spacing - right
+        y = start + self.height/2 - (bottom/2)
+        return x, y
+
+    def _get_shapes(self, history, start, origin=0):
+        if self.polyline:
+            return self._get_polylines(history, start, origin)
+        return self._get_segments(history, start, origin)
+
+    def _get_window(self, history, first, last):
+        history = to_history(history).slice(first, last)
+        if first:
+            times = np.asarray(history.times) - first
+            history.times = array("d")
+            history.times.frombytes(times.tobytes())
+        return history
+
+    def _get_segments(self, history, start, origin=0):
+        # Returns the segments and, when decimating, the activity bands.
+        skip = ()
+        bands = []
+        if self.decimate:
+            history, skip, bands = self._decimate(history, start)
+        lines = []
+        prev_time = None
+        prev_state = None
+        for index, (curr_time, curr_state) in enumerate(history):
+            if curr_time:
+                if index not in skip:
+                    lines += self._get_shape(prev_time, prev_state,
+                                             curr_time, curr_state)
+            else:
+                curr_time = origin
+
+            prev_time = curr_time
+            prev_state = curr_state
+
+        if prev_time and prev_time < self.end:
+            lines += self._get_shape(prev_time, prev_state,
+                                     self.end, prev_state,
+                                     last=True)
+
+        return [[(x + self.h_spacing, y + start) for (x, y) in line]
+                for line in lines], bands
+
+    def _decimate(self, history, start):
+        # The entries of `history` left once the transitions inside each
+        # activity band are dropped, those of them whose shape would be
+        # covered by a band, and the bands. Transitions in a band are never
+        # visited, so the segments that follow are bounded by the width
+        # rather than the number of edges.
+        history = to_history(history)
+        times = np.asarray(history.times)
+        curr_x = times * self.time_multiplier
+        if len(curr_x) < 2:
+            return history, (), []
+        first, last = self._get_dense_runs(curr_x)
+        if not len(first):
+            return history, (), []
+        # The first and last transitions of a band are kept, for the level
+        # before it and the state after it. The shape from one to the other
+        # is skipped.
+        dropped = self._get_inside(len(curr_x), first, last)
+        dropped[first] = False
+        dropped[last] = False
+        kept = np.flatnonzero(~dropped)
+        states = history.states
+        entries = [(None, history.initial_state)]
+        entries += [(time, states[code]) for time, code in zip(
+            times[kept].tolist(), _codes(history)[kept].tolist())]
+        skip = set((1 + np.searchsorted(kept, last)).tolist())
+        return entries, skip, self._get_bands(curr_x, first, last, start)
+
+    def _get_polylines(self, history, start, origin=0):
+        # Draws the same segments as _get_segments, joined into as few
+        # polylines as possible. Pillow rasterizes a polyline one segment
+        # at a time, so the output is pixel-identical. Returns the
+        # polylines and, when decimating, the activity bands.
+        if isinstance(history, History):
+            times = np.asarray(history.times)
+            if not len(times):
+                return [], []
+            if times.all():
+                for get_polylines in (self._get_binary_polylines,
+                                      self._get_bus_polylines):
+                    shapes = get_polylines(history, times, start, origin)
+                    if shapes is not None:
+                        return shapes
+
+        polylines = []
+        segments, bands = self._get_segments(history, start, origin)
+        for line in segments:
+            if polylines and polylines[-1][-1] == line[0]:
+                polylines[-1].extend(line[1:])
+            else:
+                polylines.append(list(line))
+        return polylines, bands
+
+    def _get_binary_polylines(self, history, times, start, origin):
+        low_high = {Signal.LOW: self.height, Signal.HIGH: 0}
+        if (history.initial_state not in low_high or
+                any(state not in low_high for state in history.states)):
+            return None
+
+        levels = np.array([low_high[state] for state in history.states],
+                          dtype=np.float64)
+        y = levels[_codes(history)]
+        prev_y = np.concatenate(([low_high[history.initial_state]], y[:-1]))
+        curr_x = times * self.time_multiplier
+
+        # Every transition ends at (x + slope, y). A change of level also
+        # starts its slope at (x - slope, previous y).
+        first_x = origin * self.time_multiplier + self.slope_time
+        xs = np.stack((curr_x - self.slope_time, curr_x + self.slope_time), 1)
+        ys = np.stack((prev_y, y), 1)
+        keep = np.stack((y != prev_y, np.ones(len(y), dtype=bool)), 1)
+        xs = np.concatenate(([first_x], xs.ravel()))
+        ys = np.concatenate(([prev_y[0]], ys.ravel()))
+        keep = np.concatenate(([True], keep.ravel()))
+        if times[-1] < self.end:
+            last_x = self.end * self.time_multiplier + self.slope_time
+            xs = np.append(xs, last_x)
+            ys = np.append(ys, y[-1])
+            keep = np.append(keep, True)
+
+        polylines, bands, _ = self._split(curr_x, xs, [ys], keep,
+                                          np.empty(0, dtype=np.int64), start)
+        return polylines, bands
+
+    def _get_bus_polylines(self, history, times, start, origin):
+        bus = (Signal.DATA, Signal.UNDEFINED)
+        if (history.initial_state not in bus or
+                any(state not in bus for state in history.states)):
+            return None
+        shadow_step = int(self.slope_time*2)
+        if not shadow_step:
+            return None
+
+        undefined = np.array([state == Signal.UNDEFINED
+                              for state in history.states])[_codes(history)]
+        prev_undefined = np.concatenate(
+            ([history.initial_state == Signal.UNDEFINED], undefined[:-1]))
+        prev_x = np.concatenate(([origin], times[:-1])) * self.time_multiplier
+        curr_x = times * self.time_multiplier
+        # Every transition but UNDEFINED to UNDEFINED crosses over.
+        sloped = ~(prev_undefined & undefined)
+
+        # The top and bottom of the boxes form two polylines that swap
+        # sides at every crossing. Each transition adds the end of the box
+        # and the far end of the crossing, or breaks the line if there is
+        # no crossing.
+        xs = np.stack((curr_x - self.slope_time,
+                       curr_x + self.slope_time), 1).ravel()
+        flips = np.cumsum(sloped)
+        before = (flips - sloped) % 2
+        ys = np.stack((before, flips % 2), 1).ravel() * self.height
+        xs = np.concatenate(([prev_x[0] + self.slope_time], xs))
+        ys = np.concatenate(([0], ys))
+        shadowed = prev_undefined
+        if times[-1] < self.end:
+            last_x = self.end * self.time_multiplier
+            xs = np.append(xs, last_x - self.slope_time)
+            ys = np.append(ys, ys[-1])
+
+        breaks = 2 + 2 * np.flatnonzero(~sloped)
+        polylines, bands, banded = self._split(
+            curr_x, xs, [ys, self.height - ys], np.ones(len(xs), dtype=bool),
+            breaks, start)
+
+        # Shading that falls inside an activity band is covered by it.
+        shadowed = shadowed & ~banded
+        shadows = [(prev_x[shadowed], curr_x[shadowed])]
+        if times[-1] < self.end and undefined[-1]:
+            shadows.append((curr_x[-1:], np.array([last_x])))
+        for shadow_prev_x, shadow_curr_x in shadows:
+            polylines += self._get_shadows(shadow_prev_x, shadow_curr_x,
+                                           shadow_step, start)
+        return polylines, bands
+
+    def _split(self, curr_x, xs, ys_list, keep, breaks, start):
+        # xs and ys_list hold a start point and then a point before and a
+        # point after each transition. `keep` masks out points that are not
+        # drawn and `breaks` are the points that begin a new polyline.
+        bands = []
+        banded = np.zeros(len(curr_x), dtype=bool)
+        if self.decimate and len(curr_x) > 1:
+            first, last = self._get_dense_runs(curr_x)
+            if len(first):
+                inside = self._get_inside(len(curr_x), first, last)
+                before = 1 + 2 * np.arange(len(curr_x))
+                after = before + 1
+                keep = keep.copy()
+                keep[before[inside]] = False
+                keep[after[inside]] = False
+                keep[before[first]] = True
+                keep[after[last]] = True
+                breaks = np.concatenate((breaks[keep[breaks]], after[last]))
+                banded = inside.copy()
+                banded[first] = False
+                bands = self._get_bands(curr_x, first, last, start)
+
+        positions = np.cumsum(keep) - 1
+        xs = xs[keep]
+        bounds = np.unique(np.concatenate(([0], positions[breaks], [len(xs)])))
+        pieces = [(2 * first, 2 * last)
+                  for first, last in zip(bounds[:-1].tolist(),
+                                         bounds[1:].tolist())
+                  if last - first > 1]
+        polylines = []
+        for ys in ys_list:
+            coords = self._coords(xs, ys[keep], start)
+            polylines += [coords[first:last] for first, last in pieces]
+        return polylines, bands, banded
+
+    def _get_dense_runs(self, curr_x):
+        spacing = self.min_edge_spacing
+        if spacing is None:
+            spacing = max(1, self.slope_time*2)
+        dense = np.diff(curr_x) < spacing
+        edges = np.diff(np.concatenate(([0], dense.astype(np.int8), [0])))
+        return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+    @staticmethod
+    def _get_inside(count, first, last):
+        # Marks the transitions from each first one to its last one.
+        inside = np.zeros(count + 1, dtype=np.int64)
+        inside[first] += 1
+        inside[last + 1] -= 1
+        return np.cumsum(inside[:-1]) > 0
+
+    def _get_bands(self, curr_x, first, last, start):
+        # Transitions closer than min_edge_spacing pixels are merged into a
+        # filled band from the first slope to the last one.
+        band_x0 = curr_x[first] - self.slope_time + self.h_spacing
+        band_x1 = curr_x[last] + self.slope_time + self.h_spacing
+        return [[x0, 0 + start, x1, self.height + start]
+                for x0, x1 in zip(band_x0.tolist(), band_x1.tolist())]
+
+    def _get_shadows(self, prev_x, curr_x, step, start):
+        first = (prev_x + self.slope_time).astype(np.int64)
+        stop = (curr_x - self.slope_time*2).astype(np.int64)
+        counts = np.maximum(0, -((first - stop) // step))
+        width = self.slope_time*2
+        skips = np.zeros(len(first), dtype=np.int64)
+        if self.clip is not None:
+            # Only the lines that reach into the clipped range are drawn.
+            low, high = self.clip
+            skips = np.clip(-((first + width - low) // step), 0,
+                            counts).astype(np.int64)
+            ends = np.clip((high - first) // step + 1, skips,
+                           counts).astype(np.int64)
+            first = first + skips * step
+            counts = ends - skips
+        polylines = []
+        if width != step:
+            # Neighbouring shadow lines do not touch, draw them one by one.
+            for x0, count in zip(first.tolist(), counts.tolist()):
+                for x in range(x0, x0 + count * step, step):
+                    polylines.append([(x + self.h_spacing, 0 + start),
+                                      (x + width + self.h_spacing,
+                                       self.height + start)])
+                    polylines.append([(x + self.h_spacing,
+                                       self.height + start),
+                                      (x + width + self.h_spacing,
+                                       0 + start)])
+            return polylines
+
+        # Each run of crossed lines is drawn as two zigzags, all of them
+        # computed at once and then split into runs.
+        drawn = counts > 0
+        first = first[drawn]
+        skips = skips[drawn]
+        points = counts[drawn] + 1
+        ends = np.cumsum(points)
+        begins = ends - points
+        index = np.arange(ends[-1] if len(ends) else 0) - np.repeat(begins,
+                                                                    points)
+        xs = np.repeat(first, points) + step * index
+        ys = ((np.repeat(skips, points) + index) % 2) * self.height
+        down = self._coords(xs, ys, start)
+        up = self._coords(xs, self.height - ys, start)
+        for begin, end in zip((2 * begins).tolist(), (2 * ends).tolist()):
+            polylines.append(down[begin:end])
+            polylines.append(up[begin:end])
+        return polylines
+
+    def _coords(self, xs, ys, start):
+        coords = np.empty(2 * len(xs))
+        coords[0::2] = xs + self.h_spacing
+        coords[1::2] = ys + start
+        return coords.tolist()
 
     def _get_shape(self, prev_time, prev_state, curr_time, curr_state, last=False):
       lines = []
@@ -271,3 +700,37 @@ class Canvas:
 
     def show(self):
         self.image.show()
+
+
+def _codes(history):
+    return np.asarray(history.codes)
+
+
+def _count_transitions(instrument, history):
+    history = to_history(history)
+    codes = _codes(history)
+    if not len(codes):
+        return
+    states = list(history.states)
+    initial = history.state_codes.get(history.initial_state)
+    if initial is None:
+        initial = len(states)
+        states.append(history.initial_state)
+    prev_codes = np.concatenate(([initial], codes[:-1]))
+    pairs, counts = np.unique(prev_codes * len(states) + codes,
+                              return_counts=True)
+    for pair, count in zip(pairs.tolist(), counts.tolist()):
+        old_state, new_state = divmod(pair, len(states))
+        instrument.count("transitions",
+                         f"{states[old_state]}->{states[new_state]}", count)
+
+
+def to_history(history):
+    if isinstance(history, History):
+        return history
+    entries = iter(history)
+    _, initial_state = next(entries)
+    converted = History(initial_state)
+    for time, state in entries:
+        converted.add(time, state)
+    return converted
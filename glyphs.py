@@ -0,0 +1,58 @@
+import math
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont
+
+FONT_CACHE_SIZE = 16
+LABEL_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=FONT_CACHE_SIZE)
+def get_font(font_file, font_size):
+    return ImageFont.truetype(font_file, font_size)
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def get_text_bbox(text, font_file, font_size):
+    return get_font(font_file, font_size).getbbox(text)
+
+
+@lru_cache(maxsize=LABEL_CACHE_SIZE)
+def get_label(text, font_file, font_size, fraction):
+    # The label as a mask, drawn the way ImageDraw.text draws it at a
+    # position with the given fractional part. Drawing the mask with
+    # ImageDraw.bitmap at the integer part plus the returned offset gives
+    # the same pixels in any color. Pillow keeps the sign of the fraction,
+    # so negative positions are not padded; what falls before them is off
+    # the image anyway.
+    font = get_font(font_file, font_size)
+    left, top, right, bottom = font.getbbox(text)
+    pad_x = max(0, -left) + 1 if fraction[0] >= 0 else 0
+    pad_y = max(0, -top) + 1 if fraction[1] >= 0 else 0
+    mask = Image.new("L", (pad_x + math.ceil(right) + 2,
+                           pad_y + math.ceil(bottom) + 2))
+    ImageDraw.Draw(mask).text((pad_x + fraction[0], pad_y + fraction[1]),
+                              text, fill=255, font=font)
+    return mask, (-pad_x, -pad_y)
+
+
+def draw_label(draw, xy, text, font_file, font_size, fill):
+    x, y = xy
+    left, top = int(x), int(y)
+    mask, (dx, dy) = get_label(text, font_file, font_size,
+                               (x - left, y - top))
+    draw.bitmap((left + dx, top + dy), mask, fill=fill)
+
+
+def cache_info():
+    return {
+        "font": get_font.cache_info(),
+        "text_bbox": get_text_bbox.cache_info(),
+        "label": get_label.cache_info(),
+    }
+
+
+def cache_clear():
+    get_font.cache_clear()
+    get_text_bbox.cache_clear()
+    get_label.cache_clear()
@@ -0,0 +1,229 @@
+from array import array
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from signals.history import History
+from tiles import draw_tile, tile_history
+
+# Updates from the simulation waiting to be drawn. A full queue holds the
+# simulation back until the renderer has caught up.
+QUEUE_SIZE = 16
+
+
+class LiveRenderer():
+    # Draws the diagram while the simulation runs. The simulation runs in a
+    # worker thread a step at a time and queues the transitions and causes
+    # each step added. Between frames those are added to the canvas, and a
+    # frame redraws only the time from the earliest transition that changed
+    # to the end of the diagram onto an image kept from frame to frame. The
+    # last frame is the same as rendering the finished diagram.
+    def __init__(self, canvas, data=None):
+        self.fps = 10
+        self.steps = 1000
+        self.frames_output = None
+        self.on_frame = None
+        self.frames = 0
+
+        if data:
+            if "fps" in data:
+                self.fps = data["fps"]
+            if "steps" in data:
+                self.steps = data["steps"]
+            if "frames_output" in data:
+                self.frames_output = data["frames_output"]
+
+        if self.fps <= 0 or self.steps <= 0:
+            raise ValueError("Live fps and steps must be positive.")
+        if canvas.backend != "raster":
+            raise ValueError("Live rendering needs the raster backend.")
+        if canvas.window_start is not None or canvas.window_end is not None:
+            raise ValueError("Live rendering does not support a window.")
+
+        self.canvas = canvas
+        self.image = None
+        # Anything a transition draws stays within its slopes.
+        self.margin = 2 * canvas.slope_time + 2
+
+    def run(self, sc, until_time):
+        # Runs `sc` until until_time, drawing at most fps frames a second,
+        # and leaves the finished image in canvas.image.
+        canvas = self.canvas
+        signals = [signal for signal in sc.all.values() if signal.visible]
+        self.histories = []
+        for signal in signals:
+            history = History(signal.history.initial_state)
+            canvas.signals.append((signal.name, history))
+            self.histories.append(history)
+        self.drawn = [0] * len(signals)
+        self.frames = 0
+        self.last = None
+        self.changed = False
+        canvas.oldest = until_time
+        width, height = canvas.get_size()
+        canvas.oldest = None
+        self.image = Image.new("RGB", (width, height),
+                               color=canvas.background)
+        canvas.image = self.image
+
+        updates = queue.Queue(QUEUE_SIZE)
+        worker = threading.Thread(
+            target=_simulate,
+            args=(sc, signals, until_time, until_time / self.steps, updates),
+            daemon=True)
+        worker.start()
+        period = 1 / self.fps
+        next_frame = time.perf_counter() + period
+        while True:
+            try:
+                update = updates.get(
+                    timeout=max(0, next_frame - time.perf_counter()))
+            except queue.Empty:
+                update = ()
+            if update is None:
+                break
+            if isinstance(update, BaseException):
+                raise update
+            if update:
+                self._add(update)
+            if time.perf_counter() >= next_frame:
+                self.frame()
+                next_frame = time.perf_counter() + period
+        worker.join()
+        self.frame()
+
+        # The image was made for until_time; the diagram ends at the last
+        # transition.
+        if canvas.oldest is not None:
+            width, height = canvas.get_size()
+            if width < self.image.width:
+                self.image = self.image.crop((0, 0, width, height))
+        canvas.image = self.image
+        if canvas.output is not None:
+            self.image.save(canvas.output)
+
+    def frame(self):
+        # Redraws the diagram from the earliest change since the last frame.
+        canvas = self.canvas
+        if not self.changed or canvas.oldest is None:
+            return
+        last = canvas.oldest
+        low = last if self.last is None else self.last
+        for index, history in enumerate(self.histories):
+            drawn = self.drawn[index]
+            if len(history.times) > drawn:
+                low = min(low, history.times[drawn - 1] if drawn else 0)
+                self.drawn[index] = len(history.times)
+        # Causes of the events now in range are drawn whole.
+        if self.last is not None:
+            _, event_times, _, orig_times = canvas.causes.between(self.last,
+                                                                  last)
+            low = min(low, event_times.min(initial=low),
+                      orig_times.min(initial=low))
+        self.last = last
+        self.changed = False
+
+        canvas._get_range()
+        multiplier = canvas.time_multiplier
+        x0 = max(0, int(low * multiplier + canvas.h_spacing - self.margin))
+        if not self.frames:
+            # The first frame draws the labels as well.
+            x0 = 0
+        x1 = min(self.image.width,
+                 int(last * multiplier + canvas.h_spacing + self.margin) + 1)
+        if x0 >= x1:
+            return
+        box = (x0, 0, x1, self.image.height)
+        self.image.paste(self._draw(box), (x0, 0))
+        self.frames += 1
+        if self.on_frame is not None:
+            self.on_frame(self.image, box)
+        if self.frames_output is not None:
+            tmp_filename = f"{self.frames_output}.tmp.png"
+            self.image.save(tmp_filename)
+            os.replace(tmp_filename, self.frames_output)
+
+    def _add(self, changes):
+        canvas = self.canvas
+        for index, times, codes, states, causes in changes:
+            history = self.histories[index]
+            if states is not None:
+                history.states = states
+                history.state_codes = {state: code
+                                       for code, state in enumerate(states)}
+            if codes.typecode != history.codes.typecode:
+                history.codes = array(codes.typecode, history.codes)
+            history.times.extend(times)
+            history.codes.extend(codes)
+            if causes:
+                canvas.causes.add(canvas.signals[index][0], causes)
+            if len(times) and (canvas.oldest is None or
+                               canvas.oldest < times[-1]):
+                canvas.oldest = times[-1]
+        self.changed = True
+
+    def _draw(self, box):
+        # The box as TileRenderer draws a tile of the whole diagram.
+        canvas = self.canvas
+        x0, y0, x1, y1 = box
+        multiplier = canvas.time_multiplier
+        low = (x0 - canvas.h_spacing - self.margin) / multiplier
+        high = (x1 - canvas.h_spacing + self.margin) / multiplier
+        rows = []
+        start = canvas.start
+        for (name, _), history in zip(canvas.signals, self.histories):
+            rows.append((name, start) + tile_history(history, low, high))
+            start = start + canvas.height + canvas.v_spacing
+        clip = (x0 - canvas.h_spacing - self.margin,
+                x1 - canvas.h_spacing + self.margin)
+
+        lines = np.array(canvas.get_cause_lines(low, high),
+                         dtype=np.float64).reshape(-1, 4)
+        xs = lines[:, 0::2]
+        ys = lines[:, 1::2]
+        crossing = ((xs.max(1) >= x0 - 1) & (xs.min(1) <= x1 + 1) &
+                    (ys.min(1) <= y1 + 1) & (ys.max(1) >= y0 - 1))
+        lines = (np.trunc(lines[crossing]) - (x0, y0, x0, y0)).tolist()
+        return draw_tile(canvas, box, clip, rows, lines)
+
+
+def _simulate(sc, signals, until_time, step, updates):
+    # Runs sc a step at a time and queues the changes of each step, one
+    # for every signal that has new transitions or causes.
+    # Everything queued is copied, the signals go on changing. None is
+    # queued at the end, or the error the simulation stopped with.
+    try:
+        sent = [0] * len(signals)
+        states = [0] * len(signals)
+        causes_sent = [0] * len(signals)
+        now = 0
+        while now < until_time:
+            now = min(until_time, now + step)
+            sc.run(now)
+            changes = []
+            for index, signal in enumerate(signals):
+                history = signal.history
+                count = len(history.times)
+                new_states = None
+                if len(history.states) != states[index]:
+                    new_states = list(history.states)
+                    states[index] = len(new_states)
+                causes = None
+                if (signal.show_cause and signal.causes is not None and
+                        len(signal.causes) > causes_sent[index]):
+                    causes = signal.causes[causes_sent[index]:]
+                    causes_sent[index] = len(signal.causes)
+                if count > sent[index] or new_states or causes:
+                    changes.append((index, history.times[sent[index]:],
+                                    history.codes[sent[index]:], new_states,
+                                    causes))
+                    sent[index] = count
+            if changes:
+                updates.put(changes)
+        updates.put(None)
+    except BaseException as error:
+        updates.put(error)
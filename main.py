@@ -1,38 +1,158 @@
 from signals.signal import TickerSignal, CounterSignal, Signal
 from signals.utils import SignalCollection
+from signals.partition import PartitionedCollection
+from signals.sink import HistorySink
+from signals.instrument import Instrument
 from signals.json import deserialize
+from signals.schema import CACHE_DIR, load
+from signals import vcd
 from canvas import Canvas
-import json
+from tiles import TileRenderer
+from live import LiveRenderer
+from contextlib import nullcontext
+import argparse
+import time
 
-def main(filename):
-    with open(filename) as json_file:
-        data = json.load(json_file)
-    if "signals" not in data:
+def main(filename, cache_dir=None):
+    # With a cache_dir, such as signals.schema.CACHE_DIR, the parsed and
+    # validated config is cached there by the hash of the file. The command
+    # line uses CACHE_DIR unless given --no-cache.
+    start = time.perf_counter()
+    data, signals = load(filename, cache_dir)
+    loaded = time.perf_counter() - start
+    if signals is None and "vcd" not in data:
         raise ValueError("Input file malformed. Missing 'signals'.")
     if "canvas" not in data:
         raise ValueError("Input file malformed. Missing 'canvas'.")
 
-    signals = deserialize(data["signals"])
+    # "instrument" names a JSON file for a report of where the time went.
+    instrument = None
+    if "instrument" in data:
+        instrument = Instrument()
+        instrument.add_time("load", loaded)
 
-    sc = SignalCollection()
-    for signal in signals:
-        sc.add(signal)
+    cvs = Canvas(data["canvas"])
+    cvs.instrument = instrument
+    if "live" in data:
+        # The diagram is drawn while the simulation runs, from the
+        # histories as they grow.
+        if "vcd" in data or "sink" in data:
+            raise ValueError("Live rendering needs a simulation that keeps "
+                             "its histories in memory.")
+        live = LiveRenderer(cvs, data["live"])
+        with _phase(instrument, "live"):
+            simulate(data, instrument, signals, live.run)
+    else:
+        if "vcd" in data:
+            with _phase(instrument, "vcd.read"):
+                signals = vcd.read(data["vcd"])
+        else:
+            signals = simulate(data, instrument, signals)
+        for signal in signals:
+            cvs.add_signal(signal)
+
+        if "tiles" in data:
+            with _phase(instrument, "tiles"):
+                TileRenderer(cvs, data["tiles"]).save()
+        else:
+            with _phase(instrument, "render"):
+                cvs.render()
+
+    if instrument is not None:
+        instrument.dump(data["instrument"])
+    if "tiles" not in data and cvs.output is None:
+        cvs.show()
+
+def simulate(data, instrument=None, signals=None, run=None):
+    # `signals` are those of data["signals"], if already deserialized.
+    # `run(sc, until_time)` runs the simulation instead of sc.run.
+    if signals is None:
+        with _phase(instrument, "deserialize"):
+            signals = deserialize(data["signals"])
+
+    periodic = False
+    if "periodic" in data:
+        periodic = data["periodic"]
+
+    queue = "heap"
+    if "queue" in data:
+        queue = data["queue"]
+
+    queue_width = None
+    if "queue_width" in data:
+        queue_width = data["queue_width"]
+
+    cycles = False
+    if "cycles" in data:
+        cycles = data["cycles"]
+
+    sink = None
+    if "sink" in data:
+        sink = HistorySink(data["sink"])
+
+    if "partition" in data:
+        # The connected components of the signals are simulated in worker
+        # processes, see PartitionedCollection.
+        if sink is not None or run is not None or instrument is not None:
+            raise ValueError("A partitioned simulation cannot be used with "
+                             "a sink, live rendering or an instrument.")
+        workers = None
+        boundaries = ()
+        if "workers" in data["partition"]:
+            workers = data["partition"]["workers"]
+        if "boundaries" in data["partition"]:
+            boundaries = data["partition"]["boundaries"]
+        sc = PartitionedCollection(workers=workers, boundaries=boundaries,
+                                   periodic=periodic, queue=queue,
+                                   cycles=cycles, queue_width=queue_width)
+    else:
+        sc = SignalCollection(periodic=periodic, sink=sink,
+                              instrument=instrument, queue=queue,
+                              cycles=cycles, queue_width=queue_width)
+    with _phase(instrument, "compile"):
+        for signal in signals:
+            sc.add(signal)
+        sc.compile()
 
     until_time=600
     if "time" in data:
         until_time = data["time"]
-    
-    while sc.tick(until_time):
-        continue
 
-    cvs = Canvas(data["canvas"])
-    for signal in signals:
-        cvs.add_signal(signal)
-        
-    cvs.render()
-    cvs.show()
+    if run is None:
+        sc.run(until_time)
+    else:
+        run(sc, until_time)
+    # Partitioned signals come back from the workers as copies.
+    signals = list(sc.all.values())
+    if sink is not None:
+        with _phase(instrument, "sink.close"):
+            sink.close()
+
+    if "vcd_output" in data:
+        with _phase(instrument, "vcd.write"):
+            vcd.write(data["vcd_output"], sc.all)
+    return signals
+
+def _phase(instrument, name):
+    if instrument is None:
+        return nullcontext()
+    return instrument.phase(name)
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulate a config and draw its timing diagram.")
+    parser.add_argument("config", nargs="?", default="tickers.json")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help="where parsed and validated configs are kept")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse and validate the config every time")
+    args = parser.parse_args(argv)
+    if args.no_cache:
+        args.cache_dir = None
+    return args
 
 if __name__ == "__main__":
-    main("tickers.json")
+    args = _parse_args()
+    main(args.config, args.cache_dir)
 
 
@@ -0,0 +1,290 @@
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from canvas import Canvas
+from main import simulate
+from signals import vcd
+from signals.schema import CACHE_DIR, CACHE_HOME, SCHEMA, load_records
+
+# Bump when rendering changes, so older results are no longer served.
+RESULTS_VERSION = 1
+RESULTS_DIR = os.path.join(CACHE_HOME, "renders")
+MAX_BYTES = 512 * 10**6
+# Config keys the diagram depends on, other than the signals and canvas.
+SIMULATION_KEYS = ("time", "periodic", "cycles")
+
+
+class ResultCache():
+    # Rendered diagrams by key, as files in `directory`. A file is touched
+    # whenever it is used, and the least recently used files are removed
+    # once they take more than max_bytes together. The service uses it from
+    # executor threads; the lock guards the entries.
+    def __init__(self, directory=RESULTS_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".tmp"):
+                continue
+            stat = os.stat(os.path.join(directory, name))
+            entries.append((stat.st_mtime, name, stat.st_size))
+        self.entries = OrderedDict((name, size)
+                                   for _, name, size in sorted(entries))
+        self.size = sum(self.entries.values())
+
+    def get(self, key, format):
+        name = f"{key}.{format}"
+        with self.lock:
+            if name not in self.entries:
+                return None
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                result = f.read()
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self._forget(name)
+            return None
+        with self.lock:
+            if name in self.entries:
+                self.entries.move_to_end(name)
+        return result
+
+    def put(self, key, format, result):
+        name = f"{key}.{format}"
+        _write(os.path.join(self.directory, name), result)
+        with self.lock:
+            self._forget(name)
+            self.entries[name] = len(result)
+            self.size += len(result)
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                oldest = next(iter(self.entries))
+                self._forget(oldest)
+                try:
+                    os.remove(os.path.join(self.directory, oldest))
+                except OSError:
+                    pass
+
+    def _forget(self, name):
+        size = self.entries.pop(name, None)
+        if size is not None:
+            self.size -= size
+
+
+class BatchReport():
+    # `hits` counts the configs served from the cache, `rendered` the
+    # results rendered for the others, once per key, leaving out renders
+    # that failed.
+    def __init__(self, configs, unique, hits, rendered, errors, elapsed):
+        self.configs = configs
+        self.unique = unique
+        self.hits = hits
+        self.rendered = rendered
+        self.errors = errors
+        self.elapsed = elapsed
+
+    @property
+    def misses(self):
+        return self.configs - self.hits
+
+    @property
+    def hit_ratio(self):
+        return self.hits / self.configs if self.configs else 0.0
+
+    @property
+    def throughput(self):
+        return self.configs / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self):
+        return (f"{self.configs} configs, {self.unique} unique, "
+                f"{self.hits} cached, {self.rendered} rendered, "
+                f"{self.errors} failed, hit ratio {self.hit_ratio:.2f}, "
+                f"{self.throughput:.1f} configs/s in {self.elapsed:.2f}s")
+
+
+class RenderService():
+    # Renders batches of configs, as main takes them, to their canvas
+    # output. Configs are keyed by a hash of their validated signals, canvas
+    # settings and simulation time, so configs that only differ in where
+    # they are written are rendered once, and a result rendered before is
+    # served from the cache. Only the rest are simulated and rendered, in a
+    # process pool. Tiles, live rendering, sinks and VCD output are not
+    # part of a result and are left out.
+    def __init__(self, cache=None, workers=None, config_cache=CACHE_DIR):
+        self.cache = ResultCache() if cache is None else cache
+        self.workers = workers or os.cpu_count() or 1
+        self.config_cache = config_cache
+        self.executor = None
+        # Results being rendered, by key, shared by the batches asking for
+        # them.
+        self.pending = {}
+
+    async def __aenter__(self):
+        self.executor = ProcessPoolExecutor(self.workers)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        # Waits for the workers without blocking the event loop.
+        executor, self.executor = self.executor, None
+        await asyncio.get_running_loop().run_in_executor(None,
+                                                         executor.shutdown)
+
+    async def render_batch(self, filenames):
+        # Renders every config in `filenames` and returns a result for each,
+        # as {"config", "key", "output", "cached", "error"}, and the
+        # BatchReport of the batch.
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        jobs = await asyncio.gather(
+            *(loop.run_in_executor(None, self._prepare, filename)
+              for filename in filenames),
+            return_exceptions=True)
+
+        results = []
+        groups = {}
+        for filename, job in zip(filenames, jobs):
+            result = {"config": filename, "key": None, "output": None,
+                      "cached": False, "error": None}
+            results.append(result)
+            if isinstance(job, Exception):
+                result["error"] = str(job)
+                continue
+            result["key"], result["output"] = job[0], job[3]
+            groups.setdefault(job[0], []).append((result, job))
+
+        served = await asyncio.gather(*(self._serve(group)
+                                        for group in groups.values()))
+        hits = sum(len(group) for group, (hit, _) in zip(groups.values(),
+                                                         served)
+                   if hit)
+        rendered = sum(1 for _, done in served if done)
+        errors = sum(1 for result in results if result["error"] is not None)
+        report = BatchReport(len(filenames), len(groups), hits, rendered,
+                             errors, time.perf_counter() - start)
+        return results, report
+
+    def _prepare(self, filename):
+        # (key, format, job, output) of a config.
+        data, records = load_records(filename, self.config_cache)
+        if records is None and "vcd" not in data:
+            raise ValueError("Input file malformed. Missing 'signals'.")
+        if "canvas" not in data:
+            raise ValueError("Input file malformed. Missing 'canvas'.")
+        canvas = dict(data["canvas"])
+        output = canvas.pop("output", None)
+        format = "svg" if canvas.get("backend") == "svg" else "png"
+
+        job = {key: data[key] for key in SIMULATION_KEYS if key in data}
+        job["canvas"] = canvas
+        described = dict(job, version=RESULTS_VERSION, format=format,
+                         signals=records)
+        if "vcd" in data:
+            job["vcd"] = data["vcd"]
+            with open(data["vcd"], "rb") as f:
+                described["vcd"] = hashlib.sha256(f.read()).hexdigest()
+        described = json.dumps(described, sort_keys=True)
+        key = hashlib.sha256(described.encode()).hexdigest()
+        return key, format, (job, records, format), output
+
+    async def _serve(self, group):
+        # Serves the configs of one key. Returns whether the result was
+        # cached, and whether it was rendered without an error.
+        loop = asyncio.get_running_loop()
+        key, format, job, _ = group[0][1]
+        # The cache reads and writes files, off the event loop like the
+        # outputs.
+        result = await loop.run_in_executor(None, self.cache.get, key, format)
+        cached = result is not None
+        rendered = False
+        try:
+            if not cached:
+                if key not in self.pending:
+                    self.pending[key] = loop.run_in_executor(
+                        self.executor, _render, *job)
+                try:
+                    result = await self.pending[key]
+                finally:
+                    self.pending.pop(key, None)
+                rendered = True
+                await loop.run_in_executor(None, self.cache.put, key, format,
+                                           result)
+            for entry, (_, _, _, output) in group:
+                entry["cached"] = cached
+                if output is not None:
+                    await loop.run_in_executor(None, _write, output, result)
+        except Exception as error:
+            for entry, _ in group:
+                entry["error"] = f"{type(error).__name__}: {error}"
+        return cached, rendered
+
+
+def _render(job, records, format):
+    # The diagram of a config as PNG or SVG bytes.
+    if "vcd" in job:
+        signals = vcd.read(job["vcd"])
+    else:
+        signals = simulate(job, signals=SCHEMA.build(records))
+    canvas = Canvas(job["canvas"])
+    for signal in signals:
+        canvas.add_signal(signal)
+    if format == "svg":
+        svg_file = io.StringIO()
+        canvas.render(svg_file)
+        return svg_file.getvalue().encode()
+    canvas.render()
+    png_file = io.BytesIO()
+    canvas.image.save(png_file, "PNG")
+    return png_file.getvalue()
+
+
+def _write(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+async def _run(args):
+    cache = ResultCache(args.cache_dir, int(args.max_mb * 10**6))
+    async with RenderService(cache, args.workers) as service:
+        if args.configs:
+            batches = [args.configs]
+        else:
+            # A batch per line of config files, until stdin is closed.
+            batches = (line.split() for line in sys.stdin if line.strip())
+        for number, filenames in enumerate(batches, 1):
+            results, report = await service.render_batch(filenames)
+            for result in results:
+                if result["error"] is not None:
+                    print(f"{result['config']}: {result['error']}",
+                          file=sys.stderr)
+            print(f"batch {number}: {report}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Render batches of configs, serving unchanged diagrams "
+                    "from a cache. Without configs, reads a batch of config "
+                    "files per line from stdin.")
+    parser.add_argument("configs", nargs="*")
+    parser.add_argument("--cache-dir", default=RESULTS_DIR)
+    parser.add_argument("--max-mb", type=float, default=MAX_BYTES / 10**6)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
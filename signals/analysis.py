@@ -0,0 +1,230 @@
+import math
+
+import numpy as np
+
+# Timing queries over the histories of simulated signals. Every query takes
+# a Signal or a History, works on the whole of its times and codes at once
+# and can be limited to the transitions with start <= time < end. Times
+# with no answer are NaN.
+
+
+class Transitions():
+  # The transitions of a history as arrays: the time of each, the code of
+  # the state it went to, and the states by code. The state before the
+  # first transition has a code too, even if nothing returns to it. The
+  # arrays are views of the history; queries return copies.
+  __slots__ = ("times", "after", "first", "states")
+
+  def __init__(self, history, start=None, end=None):
+    times = np.asarray(history.times)
+    codes = np.asarray(history.codes)
+    if len(times) != len(history) - 1:
+      raise ValueError("Only part of the history is in memory. Close the "
+                       "HistorySink first.")
+    first = 0 if start is None else int(np.searchsorted(times, start))
+    last = len(times) if end is None else int(np.searchsorted(times, end))
+    last = max(first, last)
+    self.times = times[first:last]
+    self.after = codes[first:last]
+    self.states = list(history.states)
+    if first:
+      self.first = int(codes[first - 1])
+    else:
+      self.first = self.code(history.initial_state)
+      if self.first < 0:
+        self.first = len(self.states)
+        self.states.append(history.initial_state)
+
+  def code(self, state):
+    # -1 for a state the history never took.
+    if state in self.states:
+      return self.states.index(state)
+    return -1
+
+  def before(self):
+    before = np.empty(len(self.after), dtype=np.int64)
+    if len(before):
+      before[0] = self.first
+      before[1:] = self.after[:-1]
+    return before
+
+  def into(self, state):
+    code = self.code(state)
+    if code < 0:
+      return np.zeros(len(self.after), dtype=bool)
+    return self.after == code
+
+  def select(self, into=None, out_of=None):
+    # The times of the transitions into and out of the given states.
+    if into is None and out_of is None:
+      return np.array(self.times)
+    keep = np.ones(len(self.times), dtype=bool)
+    if into is not None:
+      keep &= self.into(into)
+    if out_of is not None:
+      code = self.code(out_of)
+      keep &= (self.before() == code) if code >= 0 else False
+    return self.times[keep]
+
+
+def edges(signal, into=None, out_of=None, start=None, end=None):
+  return _transitions(signal, start, end).select(into, out_of)
+
+
+def state_at(signal, times):
+  # The state at each of `times`, as value_at, for many times at once.
+  history = _history(signal)
+  transitions = Transitions(history)
+  index = np.searchsorted(transitions.times, np.asarray(times, dtype=float),
+                          side="right")
+  codes = np.concatenate(([transitions.first], transitions.after))
+  return np.array(transitions.states, dtype=object)[codes[index]]
+
+
+def pulse_widths(signal, state=None, start=None, end=None):
+  # The time from every transition to the next, for those into `state`
+  # if given, as (times, widths). The last transition has no width yet.
+  transitions = _transitions(signal, start, end)
+  times = transitions.times
+  widths = np.diff(times)
+  if state is not None:
+    keep = transitions.into(state)[:-1]
+    return times[:-1][keep], widths[keep]
+  return np.array(times[:-1]), widths
+
+
+def min_pulse_width(signal, state=None, start=None, end=None):
+  # (width, time) of the narrowest pulse, or None without one.
+  times, widths = pulse_widths(signal, state, start, end)
+  if not len(widths):
+    return None
+  index = int(np.argmin(widths))
+  return float(widths[index]), float(times[index])
+
+
+def glitches(signal, max_width, state=None, start=None, end=None):
+  # The pulses narrower than max_width, as (times, widths).
+  times, widths = pulse_widths(signal, state, start, end)
+  keep = widths < max_width
+  return times[keep], widths[keep]
+
+
+def edge_to_edge(a, b, window=math.inf, a_into=None, b_into=None,
+                 start=None, end=None):
+  # For every edge of `a`, the time to the first edge of `b` at or after
+  # it and within `window`, as (times, latencies).
+  a_times = edges(a, a_into, start=start, end=end)
+  b_times = edges(b, b_into, start=start)
+  latencies = np.full(len(a_times), np.nan)
+  index = np.searchsorted(b_times, a_times)
+  found = index < len(b_times)
+  latencies[found] = b_times[index[found]] - a_times[found]
+  latencies[latencies > window] = np.nan
+  return a_times, latencies
+
+
+def setup_hold(data, clock, clock_into="HIGH", start=None, end=None):
+  # For every edge of `clock` into `clock_into`, the time since the last
+  # transition of `data` and until its next one, as (times, setup, hold).
+  clock_times = edges(clock, clock_into, start=start, end=end)
+  data_times = edges(data)
+  index = np.searchsorted(data_times, clock_times, side="right")
+  setup = np.full(len(clock_times), np.nan)
+  hold = np.full(len(clock_times), np.nan)
+  before = index > 0
+  setup[before] = clock_times[before] - data_times[index[before] - 1]
+  after = index < len(data_times)
+  hold[after] = data_times[index[after]] - clock_times[after]
+  return clock_times, setup, hold
+
+
+def cause_latencies(signal, origin, start=None, end=None):
+  # From the causes of `signal`, the time from each edge of `origin` to the
+  # event it caused, as (event times, latencies).
+  event_times, orig_times, origs, names = _causes(signal)
+  if origin not in names:
+    return np.empty(0), np.empty(0)
+  keep = origs == names.index(origin)
+  if start is not None:
+    keep &= event_times >= start
+  if end is not None:
+    keep &= event_times < end
+  return event_times[keep], event_times[keep] - orig_times[keep]
+
+
+def causality_violations(signals, tolerance=0):
+  # Causes whose origin comes after the event, or where the origin signal
+  # has no transition at the time given, as (signal, event time, origin,
+  # origin time, problem).
+  if isinstance(signals, dict):
+    signals = signals.values()
+  signals = list(signals)
+  times = {signal.name: edges(signal) for signal in signals}
+  violations = []
+  for signal in signals:
+    if signal.causes is None:
+      continue
+    event_times, orig_times, origs, names = _causes(signal)
+    late = orig_times > event_times + tolerance
+    missing = np.zeros(len(origs), dtype=bool)
+    for origin in np.unique(origs).tolist():
+      mine = origs == origin
+      origin_times = times.get(names[origin], np.empty(0))
+      wanted = orig_times[mine]
+      index = np.searchsorted(origin_times, wanted - tolerance)
+      found = index < len(origin_times)
+      found[found] = origin_times[index[found]] <= wanted[found] + tolerance
+      missing[mine] = ~found
+    for problem, where in (("origin after event", late),
+                           ("no edge of origin", missing)):
+      for index in np.flatnonzero(where).tolist():
+        violations.append((signal.name, float(event_times[index]),
+                           names[origs[index]], float(orig_times[index]),
+                           problem))
+  return violations
+
+
+def assert_causality(signals, tolerance=0):
+  violations = causality_violations(signals, tolerance)
+  if violations:
+    lines = [f"{name} at {event_time}: {problem} {origin} at {orig_time}"
+             for name, event_time, origin, orig_time, problem
+             in violations[:10]]
+    raise AssertionError(f"{len(violations)} causality violations:\n" +
+                         "\n".join(lines))
+
+
+def _history(signal):
+  return getattr(signal, "history", signal)
+
+
+def _transitions(signal, start, end):
+  return Transitions(_history(signal), start, end)
+
+
+def _causes(signal):
+  # The causes of a signal as arrays of event time, origin time and origin,
+  # one entry per origin, with the origins numbered into a list of names.
+  # Mapped causes are read as they are.
+  causes = signal.causes
+  if causes is None:
+    raise ValueError(f"The causes of {signal.name} were not kept. They are "
+                     "only kept for visible signals with show_cause.")
+  records = getattr(causes, "records", None)
+  if records is not None:
+    return (np.asarray(records["event_time"], dtype=np.float64),
+            np.asarray(records["orig_time"], dtype=np.float64),
+            np.asarray(records["orig"], dtype=np.int64), causes.names)
+  numbers = {}
+  event_times = []
+  orig_times = []
+  origs = []
+  for cause in causes:
+    _, event_time = cause.event
+    for name, time in cause.dependencies.items():
+      event_times.append(event_time)
+      orig_times.append(time)
+      origs.append(numbers.setdefault(name, len(numbers)))
+  return (np.array(event_times, dtype=np.float64),
+          np.array(orig_times, dtype=np.float64),
+          np.array(origs, dtype=np.int64), list(numbers))
@@ -0,0 +1,192 @@
+from array import array
+
+import numpy as np
+
+# Columns rows are gathered into before they are added to the table.
+CHUNK_SIZE = 1 << 16
+
+
+class CauseTable():
+  # The causes of many signals as columns, one row per dependency of a
+  # cause: the signal of the event and its time, and the signal of the
+  # origin and its time. Signals are numbered in the order they are first
+  # seen. Rows are found by their event time, or by the span of time
+  # between origin and event, without going through them one by one.
+  #
+  # Rows are kept in runs, each indexed on its own, with every run at
+  # least twice the size of the next. Adding rows makes a new run and
+  # merges it into the ones before it while they are not much larger, so
+  # rows added while the table is queried, as a live render does, are
+  # indexed at a cost that depends on them rather than on the whole table.
+  __slots__ = ("names", "ids", "runs", "events", "event_times", "origs",
+               "orig_times")
+
+  def __init__(self):
+    self.names = []
+    self.ids = {}
+    self.runs = []
+    self._clear()
+
+  def id(self, name):
+    id = self.ids.get(name)
+    if id is None:
+      id = self.ids[name] = len(self.names)
+      self.names.append(name)
+    return id
+
+  def add(self, name, causes):
+    # The causes of signal `name`, either _Causes or the records of mapped
+    # causes, which are added as they are.
+    records = getattr(causes, "records", None)
+    if records is not None:
+      self._flush()
+      ids = np.array([self.id(orig) for orig in causes.names],
+                     dtype=np.int32)
+      count = len(records)
+      self._add_run((
+        np.full(count, self.id(name), dtype=np.int32),
+        np.asarray(records["event_time"], dtype=np.float64),
+        ids[np.asarray(records["orig"], dtype=np.intp)],
+        np.asarray(records["orig_time"], dtype=np.float64)))
+      return
+
+    events = self.events
+    event_times = self.event_times
+    origs = self.origs
+    orig_times = self.orig_times
+    ids = self.ids
+    last_name = None
+    for cause in causes:
+      event_name, event_time = cause.event
+      if event_name != last_name:
+        event = self.id(event_name)
+        last_name = event_name
+      for orig_name, orig_time in cause.dependencies.items():
+        orig = ids.get(orig_name)
+        if orig is None:
+          orig = self.id(orig_name)
+        events.append(event)
+        event_times.append(event_time)
+        origs.append(orig)
+        orig_times.append(orig_time)
+      if len(events) >= CHUNK_SIZE:
+        self._flush()
+        events = self.events
+        event_times = self.event_times
+        origs = self.origs
+        orig_times = self.orig_times
+
+  def get_columns(self):
+    # (events, event_times, origs, orig_times) of every row, in the order
+    # they were added.
+    self._flush()
+    if len(self.runs) > 1:
+      self.runs = [_Run(tuple(np.concatenate(column) for column
+                              in zip(*(run.columns for run in self.runs))))]
+    if not self.runs:
+      return (np.empty(0, np.int32), np.empty(0), np.empty(0, np.int32),
+              np.empty(0))
+    return self.runs[0].columns
+
+  def between(self, start=None, end=None):
+    # The rows with start <= event time < end, in the order added.
+    self._flush()
+    return self._rows([run.between(start, end) for run in self.runs])
+
+  def crossing(self, start, end):
+    # The rows whose arrow, from origin to event, spans some of the time
+    # from start to end, both included, in the order added.
+    self._flush()
+    return self._rows([run.crossing(start, end) for run in self.runs])
+
+  def _rows(self, found):
+    if len(self.runs) == 1:
+      return found[0]
+    if not self.runs:
+      return self.get_columns()
+    return tuple(np.concatenate(column) for column in zip(*found))
+
+  def _add_run(self, columns):
+    runs = self.runs
+    runs.append(_Run(columns))
+    while len(runs) > 1 and len(runs[-2]) < 2 * len(runs[-1]):
+      last = runs.pop()
+      runs[-1] = _Run(tuple(np.concatenate(column) for column
+                            in zip(runs[-1].columns, last.columns)))
+
+  def _flush(self):
+    if self.events:
+      self._add_run((
+        np.frombuffer(self.events, dtype=np.int32),
+        np.frombuffer(self.event_times, dtype=np.float64),
+        np.frombuffer(self.origs, dtype=np.int32),
+        np.frombuffer(self.orig_times, dtype=np.float64)))
+      self._clear()
+
+  def _clear(self):
+    self.events = array("i")
+    self.event_times = array("d")
+    self.origs = array("i")
+    self.orig_times = array("d")
+
+  def __len__(self):
+    return sum(len(run) for run in self.runs) + len(self.events)
+
+
+class _Run():
+  # Rows of a CauseTable with their indexes, made when first queried.
+  __slots__ = ("columns", "by_event", "by_span")
+
+  def __init__(self, columns):
+    self.columns = columns
+    self.by_event = None
+    self.by_span = None
+
+  def between(self, start, end):
+    columns = self.columns
+    times = columns[1]
+    if not len(times) or ((start is None or start <= times.min()) and
+                          (end is None or end > times.max())):
+      # Every row, as it is, without making the index.
+      return columns
+    if self.by_event is None:
+      order = np.argsort(columns[1], kind="stable")
+      self.by_event = (order, columns[1][order])
+    order, times = self.by_event
+    first = 0 if start is None else np.searchsorted(times, start)
+    last = len(times) if end is None else np.searchsorted(times, end)
+    rows = np.sort(order[first:last])
+    return tuple(column[rows] for column in columns)
+
+  def crossing(self, start, end):
+    columns = self.columns
+    if self.by_span is None:
+      self.by_span = IntervalIndex(np.minimum(columns[1], columns[3]),
+                                   np.maximum(columns[1], columns[3]))
+    rows = self.by_span.find(start, end)
+    return tuple(column[rows] for column in columns)
+
+  def __len__(self):
+    return len(self.columns[0])
+
+
+class IntervalIndex():
+  # Intervals sorted by where they begin, with the furthest end reached by
+  # any of them so far. The intervals overlapping a range then lie between
+  # the first that reaches its start and the last that begins before its
+  # end, and only those are looked at.
+  __slots__ = ("order", "lows", "highs", "reach")
+
+  def __init__(self, lows, highs):
+    self.order = np.argsort(lows, kind="stable")
+    self.lows = np.asarray(lows)[self.order]
+    self.highs = np.asarray(highs)[self.order]
+    self.reach = np.maximum.accumulate(self.highs)
+
+  def find(self, start, end):
+    # The indices of the intervals with low <= end and high >= start,
+    # in increasing order.
+    first = np.searchsorted(self.reach, start)
+    last = np.searchsorted(self.lows, end, side="right")
+    found = self.order[first:last][self.highs[first:last] >= start]
+    return np.sort(found)
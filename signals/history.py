@@ -0,0 +1,108 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# Transitions made at a time by History.repeat().
+REPEAT_BLOCK = 1 << 16
+
+
+class History():
+  __slots__ = ("initial_state", "times", "codes", "states", "state_codes")
+
+  def __init__(self, initial_state):
+    self.initial_state = initial_state
+    # Transition times and interned state codes are stored column-wise;
+    # the (None, initial_state) entry at index 0 is implicit.
+    self.times = array("d")
+    self.codes = array("B")
+    self.states = []
+    self.state_codes = {}
+
+  def code(self, state):
+    code = self.state_codes.get(state)
+    if code is None:
+      code = len(self.states)
+      if code == 256 and self.codes.typecode == "B":
+        self.codes = array("H", self.codes)
+      self.states.append(state)
+      self.state_codes[state] = code
+    return code
+
+  def add(self, time, state):
+    # code() may widen self.codes, so it runs before codes is looked up.
+    code = self.code(state)
+    self.times.append(time)
+    self.codes.append(code)
+
+  def append(self, entry):
+    time, state = entry
+    self.add(time, state)
+
+  def value_at(self, time):
+    index = bisect_right(self.times, time)
+    if index == 0:
+      return self.initial_state
+    return self.states[self.codes[index - 1]]
+
+  def slice(self, start, end):
+    # Transitions with start <= time < end, starting from the state that was
+    # in effect just before start. Times are kept as they are.
+    first = bisect_left(self.times, start)
+    last = bisect_left(self.times, end, first)
+    initial_state = self.initial_state
+    if first:
+      initial_state = self.states[self.codes[first - 1]]
+    history = History(initial_state)
+    history.times = self.times[first:last]
+    history.codes = self.codes[first:last]
+    history.states = list(self.states)
+    history.state_codes = dict(self.state_codes)
+    return history
+
+  def repeat(self, first, period, count):
+    # Appends the transitions from times[first] on `count` more times, each
+    # copy `period` later than the one before.
+    times, codes = self._segment(first)
+    if not len(times):
+      return
+    copies = max(1, REPEAT_BLOCK // len(times))
+    for done in range(0, count, copies):
+      shifts = np.arange(done + 1, min(count, done + copies) + 1) * period
+      self._extend((shifts[:, None] + times).ravel(),
+                   np.tile(codes, len(shifts)))
+
+  def _segment(self, first):
+    return np.array(self.times[first:]), np.array(self.codes[first:])
+
+  def _extend(self, times, codes):
+    self.times.frombytes(times.tobytes())
+    self.codes.frombytes(codes.tobytes())
+
+  def __len__(self):
+    return len(self.times) + 1
+
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [self[i] for i in range(*index.indices(len(self)))]
+    if index < 0:
+      index += len(self)
+    if index == 0:
+      return (None, self.initial_state)
+    if index < 0 or index > len(self.times):
+      raise IndexError("history index out of range")
+    return (self.times[index - 1], self.states[self.codes[index - 1]])
+
+  def __iter__(self):
+    yield (None, self.initial_state)
+    states = self.states
+    for time, code in zip(self.times, self.codes):
+      yield (time, states[code])
+
+  def __eq__(self, other):
+    if isinstance(other, (History, list)):
+      return list(self) == list(other)
+    return NotImplemented
+
+  def __repr__(self):
+    return f"History({list(self)!r})"
@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+import json
+import time
+
+
+class Instrument():
+  # Opt-in timers and counters for the event loop and the renderer. The
+  # instrumented code checks for an Instrument once per run or per signal
+  # and otherwise takes its usual path, so leaving it off costs nothing.
+  def __init__(self):
+    self.phases = {}
+    self.counters = {}
+    self.values = {}
+
+  @contextmanager
+  def phase(self, name):
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.add_time(name, time.perf_counter() - start)
+
+  def add_time(self, name, seconds, calls=1):
+    phase = self.phases.get(name)
+    if phase is None:
+      phase = self.phases[name] = [0, 0.0]
+    phase[0] += calls
+    phase[1] += seconds
+
+  def count(self, group, key, n=1):
+    counts = self.counters.get(group)
+    if counts is None:
+      counts = self.counters[group] = {}
+    counts[key] = counts.get(key, 0) + n
+
+  def set(self, name, value):
+    self.values[name] = value
+
+  def maximum(self, name, value):
+    if name not in self.values or self.values[name] < value:
+      self.values[name] = value
+
+  def report(self):
+    return {
+      "phases": {name: {"calls": calls, "seconds": seconds}
+                 for name, (calls, seconds) in self.phases.items()},
+      "counters": self.counters,
+      "values": self.values,
+    }
+
+  def dump(self, file):
+    if isinstance(file, str):
+      with open(file, "w") as f:
+        json.dump(self.report(), f, indent=1)
+    else:
+      json.dump(self.report(), file, indent=1)
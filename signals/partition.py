@@ -0,0 +1,313 @@
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+import os
+import time
+
+from signals.signal import CounterSignal, FlipSignal
+from signals.utils import RunStats, SignalCollection, _check_options
+
+# The domains of a worker process, see _init_worker.
+_group = None
+
+
+class PartitionedCollection():
+  # A SignalCollection split into domains, the connected components of the
+  # dependency graph, each simulated by a SignalCollection of its own.
+  # Domains are shared out between worker processes, and the signals come
+  # back with their histories and causes once run, in sc.all.
+  #
+  # Boundaries are counters whose dependencies are left in other domains,
+  # see domains(). A boundary triggered at some time only changes at least
+  # its delay later, the lookahead, so the domains run in windows of
+  # lookahead, and between windows each worker is handed the transitions
+  # the others made and passes them to its boundaries, see
+  # SignalCollection.deliver. A counter triggered again before it changed
+  # is rescheduled, so a boundary must not be triggered more often than
+  # its delay; running past a trigger is an error.
+  def __init__(self, workers=None, boundaries=(), periodic=False,
+               queue="heap", cycles=False, queue_width=None):
+    _check_options(periodic, queue, cycles)
+    self.workers = workers or os.cpu_count() or 1
+    self.boundaries = set(boundaries)
+    self.options = {"periodic": periodic, "queue": queue, "cycles": cycles,
+                    "queue_width": queue_width}
+    self.all = {}
+    self.domains = None
+    self.boundary = None
+    self.lookahead = None
+    self.until = 0
+
+  def add(self, signal):
+    if self.domains is not None:
+      raise RuntimeError("Signals cannot be added once compiled.")
+    if signal.name in self.all:
+      raise RuntimeError("Signal with the same name already exists.")
+    for dependency in signal.dependencies or ():
+      if dependency not in self.all:
+        raise KeyError("All dependencies has not been registred.")
+    self.all[signal.name] = signal
+
+  def compile(self):
+    for name in self.boundaries:
+      if not isinstance(self.all.get(name), CounterSignal):
+        raise ValueError(f"Boundary {name} is not a counter.")
+    self.domains, self.boundary = domains(list(self.all.values()),
+                                          self.boundaries)
+    if self.boundary:
+      self.lookahead = min(_min_delay(self.all[name])
+                           for name in self.boundary)
+      if self.lookahead <= 0:
+        raise ValueError("Boundaries need a positive delay.")
+    return self
+
+  def run(self, until_time):
+    # Runs every domain until until_time. The workers only live for the
+    # run, so a partitioned collection runs once.
+    if self.until:
+      raise RuntimeError("A partitioned collection runs once.")
+    if self.domains is None:
+      self.compile()
+    start = time.perf_counter()
+    jobs, exports, imports = self._jobs()
+    if len(jobs) == 1:
+      groups = [_Local(_Group(jobs[0], exports[0], self.options))]
+    else:
+      groups = [ProcessPoolExecutor(1, initializer=_init_worker,
+                                    initargs=(job, names, self.options))
+                for job, names in zip(jobs, exports)]
+
+    try:
+      # Without boundaries the domains never meet, and one window will do.
+      window = self.lookahead if self.boundary else until_time
+      inboxes = [[] for _ in groups]
+      events = 0
+      windows = 0
+      now = 0
+      while now < until_time:
+        windows += 1
+        now = min(until_time, windows * window)
+        futures = [group.submit(_run_window, now, inbox)
+                   for group, inbox in zip(groups, inboxes)]
+        inboxes = self._route(futures, imports, len(groups))
+        events += sum(future.result()[0] for future in futures)
+      futures = [group.submit(_finish, inbox)
+                 for group, inbox in zip(groups, inboxes)]
+      results = [future.result() for future in futures]
+    finally:
+      for group in groups:
+        group.shutdown()
+
+    signals = {}
+    pending = 0
+    for domain_signals, domain_pending in results:
+      signals.update((signal.name, signal) for signal in domain_signals)
+      pending += domain_pending
+    self.all = {name: signals[name] for name in self.all}
+    self.until = until_time
+    return RunStats(events, time.perf_counter() - start, pending)
+
+  def _jobs(self):
+    # Shares the domains out, largest first to the worker with the fewest
+    # signals. For each worker: its job, the domains with the signals of
+    # other domains they read and their states, and the names of its
+    # signals other domains read. With the workers reading each name.
+    count = min(self.workers, len(self.domains)) or 1
+    shares = [[] for _ in range(count)]
+    loads = [0] * count
+    for domain in sorted(self.domains, key=len, reverse=True):
+      index = loads.index(min(loads))
+      shares[index].append(domain)
+      loads[index] += len(domain)
+
+    jobs = []
+    imports = {}
+    for index, share in enumerate(shares):
+      job = []
+      for domain in share:
+        names = {signal.name for signal in domain}
+        remotes = {}
+        for signal in domain:
+          for dependency in signal.dependencies or ():
+            if dependency not in names and dependency not in remotes:
+              remotes[dependency] = self.all[dependency].state
+              readers = imports.setdefault(dependency, [])
+              if index not in readers:
+                readers.append(index)
+        job.append((domain, list(remotes.items())))
+      jobs.append(job)
+    exports = [[signal.name for domain in share for signal in domain
+                if signal.name in imports] for share in shares]
+    return jobs, exports, imports
+
+  def _route(self, futures, imports, count):
+    # The transitions made in a window, by the worker they go to, in time
+    # order.
+    inboxes = [[] for _ in range(count)]
+    for future in futures:
+      for transition in future.result()[1]:
+        for index in imports[transition[1]]:
+          inboxes[index].append(transition)
+    for inbox in inboxes:
+      inbox.sort(key=itemgetter(0))
+    return inboxes
+
+
+def domains(signals, boundaries=()):
+  # The signals as connected components of their dependency graph, each a
+  # list in the order given, and the names of the boundaries kept. The
+  # dependencies of boundaries do not join domains, but a boundary that
+  # ends up in the domain of one of its dependencies is not kept, and the
+  # domains are found again without it.
+  by_name = {signal.name: signal for signal in signals}
+  boundary = {name for name in boundaries
+              if by_name[name].dependencies}
+  while True:
+    parents = {name: name for name in by_name}
+    for signal in signals:
+      if signal.name not in boundary:
+        for dependency in signal.dependencies or ():
+          _union(parents, signal.name, dependency)
+    joined = {name for name in boundary
+              if _find(parents, name) in
+              {_find(parents, dependency)
+               for dependency in by_name[name].dependencies}}
+    if not joined:
+      break
+    boundary -= joined
+
+  components = {}
+  for signal in signals:
+    components.setdefault(_find(parents, signal.name), []).append(signal)
+  return list(components.values()), boundary
+
+
+def _min_delay(signal):
+  if signal.delay is None:
+    return 0
+  if isinstance(signal.delay, dict):
+    return min(signal.delay.values(), default=0)
+  return signal.delay
+
+
+def _find(parents, name):
+  while parents[name] != name:
+    parents[name] = parents[parents[name]]
+    name = parents[name]
+  return name
+
+
+def _union(parents, a, b):
+  a = _find(parents, a)
+  b = _find(parents, b)
+  if a != b:
+    parents[b] = a
+
+
+class _Remote(FlipSignal):
+  # Stands in for a signal of another domain, so the signals reading it
+  # can be added. It never ticks; its transitions are delivered.
+  __slots__ = ()
+
+  def __init__(self, name, state):
+    super().__init__(name, state)
+    self.dependencies = []
+
+
+class _Group():
+  # The domains of one worker, a SignalCollection each.
+  def __init__(self, job, exports, options):
+    self.collections = []
+    self.signals = []
+    self.receivers = {}
+    signals = {}
+    for domain, remotes in job:
+      # The cycles found in a domain that is handed transitions would
+      # leave them out.
+      sc = SignalCollection(periodic=options["periodic"],
+                            queue=options["queue"],
+                            queue_width=options["queue_width"],
+                            cycles=options["cycles"] and not remotes)
+      for name, state in remotes:
+        sc.add(_Remote(name, state))
+        self.receivers.setdefault(name, []).append(sc)
+      for signal in domain:
+        sc.add(signal)
+        signals[signal.name] = signal
+      sc.compile()
+      self.collections.append(sc)
+      self.signals.extend(domain)
+    # [signal, transitions sent, state last sent] of the signals read by
+    # other domains.
+    self.exports = [[signals[name], 0, signals[name].state]
+                    for name in exports]
+
+  def run(self, until_time, transitions):
+    # Runs the domains until until_time, after the transitions of other
+    # domains, and returns the events run and the transitions made for
+    # other domains, as (time, name, old_state, new_state).
+    self._deliver(transitions)
+    events = 0
+    for sc in self.collections:
+      events += sc.run(until_time).events
+    sent = []
+    for export in self.exports:
+      signal, count, state = export
+      history = signal.history
+      states = history.states
+      codes = history.codes
+      times = history.times
+      for index in range(count, len(times)):
+        new_state = states[codes[index]]
+        sent.append((times[index], signal.name, state, new_state))
+        state = new_state
+      export[1] = len(times)
+      export[2] = state
+    return events, sent
+
+  def finish(self, transitions):
+    # The transitions of the last window still add causes.
+    self._deliver(transitions)
+    return self.signals, sum(len(sc.heap) for sc in self.collections)
+
+  def _deliver(self, transitions):
+    for current_time, name, old_state, new_state in transitions:
+      for sc in self.receivers[name]:
+        sc.deliver(name, old_state, new_state, current_time)
+
+
+class _Local():
+  # A _Group run in this process, with the submit() of an executor.
+  def __init__(self, group):
+    self.group = group
+
+  def submit(self, function, *args):
+    global _group
+    _group = self.group
+    try:
+      return _Done(function(*args))
+    finally:
+      _group = None
+
+  def shutdown(self):
+    pass
+
+
+class _Done():
+  def __init__(self, value):
+    self.value = value
+
+  def result(self):
+    return self.value
+
+
+def _init_worker(job, exports, options):
+  global _group
+  _group = _Group(job, exports, options)
+
+
+def _run_window(until_time, transitions):
+  return _group.run(until_time, transitions)
+
+
+def _finish(transitions):
+  return _group.finish(transitions)
@@ -0,0 +1,433 @@
+from bisect import bisect_left, bisect_right
+import math
+from operator import itemgetter
+
+import numpy as np
+
+from signals.signal import TickerSignal, CounterSignal, _Cause
+
+# Number of edges of the fastest ticker computed per block. Blocks keep the
+# event feed for loop-driven dependents bounded in memory.
+BLOCK_EDGES = 1 << 16
+
+# Relative margin used when proving that a counter's delay is shorter than
+# the spacing between its triggers.
+SPACING_MARGIN = 1e-9
+
+# The number of the event adding the signals, which pushes the first edges.
+ADDED = (-1, 0)
+
+
+class _Orbit():
+  # The states a FlipSignal walks through starting from its initial state:
+  # a lead-in of `mu` states followed by a cycle of `lam` states.
+  def __init__(self, states, initial_state):
+    orbit = []
+    seen = {}
+    state = initial_state
+    while state not in seen:
+      seen[state] = len(orbit)
+      orbit.append(state)
+      state = states[(states.index(state) + 1) % len(states)]
+    self.states = orbit
+    self.mu = seen[state]
+    self.lam = len(orbit) - self.mu
+
+  def successor(self, position):
+    position += 1
+    if position < len(self.states):
+      return position
+    return self.mu
+
+  def positions(self, start, count):
+    ks = np.arange(start, start + count, dtype=np.int64)
+    return np.where(ks < self.mu, ks, self.mu + (ks - self.mu) % self.lam)
+
+
+class _PeriodicNode():
+  def __init__(self, signal, order):
+    self.signal = signal
+    self.order = order
+    self.orbit = _Orbit(signal.states, signal.state)
+    history = signal.history
+    codes = [history.code(state) for state in self.orbit.states]
+    self.codes = np.array(codes, dtype=_code_dtype(history))
+    self.edges = 0
+    self.loop_dependents = []
+    self.fed = False
+    self.chunk_start = 0
+    self.chunk_times = np.empty(0)
+    # The places of the chunk's edges in the order the event loop runs
+    # them, see PeriodicSchedule.extend, and those of the last chunk with
+    # edges.
+    self.places = np.empty(0, dtype=np.int64)
+    self.previous_start = 0
+    self.previous_places = self.places
+
+  def _emit(self, times):
+    history = self.signal.history
+    count = len(times)
+    if len(self.chunk_times):
+      self.previous_start = self.chunk_start
+      self.previous_places = self.places
+    self.chunk_start = self.edges
+    self.chunk_times = times
+    if not count:
+      return
+    positions = self.orbit.positions(self.edges + 1, count)
+    history.times.frombytes(times.tobytes())
+    history.codes.frombytes(
+      self.codes[positions].astype(_code_dtype(history)).tobytes())
+    self.edges += count
+    self.signal.state = self.orbit.states[int(positions[-1])]
+
+  def place(self, edge):
+    # The place of an edge of an earlier chunk.
+    index = edge - self.chunk_start
+    if index >= 0:
+      return int(self.places[index])
+    return int(self.previous_places[edge - self.previous_start])
+
+  def transitions(self):
+    count = len(self.chunk_times)
+    old = self.orbit.positions(self.chunk_start, count).tolist()
+    new = self.orbit.positions(self.chunk_start + 1, count).tolist()
+    states = self.orbit.states
+    return [states[p] for p in old], [states[p] for p in new]
+
+
+class _TickerNode(_PeriodicNode):
+  def __init__(self, signal, order):
+    super().__init__(signal, order)
+    self.half = signal.period / 2
+    self.next_time = signal.first_tick()
+    self.spacing = self.half
+
+  def extend(self, until_time):
+    if self.next_time > until_time:
+      self._emit(np.empty(0))
+      return
+    # np.cumsum adds sequentially, so the times match the event loop's
+    # repeated `current_time + period / 2` bit for bit.
+    count = int((until_time - self.next_time) / self.half) + 2
+    steps = np.full(count, self.half)
+    steps[0] = self.next_time
+    times = np.cumsum(steps)
+    while times[-1] <= until_time:
+      steps = np.full(count, self.half)
+      steps[0] = times[-1] + self.half
+      times = np.concatenate((times, np.cumsum(steps)))
+    cut = int(np.searchsorted(times, until_time, side="right"))
+    self.next_time = float(times[cut])
+    self._emit(times[:cut])
+
+  def parents(self, first, sources):
+    # Each edge is pushed by the one before, the first when added.
+    count = len(self.chunk_times)
+    slots = np.arange(first - 1, first + count - 1)
+    places = np.full(count, -1, dtype=np.int64)
+    indexes = np.zeros(count, dtype=np.int64)
+    if count:
+      slots[0] = -1
+      if self.chunk_start:
+        places[0] = self.place(self.chunk_start - 1)
+      else:
+        indexes[0] = self.order
+    return slots, places, indexes
+
+  def next_times(self):
+    return (self.chunk_times + self.half).tolist()
+
+
+class _CounterNode(_PeriodicNode):
+  def __init__(self, signal, order, source):
+    super().__init__(signal, order)
+    self.source = source
+    self.triggers = 0
+    self.push_index = 0
+    # The fire carried over to a later chunk, the source edge that
+    # triggered it and its place, once looked up.
+    self.pending = None
+    self.pending_parent = None
+    self.pending_place = None
+    self.carried = None
+    self.chunk_parents = np.empty(0, dtype=np.int64)
+
+    trigger = (signal.old_state_trigger, signal.new_state_trigger)
+    src = source.orbit
+    self.matches = np.array(
+      [(src.states[p], src.states[src.successor(p)]) == trigger
+       for p in range(len(src.states))], dtype=bool)
+
+    delay = signal.delay
+    if delay is None:
+      delay = 0
+    if isinstance(delay, dict):
+      delays = [delay[state] for state in self.orbit.states]
+    else:
+      delays = [delay] * len(self.orbit.states)
+    self.delays = np.array(delays, dtype=np.float64)
+
+    # Lower bound on the time between consecutive triggers: the fewest
+    # source edges between two matching transitions times the source's
+    # edge spacing.
+    matched = src.positions(0, 2 * len(src.states) + 1)
+    matched = np.flatnonzero(self.matches[matched])
+    if len(matched) < 2:
+      self.trigger_spacing = math.inf
+    else:
+      self.trigger_spacing = int(np.diff(matched).min()) * source.spacing
+    self.spacing = self.trigger_spacing - (max(delays) - min(delays))
+
+  def periodic(self):
+    if min(self.delays) < 0:
+      return False
+    if math.isinf(self.trigger_spacing):
+      return True
+    return max(self.delays) < self.trigger_spacing * (1 - SPACING_MARGIN)
+
+  def extend(self, until_time):
+    source = self.source
+    old = source.orbit.positions(source.chunk_start, len(source.chunk_times))
+    matched = self.matches[old]
+    trigger_times = source.chunk_times[matched]
+    parents = source.chunk_start + np.flatnonzero(matched)
+
+    # Every earlier trigger has fired by the time the next one arrives, so
+    # the state used to pick the delay is the one after `triggers` flips.
+    positions = self.orbit.positions(self.triggers, len(trigger_times))
+    fires = trigger_times + self.delays[positions]
+    self.triggers += len(trigger_times)
+    self._add_causes(trigger_times, fires)
+
+    nexts = np.append(trigger_times, math.inf)
+    carried = self.pending is not None
+    if not carried:
+      nexts = nexts[1:]
+    else:
+      # The source has moved on a chunk since, the edge is in its last.
+      if self.fed and self.pending_place is None:
+        self.pending_place = source.place(self.pending_parent)
+      fires = np.insert(fires, 0, self.pending)
+      parents = np.insert(parents, 0, self.pending_parent)
+    if not np.all(fires < nexts):
+      raise RuntimeError(
+        f"Signal {self.signal.name} is retriggered before it fires.")
+
+    cut = int(np.searchsorted(fires, until_time, side="right"))
+    place = self.pending_place
+    self.pending = None
+    self.pending_parent = None
+    self.pending_place = None
+    if cut < len(fires):
+      self.pending = float(fires[cut])
+      self.pending_parent = int(parents[cut])
+      if carried and not cut:
+        self.pending_place = place
+    self.carried = place if carried and cut else None
+    self.chunk_parents = parents[:cut]
+    self._emit(fires[:cut])
+
+  def parents(self, first, sources):
+    # Each fire is pushed by the source edge that triggered it, in this
+    # chunk of the source unless carried over.
+    source = self.source
+    count = len(self.chunk_times)
+    edges = self.chunk_parents - source.chunk_start
+    slots = np.where(edges >= 0, sources[source] + edges, -1)
+    places = np.full(count, -1, dtype=np.int64)
+    if self.carried is not None:
+      places[0] = self.carried
+    return slots, places, np.full(count, self.push_index, dtype=np.int64)
+
+  def next_times(self):
+    return [None] * len(self.chunk_times)
+
+  def _add_causes(self, trigger_times, fires):
+    orig_name = self.source.signal.name
+    name = self.signal.name
+    causes = self.signal.causes
+    if causes is None:
+      return
+    for orig_time, event_time in zip(trigger_times.tolist(), fires.tolist()):
+      causes.append(_Cause(orig_name=orig_name, orig_time=orig_time,
+                           event_name=name, event_time=event_time))
+
+
+class PeriodicSchedule():
+  # Simultaneous events run in the order the event loop pushed them: by the
+  # order the events that pushed them ran in, then their place among that
+  # event's pushes, the signal itself first and then dependent[] in order.
+  # Edges are pushed by edges, so the order of those replayed does not
+  # depend on the heap, and is found a block at a time, numbering each
+  # edge with its place. Events of the heap are numbered by the place of
+  # the next edge and a count, as (place, count), and the edges as
+  # (place, inf). scheduled[] keeps the key of the signals on the heap, the
+  # number of the event that pushed them and their place among its pushes.
+  def __init__(self):
+    self.nodes = {}
+    self.until = 0
+    self.span = math.inf
+    self.feed = []
+    self.position = 0
+    self.orders = {}
+    self.scheduled = {}
+    # The block's replayed edges in order, by time, the place of the edge
+    # that pushed each and its place among that edge's pushes, and the
+    # number of edges of earlier blocks.
+    self.times = []
+    self.parents = np.empty(0, dtype=np.int64)
+    self.indexes = np.empty(0, dtype=np.int64)
+    self.first = 0
+    # The edges of the block before the last event run, and that event's
+    # number.
+    self.passed = 0
+    self.last = ADDED
+    # Transitions computed in closed form, and edges replayed.
+    self.transitions = 0
+    self.replayed = 0
+
+  def add(self, signal):
+    self.orders[signal] = len(self.orders)
+    if signal.state not in signal.states:
+      return False
+    if isinstance(signal, TickerSignal):
+      if signal.period <= 0:
+        return False
+      node = _TickerNode(signal, self.orders[signal])
+      self.span = min(self.span, BLOCK_EDGES * node.half)
+    elif isinstance(signal, CounterSignal):
+      if len(signal.dependencies) != 1:
+        return False
+      source = self.nodes.get(signal.dependencies[0])
+      if source is None:
+        return False
+      if (isinstance(signal.delay, dict) and
+          any(state not in signal.delay for state in signal.states)):
+        return False
+      node = _CounterNode(signal, self.orders[signal], source)
+      if not node.periodic():
+        return False
+      # The causes are only recorded when they are drawn, as when compiled.
+      if not signal.visible or not signal.show_cause:
+        signal.causes = None
+    else:
+      return False
+    self.nodes[signal.name] = node
+    return True
+
+  def extend(self, until_time, dependent):
+    nodes = list(self.nodes.values())
+    for node in nodes:
+      node.loop_dependents = [
+        (signal, index)
+        for index, signal in enumerate(dependent[node.signal.name], 1)
+        if signal.name not in self.nodes]
+      node.fed = bool(node.loop_dependents)
+      if isinstance(node, _CounterNode):
+        node.push_index = (
+          dependent[node.source.signal.name].index(node.signal) + 1)
+    # The sources of replayed edges are placed too.
+    for node in reversed(nodes):
+      if node.fed and isinstance(node, _CounterNode):
+        node.source.fed = True
+    for node in nodes:
+      node.extend(until_time)
+      self.transitions += len(node.chunk_times)
+    self.until = until_time
+    self.first += len(self.times)
+    self.passed = 0
+
+    # Edges are put in order by time, the place of the edge that pushed
+    # them, then their place among its pushes. Places in the block are
+    # those of the order before, until it stays the same; simultaneous
+    # edges are mostly in order already, nodes being added after their
+    # sources.
+    fed = [node for node in nodes if node.fed]
+    sources = {}
+    count = 0
+    for node in fed:
+      sources[node] = count
+      count += len(node.chunk_times)
+    parents = [node.parents(sources[node], sources) for node in fed]
+    times = np.concatenate([np.empty(0)] +
+                           [node.chunk_times for node in fed])
+    slots, places, indexes = (
+      np.concatenate([np.empty(0, dtype=np.int64)] +
+                     [columns[column] for columns in parents])
+      for column in range(3))
+    order = np.argsort(times, kind="stable")
+    ranks = np.empty(count, dtype=np.int64)
+    while True:
+      ranks[order] = np.arange(count)
+      pushers = np.where(slots >= 0, self.first + ranks[slots], places)
+      sorted_order = np.lexsort((indexes, pushers, times))
+      if np.array_equal(sorted_order, order):
+        break
+      order = sorted_order
+    self.times = times[order].tolist()
+    self.parents = pushers[order]
+    self.indexes = indexes[order]
+
+    events = []
+    for node in fed:
+      first = sources[node]
+      node.places = self.first + ranks[first:first + len(node.chunk_times)]
+      if not node.loop_dependents:
+        continue
+      olds, news = node.transitions()
+      events.extend(zip(node.chunk_times.tolist(),
+                        ranks[first:first + len(olds)].tolist(),
+                        [node] * len(olds), olds, news, node.next_times()))
+    events.sort(key=itemgetter(1))
+    self.feed = events
+    self.position = 0
+
+  def key(self, signal):
+    # The key of a signal on the heap, those not in scheduled[] having been
+    # pushed when added.
+    return self.scheduled.get(signal, (ADDED, self.orders[signal]))
+
+  def edge_key(self, rank):
+    # The key of the block's edge at `rank`.
+    parent = int(self.parents[rank])
+    if parent < 0:
+      return (ADDED, int(self.indexes[rank]))
+    return ((parent, math.inf), int(self.indexes[rank]))
+
+  def peek(self):
+    if self.position < len(self.feed):
+      return self.feed[self.position]
+    return None
+
+  def pop(self):
+    # Runs the next edge with loop-driven dependents, returning its number.
+    rank = self.feed[self.position][1]
+    self.position += 1
+    self.replayed += 1
+    self.passed = rank + 1
+    return (self.first + rank, math.inf)
+
+  def number(self, current_time, key=None):
+    # Numbers an event of the heap, at current_time with `key`, placing it
+    # among the block's edges. Without a key it comes after the edges at
+    # current_time.
+    times = self.times
+    if key is None:
+      rank = max(self.passed, bisect_right(times, current_time))
+    else:
+      rank = bisect_left(times, current_time, self.passed)
+      while (rank < len(times) and times[rank] == current_time and
+             self.edge_key(rank) < key):
+        rank += 1
+    self.passed = rank
+    place = self.first + rank
+    count = self.last[1] + 1 if self.last[0] == place else 0
+    self.last = (place, count)
+    return self.last
+
+
+def _code_dtype(history):
+  if history.codes.typecode == "B":
+    return np.uint8
+  return np.uint16
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+from signals.signal import TickerSignal, CounterSignal, Signal, ParameterSignal
+
+# Bump when the schema or the signals change, so older cache files are
+# no longer used.
+CACHE_VERSION = 1
+# The user cache directory, where configs and rendered results are kept.
+CACHE_HOME = os.path.join(
+  os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"),
+                                                   ".cache"),
+  "signals")
+CACHE_DIR = os.path.join(CACHE_HOME, "configs")
+
+NUMBER = (int, float)
+REQUIRED = object()
+
+
+class SchemaError(ValueError):
+  def __init__(self, errors):
+    super().__init__(f"{len(errors)} errors in the signals:\n" +
+                     "\n".join(errors))
+    self.errors = errors
+
+
+class Field():
+  # types None takes a value of any type, as deserialize always has for
+  # the initial state and the flags.
+  __slots__ = ("key", "types", "default", "check", "message")
+
+  def __init__(self, key, types, default=None, check=None, message=None):
+    self.key = key
+    self.types = types
+    self.default = default
+    self.check = check
+    self.message = message
+
+
+def _positive(value):
+  return value > 0
+
+def _delay(value):
+  if isinstance(value, dict):
+    return all(isinstance(delay, NUMBER) for delay in value.values())
+  return True
+
+
+# Fields of every signal, then by type the class, the fields passed to it
+# by keyword, and the fields of which exactly one has to be given, if any.
+COMMON = (
+  Field("name", str, REQUIRED),
+  Field("initial_state", None),
+  Field("visible", None, True),
+  Field("dependencies", list),
+  Field("states", list),
+  Field("delay", NUMBER + (dict,), check=_delay,
+        message="must be a number or numbers by state"),
+  Field("show_cause", None, True),
+)
+
+SIGNALS = {
+  "ticker": (TickerSignal, (
+    Field("period", NUMBER, check=_positive, message="must be positive"),
+    Field("frequency", NUMBER, check=_positive, message="must be positive"),
+  ), ("period", "frequency")),
+  "counter": (CounterSignal, (
+    Field("old_state_trigger", str, Signal.LOW),
+    Field("new_state_trigger", str, Signal.HIGH),
+  ), None),
+  "parameter": (ParameterSignal, (
+    Field("true_state", dict, REQUIRED),
+  ), None),
+}
+
+
+class Schema():
+  # SIGNALS compiled into a validating function per type, which collects
+  # every error rather than stopping at the first, and a constructor that
+  # takes the validated values as they are.
+  def __init__(self, signals=SIGNALS):
+    self.validators = {}
+    self.builders = {}
+    for type, (cls, fields, one_of) in signals.items():
+      self.validators[type] = _compile(COMMON + fields, one_of)
+      self.builders[type] = _constructor(cls, fields)
+
+  def validate(self, data):
+    # The type and values of every signal, or a SchemaError listing all
+    # the problems. In a list, dependencies, or the keys of true_state,
+    # must name signals listed before them. Those of a single signal are
+    # left to SignalCollection.add.
+    errors = []
+    listed = isinstance(data, list)
+    if not listed:
+      data = [data]
+    records = []
+    names = set()
+    validators = self.validators
+    for index, item in enumerate(data):
+      if item.__class__ is not dict:
+        errors.append(f"{_where(index, {})}: must be an object")
+        continue
+      type = item.get("type")
+      validator = None
+      if type.__class__ is str:
+        validator = validators.get(type)
+      if validator is None:
+        if type is None:
+          errors.append(f"{_where(index, item)}: [type] is missing")
+        else:
+          errors.append(f"{_where(index, item)}: type [{type}] not "
+                        "implemented")
+        continue
+      values = validator(item, index, errors)
+      dependencies = item.get("dependencies")
+      if dependencies is None:
+        dependencies = item.get("true_state")
+      if listed and (dependencies.__class__ is list or
+                     dependencies.__class__ is dict):
+        for dependency in dependencies:
+          if dependency.__class__ is not str or dependency not in names:
+            errors.append(f"{_where(index, item)}: dependency "
+                          f"[{dependency}] is not a signal listed before it")
+      name = item.get("name")
+      if name.__class__ is not str:
+        # The name field has its error already.
+        continue
+      if name in names:
+        errors.append(f"{_where(index, item)}: another signal is named "
+                      f"[{name}]")
+      names.add(name)
+      if values is not None:
+        records.append((type, values))
+    if errors:
+      raise SchemaError(errors)
+    return records
+
+  def build(self, records):
+    builders = self.builders
+    return [builders[type](values) for type, values in records]
+
+  def deserialize(self, data):
+    signals = self.build(self.validate(data))
+    if isinstance(data, list):
+      return signals
+    return signals[0]
+
+
+def _compile(fields, one_of):
+  # Every value is checked in one generated expression; only when that
+  # fails are the fields gone through one by one for the errors.
+  check = _checker(fields, one_of)
+  names = {"REQUIRED": REQUIRED, "check": check}
+  lines = ["def validate(data, index, errors):", "  get = data.get"]
+  tests = []
+  for index, field in enumerate(fields):
+    value = f"v{index}"
+    names[f"default{index}"] = field.default
+    lines.append(f"  {value} = get({field.key!r}, default{index})")
+    if field.types is None:
+      continue
+    names[f"types{index}"] = _exact_types(field.types)
+    names[f"check{index}"] = field.check
+    test = f"type({value}) in types{index}"
+    if field.check is not None:
+      test = f"{test} and check{index}({value})"
+    if field.default is not REQUIRED:
+      test = f"{value} is default{index} or {test}"
+    tests.append(f"({test})")
+  if one_of is not None:
+    tests.append(" + ".join(f"({key!r} in data)" for key in one_of) +
+                 " == 1")
+  lines.append(f"  if {' and '.join(tests)}:")
+  lines.append(f"    return ({''.join(f'v{i}, ' for i in range(len(fields)))})")
+  lines.append("  return check(data, index, errors)")
+  exec("\n".join(lines), names)
+  return names["validate"]
+
+def _checker(fields, one_of):
+  checks = tuple((field.key, field.types, field.default, field.check,
+                  field.message) for field in fields)
+
+  def check(data, index, errors):
+    where = _where(index, data)
+    values = []
+    valid = True
+    for key, types, default, check, message in checks:
+      value = data.get(key, default)
+      if value is REQUIRED:
+        errors.append(f"{where}: [{key}] is missing")
+        valid = False
+      elif value is default or types is None:
+        pass
+      elif not isinstance(value, types) or (
+          isinstance(value, bool) and types is not bool):
+        errors.append(f"{where}: [{key}] must be {_type_names(types)}")
+        valid = False
+      elif check is not None and not check(value):
+        errors.append(f"{where}: [{key}] {message}")
+        valid = False
+      values.append(value)
+    if one_of is not None:
+      given = [key for key in one_of if key in data]
+      if len(given) != 1:
+        keys = " and ".join(f"[{key}]" for key in one_of)
+        if given:
+          errors.append(f"{where}: Only one of {keys} can be present")
+        else:
+          errors.append(f"{where}: One of {keys} has to be present")
+        valid = False
+    if valid:
+      return tuple(values)
+    return None
+  return check
+
+def _exact_types(types):
+  if isinstance(types, type):
+    return frozenset((types,))
+  return frozenset(types)
+
+def _constructor(cls, fields):
+  # The signal is made from its name, initial state and the fields of its
+  # type; the other common fields are set after, as deserialize always
+  # has, only when given.
+  values = [f"v{index}" for index in range(len(COMMON) + len(fields))]
+  arguments = [values[0], f"initial_state={values[1]}"] + [
+    f"{field.key}={value}"
+    for field, value in zip(fields, values[len(COMMON):])]
+  source = "\n".join((
+    "def construct(values):",
+    f"  {', '.join(values)}, = values",
+    f"  s = cls({', '.join(arguments)})",
+    "  s.visible = v2",
+    "  if v3 is not None:",
+    "    s.dependencies = v3",
+    "  if v4 is not None:",
+    "    s.states = v4",
+    "  if v5 is not None:",
+    "    s.delay = v5",
+    "  s.show_cause = v6",
+    "  return s"))
+  names = {"cls": cls}
+  exec(source, names)
+  return names["construct"]
+
+def _where(index, data):
+  if "name" in data:
+    return f"signals[{index}] [{data['name']}]"
+  return f"signals[{index}]"
+
+_TYPE_NAMES = {int: "a number", float: "a number", str: "a string",
+               bool: "true or false", list: "a list", dict: "an object"}
+
+def _type_names(types):
+  if isinstance(types, type):
+    types = (types,)
+  names = []
+  for t in types:
+    name = _TYPE_NAMES.get(t, t.__name__)
+    if name not in names:
+      names.append(name)
+  return " or ".join(names)
+
+
+SCHEMA = Schema()
+
+
+def load(filename, cache_dir=None):
+  # The config in `filename` and its signals, deserialized, with
+  # data["signals"] taken out. With a cache_dir, the config and the
+  # validated values of the signals are kept there by the hash of the file,
+  # so loading the same file again skips parsing and validating it.
+  data, records = load_records(filename, cache_dir)
+  return data, _build(records)
+
+def load_records(filename, cache_dir=None):
+  # As load, with the signals as the validated values Schema.build takes,
+  # or None without signals.
+  with open(filename, "rb") as f:
+    raw = f.read()
+  path = None
+  if cache_dir is not None:
+    digest = hashlib.sha256(raw).hexdigest()
+    path = os.path.join(cache_dir, f"{digest}.{CACHE_VERSION}.pickle")
+    try:
+      with open(path, "rb") as f:
+        data, records = pickle.load(f)
+      return data, records
+    except (OSError, EOFError, ValueError, AttributeError, ImportError,
+            pickle.UnpicklingError):
+      # Missing, or written by a version whose classes have changed.
+      pass
+
+  data = json.loads(raw)
+  records = None
+  if "signals" in data:
+    records = SCHEMA.validate(data.pop("signals"))
+  if path is not None:
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+      pickle.dump((data, records), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+  return data, records
+
+def _build(records):
+  if records is None:
+    return None
+  return SCHEMA.build(records)
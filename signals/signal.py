@@ -1,4 +1,10 @@
+from signals.history import History
+
+
 class Signal():
+  __slots__ = ("name", "state", "dependencies", "visible",
+               "history", "causes", "show_cause", "index")
+
   UNDEFINED="UNDEFINED"
   HIGH="HIGH"
   LOW="LOW"
@@ -12,9 +18,11 @@ class Signal():
     
     self.visible = None
     
-    self.history = [(None, initial_state)]
+    self.history = History(initial_state)
+    # None once compiled, when the causes would never be drawn.
     self.causes = []
     self.show_cause = True
+    self.index = None
 
   def tick(self, current_time):
     pass
@@ -29,9 +37,11 @@ class Signal():
     pass
 
   def _save(self, current_time, state):
-    self.history.append((current_time, state))
+    self.history.add(current_time, state)
 
 class FlipSignal(Signal):
+  __slots__ = ("states", "delay")
+
   def __init__(self,
                name,
                initial_state):
@@ -51,6 +61,8 @@ class FlipSignal(Signal):
     return old_state, new_state
 
 class TickerSignal(FlipSignal):
+  __slots__ = ("period",)
+
   def __init__(self, name,
                initial_state=None,
                states=None,
@@ -81,6 +93,8 @@ class TickerSignal(FlipSignal):
     return self.period/2
 
 class CounterSignal(FlipSignal):
+  __slots__ = ("old_state_trigger", "new_state_trigger")
+
   def __init__(self, name,
                initial_state=None,
                old_state_trigger=Signal.LOW,
@@ -110,12 +124,17 @@ class CounterSignal(FlipSignal):
         else:
           trigger_time += self.delay
           
-      self.causes.append(_Cause(orig_name=s_name, orig_time=current_time,
-                                event_name=self.name, event_time=trigger_time))
+      if self.causes is not None:
+        self.causes.append(_Cause(orig_name=s_name, orig_time=current_time,
+                                  event_name=self.name,
+                                  event_time=trigger_time))
       return trigger_time
     return None
 
 class ParameterSignal(FlipSignal):
+  __slots__ = ("dependency_states", "true_state", "current_state", "cause",
+               "bits", "matched", "full")
+
   def __init__(self, name,
                true_state,
                initial_state=None,
@@ -127,6 +146,11 @@ class ParameterSignal(FlipSignal):
     self.dependencies = list(true_state.keys())
     self.dependency_states = dict()
     self.true_state = true_state
+    # Bit i of matched is set while dependency i of true_state is in its
+    # true state, so the condition holds when all of them are.
+    self.bits = {name: 1 << index for index, name in enumerate(true_state)}
+    self.full = (1 << len(true_state)) - 1
+    self.matched = 0
     self.current_state = False
     self.cause = _Cause()
     
@@ -140,8 +164,11 @@ class ParameterSignal(FlipSignal):
 
   def context(self, s_name, old_state, new_state, current_time, next_time):
     self.dependency_states[s_name] = new_state
-    self.cause.add_cause(s_name, current_time)
-    true_state = self._check_state()
+    causes = self.causes
+    if causes is not None:
+      self.cause.add_cause(s_name, current_time)
+    self._match(s_name, new_state)
+    true_state = self.matched == self.full
     if true_state != self.current_state:
       trigger_time = current_time
       if self.delay is not None:
@@ -150,27 +177,31 @@ class ParameterSignal(FlipSignal):
         else:
           trigger_time += self.delay
           
-      self.cause.add_event(self.name, trigger_time)
-      self.causes.append(self.cause)
-      self.cause = _Cause()
+      if causes is not None:
+        self.cause.add_event(self.name, trigger_time)
+        causes.append(self.cause)
+        self.cause = _Cause()
       self.current_state = true_state
       return trigger_time
      
     
   def set_dependency_state(self, name, value):
     self.dependency_states[name] = value
-    self.current_state = self._check_state()
-    
-  def _check_state(self):
-    for name, state in self.true_state.items():
-      if name not in self.dependency_states:
-        return False
-      if self.dependency_states[name] != self.true_state[name]:
-        return False
-
-    return True
+    self._match(name, value)
+    self.current_state = self.matched == self.full
+
+  def _match(self, name, state):
+    bit = self.bits.get(name)
+    if bit is None:
+      return
+    if state == self.true_state[name]:
+      self.matched |= bit
+    else:
+      self.matched &= ~bit
 
 class _Cause():
+  __slots__ = ("dependencies", "event")
+
   def __init__(self,
                orig_name=None,
                orig_time=None,
@@ -188,4 +219,12 @@ class _Cause():
   def add_event(self, name, time):
     self.event = (name, time)
 
+  def shifted(self, shift):
+    cause = _Cause()
+    cause.dependencies = {name: time + shift
+                          for name, time in self.dependencies.items()}
+    name, time = self.event
+    cause.event = (name, time + shift)
+    return cause
+
 
@@ -0,0 +1,380 @@
+from array import array
+import json
+import os
+
+import numpy as np
+
+from signals.history import History, REPEAT_BLOCK
+from signals.signal import _Cause
+
+# Transitions and causes held in memory per signal before they are written.
+CHUNK_SIZE = 1 << 14
+
+RECORD = np.dtype([("time", "<f8"), ("code", "<u2")])
+# One record per dependency of a cause; `first` marks where a cause begins.
+CAUSE_RECORD = np.dtype([("event_time", "<f8"), ("orig_time", "<f8"),
+                         ("orig", "<u4"), ("first", "u1")])
+
+INDEX_FILE = "index.json"
+
+
+class HistorySink():
+  # Streams the histories and causes of the signals added to a
+  # SignalCollection to files in `directory` while simulating, so only the
+  # last chunk of each is held in memory. After close() the signals read
+  # them back memory-mapped.
+  def __init__(self, directory, chunk_size=CHUNK_SIZE):
+    os.makedirs(directory, exist_ok=True)
+    self.directory = directory
+    self.chunk_size = chunk_size
+    self.signals = []
+    self.names = {}
+
+  def attach(self, signal):
+    if signal.name in self.names:
+      raise RuntimeError("Signal with the same name already exists.")
+    index = len(self.signals)
+    self.names[signal.name] = index
+    self.signals.append(signal)
+    path = os.path.join(self.directory, f"{index}")
+    signal.history = SpillingHistory(signal.history, f"{path}.history",
+                                     self.chunk_size)
+    causes = SpillingCauses(f"{path}.causes", self.names, self.chunk_size)
+    for cause in signal.causes:
+      causes.append(cause)
+    signal.causes = causes
+
+  def spill(self, force=False):
+    for signal in self.signals:
+      signal.history.spill(force)
+      if signal.causes is not None:
+        signal.causes.spill(force)
+
+  def close(self):
+    self.spill(force=True)
+    entries = []
+    for signal in self.signals:
+      history = signal.history
+      entries.append({"name": signal.name,
+                      "initial_state": history.initial_state,
+                      "states": history.states})
+    with open(os.path.join(self.directory, INDEX_FILE), "w") as f:
+      json.dump({"signals": entries}, f)
+
+    for signal in self.signals:
+      history = signal.history
+      signal.history = MappedHistory(history.path, history.initial_state,
+                                     history.states)
+      if signal.causes is not None:
+        signal.causes = MappedCauses(signal.causes.path, signal.name,
+                                     list(self.names))
+
+  @staticmethod
+  def open(directory):
+    # The histories and causes of a closed sink, by signal name.
+    with open(os.path.join(directory, INDEX_FILE)) as f:
+      entries = json.load(f)["signals"]
+    names = [entry["name"] for entry in entries]
+    signals = {}
+    for index, entry in enumerate(entries):
+      path = os.path.join(directory, f"{index}")
+      signals[entry["name"]] = (
+        MappedHistory(f"{path}.history", entry["initial_state"],
+                      entry["states"]),
+        MappedCauses(f"{path}.causes", entry["name"], names))
+    return signals
+
+
+class SpillingHistory(History):
+  # Holds only the transitions not yet written to `path`. They are read
+  # back through the sink once it is closed.
+  __slots__ = ("path", "spilled", "chunk_size")
+
+  def __init__(self, history, path, chunk_size=CHUNK_SIZE):
+    super().__init__(history.initial_state)
+    self.times = array("d", history.times)
+    self.codes = array(history.codes.typecode, history.codes)
+    self.states = list(history.states)
+    self.state_codes = dict(history.state_codes)
+    self.path = path
+    self.spilled = 0
+    self.chunk_size = chunk_size
+    _write(path, 0, np.empty(0, RECORD))
+
+  def code(self, state):
+    code = super().code(state)
+    if code > np.iinfo(RECORD["code"]).max:
+      raise ValueError("Too many states to spill to a history file.")
+    return code
+
+  def add(self, time, state):
+    code = self.code(state)
+    times = self.times
+    times.append(time)
+    self.codes.append(code)
+    if len(times) >= self.chunk_size:
+      self.spill(force=True)
+
+  def spill(self, force=False):
+    count = len(self.times)
+    if not count or (not force and count < self.chunk_size):
+      return
+    records = np.empty(count, RECORD)
+    records["time"] = np.asarray(self.times)
+    records["code"] = np.asarray(self.codes)
+    # Written at the spilled count rather than appended, so a collection
+    # restored from an earlier snapshot carries on from where it was.
+    _write(self.path, self.spilled * RECORD.itemsize, records)
+    self.spilled += count
+    self.times = array("d")
+    self.codes = array(self.codes.typecode)
+
+  def _segment(self, first):
+    # What was already spilled is read back from the file.
+    times, codes = super()._segment(max(0, first - self.spilled))
+    if first >= self.spilled:
+      return times, codes
+    records = np.fromfile(self.path, RECORD, self.spilled - first,
+                          offset=first * RECORD.itemsize)
+    return (np.concatenate((records["time"], times)),
+            np.concatenate((records["code"].astype(codes.dtype), codes)))
+
+  def _extend(self, times, codes):
+    for start in range(0, len(times), self.chunk_size):
+      end = start + self.chunk_size
+      super()._extend(times[start:end], codes[start:end])
+      if len(self.times) >= self.chunk_size:
+        self.spill(force=True)
+
+  def _mapped(self):
+    # The transitions spilled so far. The file may run on past them in a
+    # collection restored from an earlier snapshot.
+    mapped = MappedHistory(self.path, self.initial_state, self.states)
+    mapped.times = mapped.times[:self.spilled]
+    mapped.codes = mapped.codes[:self.spilled]
+    return mapped
+
+  def value_at(self, time):
+    if not self.spilled or (len(self.times) and self.times[0] <= time):
+      return super().value_at(time)
+    return self._mapped().value_at(time)
+
+  def slice(self, start, end):
+    history = self._mapped().slice(start, end)
+    tail = super().slice(start, end)
+    history.times.extend(tail.times)
+    history.codes.extend(array(history.codes.typecode, tail.codes))
+    return history
+
+  def __len__(self):
+    return self.spilled + len(self.times) + 1
+
+  def __getitem__(self, index):
+    # Indexes count the spilled transitions, read back from the file.
+    if isinstance(index, slice):
+      return [self[i] for i in range(*index.indices(len(self)))]
+    if index < 0:
+      index += len(self)
+    if index < 0 or index >= len(self):
+      raise IndexError("history index out of range")
+    if index <= self.spilled:
+      return self._mapped()[index]
+    index -= self.spilled
+    return (self.times[index - 1], self.states[self.codes[index - 1]])
+
+  def __iter__(self):
+    yield from self._mapped()
+    states = self.states
+    for time, code in zip(self.times, self.codes):
+      yield (time, states[code])
+
+
+class MappedHistory(History):
+  # A read-only History over a history file. The times and codes are views
+  # of the mapped records, so nothing is read until it is used.
+  __slots__ = ("path",)
+
+  def __init__(self, path, initial_state, states):
+    super().__init__(initial_state)
+    self.path = path
+    records = _map(path, RECORD)
+    self.times = records["time"]
+    self.codes = records["code"]
+    self.states = list(states)
+    self.state_codes = {state: code for code, state in enumerate(states)}
+
+  def add(self, time, state):
+    raise RuntimeError("Mapped histories are read-only.")
+
+  def value_at(self, time):
+    index = int(np.searchsorted(self.times, time, side="right"))
+    if index == 0:
+      return self.initial_state
+    return self.states[self.codes[index - 1]]
+
+  def slice(self, start, end):
+    # Copies only the transitions in the slice into an in-memory History.
+    first, last = np.searchsorted(self.times, [start, end])
+    last = max(first, last)
+    initial_state = self.initial_state
+    if first:
+      initial_state = self.states[self.codes[first - 1]]
+    history = History(initial_state)
+    history.times.frombytes(
+      np.ascontiguousarray(self.times[first:last]).tobytes())
+    history.codes = array("H")
+    history.codes.frombytes(
+      np.ascontiguousarray(self.codes[first:last], dtype=np.uint16).tobytes())
+    history.states = list(self.states)
+    history.state_codes = dict(self.state_codes)
+    return history
+
+  def __getitem__(self, index):
+    item = super().__getitem__(index)
+    if isinstance(index, slice) or item[0] is None:
+      return item
+    return (float(item[0]), item[1])
+
+  def __iter__(self):
+    yield (None, self.initial_state)
+    states = self.states
+    for start in range(0, len(self.times), CHUNK_SIZE):
+      times = self.times[start:start + CHUNK_SIZE].tolist()
+      codes = self.codes[start:start + CHUNK_SIZE].tolist()
+      for time, code in zip(times, codes):
+        yield (time, states[code])
+
+  def __reduce__(self):
+    return (MappedHistory, (self.path, self.initial_state, self.states))
+
+
+class SpillingCauses():
+  # Stands in for Signal.causes. Causes are kept as records from the moment
+  # they are appended, and only those not yet written are held.
+  __slots__ = ("path", "names", "event_times", "orig_times", "origs",
+               "firsts", "spilled", "chunk_size")
+
+  def __init__(self, path, names, chunk_size=CHUNK_SIZE):
+    self.path = path
+    self.names = names
+    self.spilled = 0
+    self.chunk_size = chunk_size
+    self._clear()
+    _write(path, 0, np.empty(0, CAUSE_RECORD))
+
+  def append(self, cause):
+    _, event_time = cause.event
+    names = self.names
+    first = 1
+    for name, time in cause.dependencies.items():
+      self.event_times.append(event_time)
+      self.orig_times.append(time)
+      self.origs.append(names[name])
+      self.firsts.append(first)
+      first = 0
+    if len(self.firsts) >= self.chunk_size:
+      self.spill(force=True)
+
+  def spill(self, force=False):
+    count = len(self.firsts)
+    if not count or (not force and count < self.chunk_size):
+      return
+    records = np.empty(count, CAUSE_RECORD)
+    records["event_time"] = np.asarray(self.event_times)
+    records["orig_time"] = np.asarray(self.orig_times)
+    records["orig"] = np.asarray(self.origs)
+    records["first"] = np.asarray(self.firsts)
+    _write(self.path, self.spilled * CAUSE_RECORD.itemsize, records)
+    self.spilled += count
+    self._clear()
+
+  def repeat(self, first, period, count):
+    # As History.repeat, with `first` counted in records.
+    records = self._segment(first)
+    if not len(records):
+      return
+    copies = max(1, REPEAT_BLOCK // len(records))
+    for done in range(0, count, copies):
+      shifts = np.arange(done + 1, min(count, done + copies) + 1) * period
+      block = np.tile(records, len(shifts))
+      block["event_time"] += np.repeat(shifts, len(records))
+      block["orig_time"] += np.repeat(shifts, len(records))
+      self.event_times.frombytes(block["event_time"].tobytes())
+      self.orig_times.frombytes(block["orig_time"].tobytes())
+      self.origs.frombytes(block["orig"].astype("<u4").tobytes())
+      self.firsts.frombytes(block["first"].tobytes())
+      self.spill()
+
+  def _segment(self, first):
+    count = len(self.firsts)
+    records = np.empty(count, CAUSE_RECORD)
+    records["event_time"] = np.asarray(self.event_times)
+    records["orig_time"] = np.asarray(self.orig_times)
+    records["orig"] = np.asarray(self.origs)
+    records["first"] = np.asarray(self.firsts)
+    if first >= self.spilled:
+      return records[first - self.spilled:]
+    spilled = np.fromfile(self.path, CAUSE_RECORD, self.spilled - first,
+                          offset=first * CAUSE_RECORD.itemsize)
+    return np.concatenate((spilled, records))
+
+  def _clear(self):
+    self.event_times = array("d")
+    self.orig_times = array("d")
+    # As CAUSE_RECORD["orig"], the same size on every platform.
+    self.origs = array("I")
+    self.firsts = array("B")
+
+  def __len__(self):
+    # Records rather than causes, to mark where to repeat() from.
+    return self.spilled + len(self.firsts)
+
+
+class MappedCauses():
+  # A read-only sequence of the causes in a cause file, rebuilt a chunk at
+  # a time as they are iterated.
+  __slots__ = ("path", "name", "names", "records")
+
+  def __init__(self, path, name, names):
+    self.path = path
+    self.name = name
+    self.names = names
+    self.records = _map(path, CAUSE_RECORD)
+
+  def __len__(self):
+    return int(np.count_nonzero(self.records["first"]))
+
+  def __iter__(self):
+    name = self.name
+    names = self.names
+    cause = None
+    records = self.records
+    for start in range(0, len(records), CHUNK_SIZE):
+      chunk = records[start:start + CHUNK_SIZE]
+      for event_time, orig_time, orig, first in zip(
+          chunk["event_time"].tolist(), chunk["orig_time"].tolist(),
+          chunk["orig"].tolist(), chunk["first"].tolist()):
+        if first:
+          if cause is not None:
+            yield cause
+          cause = _Cause(event_name=name, event_time=event_time)
+        cause.add_cause(names[orig], orig_time)
+    if cause is not None:
+      yield cause
+
+  def __reduce__(self):
+    return (MappedCauses, (self.path, self.name, self.names))
+
+
+def _write(path, offset, records):
+  with open(path, "r+b" if offset else "wb") as f:
+    f.seek(offset)
+    records.tofile(f)
+    f.truncate()
+
+
+def _map(path, dtype):
+  # np.memmap cannot map an empty file.
+  if not os.path.getsize(path):
+    return np.empty(0, dtype)
+  return np.memmap(path, dtype=dtype, mode="r")
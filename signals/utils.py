@@ -1,13 +1,57 @@
-from heapq import heappush, heappop
-import itertools
+from bisect import insort
+from collections import deque
+from heapq import heapify, heappush, heappop
+import math
+import os
+import pickle
+import time
+
+from signals.signal import ParameterSignal, TickerSignal
+
+# REMOVED entries are dropped once there are more of them than live ones,
+# and at least this many.
+COMPACT_MIN = 1024
+# Fingerprints kept while looking for a cycle before giving up, times the
+# number of signals.
+CYCLE_BUDGET = 1 << 22
 
 class SignalCollection():
-  def __init__(self):
+  def __init__(self, periodic=False, sink=None, instrument=None,
+               queue="heap", cycles=False, queue_width=None):
+    _check_options(periodic, queue, cycles, instrument)
     self.all = {}
     self.dependent = {}
-    self.heap = SignalHeap()
+    # "calendar" suits many events pending at once on a regular grid, e.g.
+    # a thousand clocks or more: see benchmarks/bench_heap.py, where it
+    # pops and pushes clock edges twice as fast as the heap with 10^5
+    # pending. With few pending, as in tickers.json, the heap is faster.
+    # Without a queue_width, its buckets are as wide as the half period of
+    # the fastest ticker added, the spacing of its edges.
+    self.queue_width = queue_width
+    self.ticker_width = None
+    if queue == "heap":
+      self.heap = SignalHeap()
+    elif queue == "calendar":
+      self.heap = CalendarQueue(1 if queue_width is None else queue_width)
+    else:
+      raise ValueError(f"Unknown queue '{queue}'.")
+    self.until = 0
+    self.periodic = None
+    self.sink = sink
+    self.order = None
+    self.schedule = None
+    self.instrument = instrument
+    # With cycles, run() copies whole periods once the collection repeats
+    # itself, see _run_cycles. The last one found is (start, period).
+    self.cycles = cycles
+    self.cycle = None
+    if periodic:
+      from signals.periodic import PeriodicSchedule
+      self.periodic = PeriodicSchedule()
 
   def add(self, signal):
+    if self.schedule is not None:
+      raise RuntimeError("Signals cannot be added once compiled.")
     if signal.name in self.all:
       raise RuntimeError("Signal with the same name already exists.")
     self.all[signal.name] = signal
@@ -15,40 +59,611 @@ class SignalCollection():
       raise KeyError(
         "signal with the same name already exists in dependencies.")
     self.dependent[signal.name] = []
+    if self.sink is not None:
+      self.sink.attach(signal)
     if signal.dependencies is None:
-      self.heap.add_signal(signal, time=signal.first_tick())
+      if (self.queue_width is None and isinstance(signal, TickerSignal) and
+          isinstance(self.heap, CalendarQueue)):
+        width = signal.period / 2
+        if width > 0 and (self.ticker_width is None or
+                          width < self.ticker_width):
+          self.ticker_width = width
+          self.heap.resize(width)
+      if not self._add_periodic(signal):
+        self.heap.add_signal(signal, time=signal.first_tick())
     else:
       for dependency in signal.dependencies:
         if not dependency in self.dependent:
           raise KeyError("All dependencies has not been registred.")
         self.dependent[dependency].append(signal)
         signal.set_dependency_state(dependency, self.all[dependency].state)
+      self._add_periodic(signal)
+
+  def compile(self):
+    # Numbers the signals in topological order and lists, by number, the
+    # context methods of their dependents, for _run_compiled. Causes that
+    # would never be drawn are no longer kept.
+    indegree = {name: 0 for name in self.all}
+    for dependents in self.dependent.values():
+      for signal in dependents:
+        indegree[signal.name] += 1
+    # Dependencies are added first, so there are no cycles.
+    ready = deque(name for name, count in indegree.items() if not count)
+    order = []
+    while ready:
+      name = ready.popleft()
+      order.append(self.all[name])
+      for signal in self.dependent[name]:
+        indegree[signal.name] -= 1
+        if not indegree[signal.name]:
+          ready.append(signal.name)
+
+    for index, signal in enumerate(order):
+      signal.index = index
+      if not signal.visible or not signal.show_cause:
+        signal.causes = None
+    self.order = order
+    self.schedule = [
+      (signal.name, tuple((dependency.context, dependency)
+                          for dependency in self.dependent[signal.name]))
+      for signal in order]
+    return self
+
+  def deliver(self, name, old_state, new_state, current_time):
+    # Passes a transition of `name`, a signal simulated elsewhere, to the
+    # signals here that depend on it, as if it had ticked at current_time.
+    # Those it triggers must not have run past it.
+    if self.periodic is not None:
+      number = self.periodic.number(current_time)
+    for index, dependency in enumerate(self.dependent[name], 1):
+      next_time = dependency.context(name, old_state, new_state,
+                                     current_time, None)
+      if next_time:
+        times = dependency.history.times
+        if times and times[-1] > current_time:
+          raise RuntimeError(
+            f"{dependency.name} has run past {current_time}, when {name} "
+            "triggered it.")
+        self.heap.add_signal(dependency, next_time)
+        if self.periodic is not None:
+          self.periodic.scheduled[dependency] = (number, index)
+    self.all[name].state = new_state
+
+  def _add_periodic(self, signal):
+    return self.periodic is not None and self.periodic.add(signal)
 
   def tick(self, until_time):
-    current_time, s = self.heap.pop_signal()
-    if until_time < current_time:
+    if self.periodic is not None:
+      return self._tick_periodic(until_time)
+    # _fire inlined, as in _run.
+    heap = self.heap
+    current_time, s = heap.pop_until(until_time)
+    if s is None:
       return False
     old_state, new_state, next_time = s.tick(current_time)
+    if next_time:
+      heap.add_signal(s, next_time)
+    name = s.name
+    for dependency in self.dependent[name]:
+      next_dependency_time = dependency.context(
+          name, old_state, new_state, current_time, next_time)
+      if next_dependency_time:
+        heap.add_signal(dependency, next_dependency_time)
+    return True
+
+  def run(self, until_time, max_events=None):
+    if self.cycles and max_events is not None:
+      raise ValueError("Cycles cannot be replayed with max_events.")
+    if self.instrument is not None:
+      return self._run_instrumented(until_time, max_events)
+    start = time.perf_counter()
+    if self.periodic is not None:
+      events, steps = self._run_periodic(until_time, max_events)
+    elif not isinstance(self.heap, SignalHeap):
+      events = steps = self._run_queue(until_time, max_events)
+    elif self.cycles:
+      events = steps = self._run_cycles(until_time)
+    elif self.schedule is not None:
+      events = steps = self._run_compiled(until_time, max_events)
+    else:
+      events = steps = self._run(until_time, max_events)
+    if steps != max_events:
+      self.until = max(self.until, until_time)
+    return RunStats(events, time.perf_counter() - start, len(self.heap))
+
+  def snapshot(self):
+    # Signals, histories, causes, the heap with its pending entries and the
+    # periodic schedule all reference each other, so the whole collection
+    # is pickled as one graph to keep those references intact.
+    return pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+
+  @staticmethod
+  def restore(snapshot):
+    collection = pickle.loads(snapshot)
+    if not isinstance(collection, SignalCollection):
+      raise TypeError("Snapshot does not contain a SignalCollection.")
+    return collection
+
+  def save(self, filename):
+    # Write next to the target and rename, so a crash while saving never
+    # leaves a truncated checkpoint behind.
+    tmp_filename = f"{filename}.tmp"
+    with open(tmp_filename, "wb") as f:
+      f.write(self.snapshot())
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp_filename, filename)
+
+  @staticmethod
+  def load(filename):
+    with open(filename, "rb") as f:
+      return SignalCollection.restore(f.read())
+
+  def _run(self, until_time, max_events):
+    # Same as calling tick() until it returns False, with the heap
+    # operations inlined. Events past until_time stay on the heap.
+    heap = self.heap
+    pq = heap.pq
+    entry_finder = heap.entry_finder
+    removed = heap.REMOVED
+    add_signal = heap.add_signal
+    dependent = self.dependent
+    limit = -1 if max_events is None else max_events
+    events = 0
+    while pq and events != limit:
+      current_time, _, s = pq[0]
+      if s is removed:
+        heappop(pq)
+        heap.removed -= 1
+        continue
+      if until_time < current_time:
+        break
+      heappop(pq)
+      del entry_finder[s]
+      old_state, new_state, next_time = s.tick(current_time)
+      if next_time:
+        add_signal(s, next_time)
+      name = s.name
+      for dependency in dependent[name]:
+        next_dependency_time = dependency.context(
+            name, old_state, new_state, current_time, next_time)
+        if next_dependency_time:
+          add_signal(dependency, next_dependency_time)
+      events += 1
+    return events
+
+  def _run_compiled(self, until_time, max_events):
+    # _run with the dependents looked up by number, and add_signal inlined
+    # as well.
+    heap = self.heap
+    pq = heap.pq
+    entry_finder = heap.entry_finder
+    removed = heap.REMOVED
+    counter = heap.counter
+    dead = heap.removed
+    schedule = self.schedule
+    limit = -1 if max_events is None else max_events
+    events = 0
+    try:
+      while pq and events != limit:
+        current_time, _, s = pq[0]
+        if s is removed:
+          heappop(pq)
+          dead -= 1
+          continue
+        if until_time < current_time:
+          break
+        heappop(pq)
+        del entry_finder[s]
+        old_state, new_state, next_time = s.tick(current_time)
+        if next_time:
+          entry = [next_time, counter, s]
+          counter += 1
+          entry_finder[s] = entry
+          heappush(pq, entry)
+        name, dependents = schedule[s.index]
+        for context, dependency in dependents:
+          next_dependency_time = context(
+              name, old_state, new_state, current_time, next_time)
+          if next_dependency_time:
+            entry = entry_finder.get(dependency)
+            if entry is not None:
+              entry[-1] = removed
+              dead += 1
+              if dead > COMPACT_MIN and dead * 2 > len(pq):
+                heap.removed = dead
+                heap.compact()
+                dead = 0
+            entry = [next_dependency_time, counter, dependency]
+            counter += 1
+            entry_finder[dependency] = entry
+            heappush(pq, entry)
+        events += 1
+    finally:
+      heap.counter = counter
+      heap.removed = dead
+    return events
+
+  def _run_cycles(self, until_time):
+    # _run, taking a fingerprint of the collection whenever the first
+    # signal to fire is about to fire again. Once a fingerprint repeats,
+    # so does everything in between, and as many whole periods as fit
+    # before until_time are copied from the histories instead of simulated.
+    # Only when the times are exact, see _exact; otherwise a copied period
+    # would not land where simulating it does.
+    if not self._exact(until_time):
+      if self.schedule is not None:
+        return self._run_compiled(until_time, None)
+      return self._run(until_time, None)
+    heap = self.heap
+    pq = heap.pq
+    entry_finder = heap.entry_finder
+    removed = heap.REMOVED
+    add_signal = heap.add_signal
+    dependent = self.dependent
+    anchor = None
+    seen = {}
+    limit = max(1, CYCLE_BUDGET // max(1, len(self.all)))
+    events = 0
+    while pq:
+      current_time, _, s = pq[0]
+      if s is removed:
+        heappop(pq)
+        heap.removed -= 1
+        continue
+      if until_time < current_time:
+        break
+      if anchor is None:
+        anchor = s
+      if s is anchor and seen is not None:
+        fingerprint = self._fingerprint(current_time)
+        mark = seen.get(fingerprint)
+        if mark is not None:
+          events += self._repeat(mark, current_time, events, until_time)
+          seen = None
+          continue
+        if len(seen) < limit:
+          seen[fingerprint] = self._mark(current_time, events)
+        else:
+          seen = None
+      heappop(pq)
+      del entry_finder[s]
+      old_state, new_state, next_time = s.tick(current_time)
+      if next_time:
+        add_signal(s, next_time)
+      name = s.name
+      for dependency in dependent[name]:
+        next_dependency_time = dependency.context(
+            name, old_state, new_state, current_time, next_time)
+        if next_dependency_time:
+          add_signal(dependency, next_dependency_time)
+      events += 1
+    return events
+
+  def _exact(self, until_time):
+    # Whether the pending times, half periods and delays are all on a
+    # binary grid with every time until the last event a whole number of
+    # steps below 2**53. Every sum of them is then exact, in the order
+    # the events add them or shifted by whole periods.
+    removed = self.heap.REMOVED
+    times = [entry[0] for entry in self.heap.pq if entry[-1] is not removed]
+    for signal in self.all.values():
+      if isinstance(signal, TickerSignal):
+        times.append(signal.period / 2)
+      delay = getattr(signal, "delay", None)
+      if isinstance(delay, dict):
+        times.extend(delay.values())
+      elif delay is not None:
+        times.append(delay)
+    bound = abs(until_time) + max((abs(time) for time in times), default=0)
+    if not math.isfinite(bound):
+      return False
+    step = 53 - math.frexp(bound)[1]
+    return all(math.ldexp(time, step).is_integer() for time in times)
+
+  def _fingerprint(self, now):
+    # The states of the signals, which conditions of the parameters hold,
+    # and the pending events in order, with times relative to now.
+    fingerprint = []
+    for signal in self.all.values():
+      fingerprint.append(signal.state)
+      if isinstance(signal, ParameterSignal):
+        fingerprint.append(signal.current_state)
+        fingerprint.append(signal.matched)
+        if signal.causes is not None:
+          fingerprint.extend(
+            (name, at - now)
+            for name, at in signal.cause.dependencies.items())
+    removed = self.heap.REMOVED
+    for at, _, signal in sorted(entry for entry in self.heap.pq
+                                if entry[-1] is not removed):
+      fingerprint.append(signal.name)
+      fingerprint.append(at - now)
+    return tuple(fingerprint)
+
+  def _mark(self, now, events):
+    return (now, events,
+            [len(signal.history) for signal in self.all.values()],
+            [None if signal.causes is None else len(signal.causes)
+             for signal in self.all.values()])
+
+  def _repeat(self, mark, now, events, until_time):
+    # Copies the period since `mark` as many times as fit before
+    # until_time and moves the pending events and the causes being
+    # gathered on by as much. Returns the number of events copied.
+    start, start_events, lengths, cause_lengths = mark
+    period = now - start
+    count = int((until_time - now) // period)
+    if count <= 0:
+      return 0
+    self.cycle = (start, period)
+    for signal, length, cause_length in zip(
+        self.all.values(), lengths, cause_lengths):
+      signal.history.repeat(length - 1, period, count)
+      if cause_length is not None:
+        _repeat_causes(signal.causes, cause_length, period, count)
+    shift = period * count
+    for entry in self.heap.pq:
+      entry[0] += shift
+    for signal in self.all.values():
+      if isinstance(signal, ParameterSignal):
+        dependencies = signal.cause.dependencies
+        for name in dependencies:
+          dependencies[name] += shift
+    return (events - start_events) * count
+
+  def _run_queue(self, until_time, max_events):
+    # _run for queues other than SignalHeap, through their methods, with
+    # the dependents as compile() lists them.
+    heap = self.heap
+    pop_until = heap.pop_until
+    add_signal = heap.add_signal
+    dependent = self._contexts()
+    limit = -1 if max_events is None else max_events
+    events = 0
+    while events != limit:
+      current_time, s = pop_until(until_time)
+      if s is None:
+        break
+      old_state, new_state, next_time = s.tick(current_time)
+      if next_time:
+        add_signal(s, next_time)
+      name = s.name
+      for context, dependency in dependent[name]:
+        next_dependency_time = context(
+            name, old_state, new_state, current_time, next_time)
+        if next_dependency_time:
+          add_signal(dependency, next_dependency_time)
+      events += 1
+    return events
+
+  def _contexts(self):
+    # The context methods of the dependents of every signal, by name, from
+    # the schedule once compiled.
+    if self.schedule is not None:
+      return dict(self.schedule)
+    return {name: tuple((dependency.context, dependency)
+                        for dependency in dependents)
+            for name, dependents in self.dependent.items()}
+
+  def _run_instrumented(self, until_time, max_events):
+    # run() with the events of every signal counted. Every tick adds one
+    # transition, so they are told by how much each history grew.
+    instrument = self.instrument
+    lengths = {name: len(signal.history) for name, signal in self.all.items()}
+    start = time.perf_counter()
+    if self.periodic is not None:
+      events, steps = self._run_periodic(until_time, max_events)
+    elif not isinstance(self.heap, SignalHeap):
+      events = steps = self._run_queue(until_time, max_events)
+    else:
+      events = steps = self._run_timed(until_time, max_events)
+    elapsed = time.perf_counter() - start
+    if steps != max_events:
+      self.until = max(self.until, until_time)
+
+    instrument.add_time("simulate.run", elapsed)
+    for name, signal in self.all.items():
+      instrument.count("events", name, len(signal.history) - lengths[name])
+    instrument.maximum("heap.high_water", len(self.heap))
+    instrument.set("heap.tombstones", self.heap.removed)
+    instrument.set("heap.compactions", self.heap.compactions)
+    heap = instrument.counters.get("heap")
+    if heap and heap["pushes"]:
+      instrument.set("heap.lazy_deletion_ratio",
+                     heap["removed"] / heap["pushes"])
+    return RunStats(events, elapsed, len(self.heap))
+
+  def _run_timed(self, until_time, max_events):
+    # _run, timing the ticks, the contexts and the heap operations apart
+    # and following the size of the heap. Removed counts the entries left
+    # behind as REMOVED, to be popped later.
+    instrument = self.instrument
+    clock = time.perf_counter
+    heap = self.heap
+    pq = heap.pq
+    entry_finder = heap.entry_finder
+    removed = heap.REMOVED
+    add_signal = heap.add_signal
+    dependent = self._contexts()
+    limit = -1 if max_events is None else max_events
+    events = 0
+    pushes = moves = stale = 0
+    high_water = len(pq)
+    heap_time = tick_time = context_time = 0.0
+    while pq and events != limit:
+      t0 = clock()
+      current_time, _, s = pq[0]
+      if s is removed:
+        heappop(pq)
+        heap.removed -= 1
+        stale += 1
+        heap_time += clock() - t0
+        continue
+      if until_time < current_time:
+        break
+      heappop(pq)
+      del entry_finder[s]
+      t1 = clock()
+      old_state, new_state, next_time = s.tick(current_time)
+      t2 = clock()
+      if next_time:
+        add_signal(s, next_time)
+        pushes += 1
+      t3 = clock()
+      heap_time += t1 - t0 + t3 - t2
+      tick_time += t2 - t1
+      name = s.name
+      for context, dependency in dependent[name]:
+        next_dependency_time = context(
+            name, old_state, new_state, current_time, next_time)
+        t4 = clock()
+        context_time += t4 - t3
+        if next_dependency_time:
+          if dependency in entry_finder:
+            moves += 1
+          add_signal(dependency, next_dependency_time)
+          pushes += 1
+        t3 = clock()
+        heap_time += t3 - t4
+      if len(pq) > high_water:
+        high_water = len(pq)
+      events += 1
+
+    instrument.add_time("simulate.heap", heap_time, events)
+    instrument.add_time("simulate.tick", tick_time, events)
+    instrument.add_time("simulate.context", context_time, events)
+    instrument.count("heap", "pushes", pushes)
+    instrument.count("heap", "removed", moves)
+    instrument.count("heap", "removed_pops", stale)
+    instrument.maximum("heap.high_water", high_water)
+    return events
+
+  def _run_periodic(self, until_time, max_events):
+    # Returns the transitions made, as the other loops do, and the steps
+    # taken, the edges replayed and the events of the heap, which
+    # max_events counts. Every event of the heap makes one transition.
+    periodic = self.periodic
+    transitions = periodic.transitions
+    replayed = periodic.replayed
+    limit = -1 if max_events is None else max_events
+    tick = self._tick_periodic
+    steps = 0
+    while steps != limit and tick(until_time):
+      steps += 1
+    events = (periodic.transitions - transitions +
+              steps - (periodic.replayed - replayed))
+    return events, steps
+
+  def _fire(self, current_time, s, number=None):
+    old_state, new_state, next_time = s.tick(current_time)
     if next_time:
       self.heap.add_signal(s, next_time)
-    for dependency in self.dependent[s.name]:
+      if number is not None:
+        self.periodic.scheduled[s] = (number, 0)
+    for index, dependency in enumerate(self.dependent[s.name], 1):
       next_dependency_time = dependency.context(
           s.name, old_state, new_state, current_time, next_time)
       if next_dependency_time:
         self.heap.add_signal(dependency, next_dependency_time)
+        if number is not None:
+          self.periodic.scheduled[dependency] = (number, index)
+
+  def _tick_periodic(self, until_time):
+    # Periodic signals are computed a block at a time; only their edges
+    # that feed loop-driven signals are replayed here, merged with the heap
+    # in the order of PeriodicSchedule. The next block waits for the heap
+    # to be past this one, to number its events.
+    periodic = self.periodic
+    scheduled = periodic.scheduled
+    event = periodic.peek()
+    heap_time, s = self.heap.peek_signal()
+    while (event is None and periodic.until < until_time and
+           (heap_time is None or heap_time > periodic.until)):
+      periodic.extend(min(until_time, periodic.until + periodic.span),
+                      self.dependent)
+      if self.sink is not None:
+        self.sink.spill()
+      event = periodic.peek()
+
+    if event is not None and (
+        heap_time is None or event[0] < heap_time or
+        (event[0] == heap_time and
+         periodic.edge_key(event[1]) < periodic.key(s))):
+      current_time, _, node, old_state, new_state, next_time = event
+      number = periodic.pop()
+      name = node.signal.name
+      for dependency, index in node.loop_dependents:
+        next_dependency_time = dependency.context(
+            name, old_state, new_state, current_time, next_time)
+        if next_dependency_time:
+          self.heap.add_signal(dependency, next_dependency_time)
+          scheduled[dependency] = (number, index)
+      return True
+
+    if heap_time is None or until_time < heap_time:
+      return False
+    current_time, s = self.heap.pop_signal()
+    self._fire(current_time, s, periodic.number(current_time,
+                                                periodic.key(s)))
     return True
 
+def _check_options(periodic, queue, cycles, instrument=None):
+  # Cycles are looked for in the plain event loop only.
+  if not cycles:
+    return
+  if queue != "heap":
+    raise ValueError("Cycles need the heap queue.")
+  if periodic:
+    raise ValueError("Cycles cannot be used with periodic mode.")
+  if instrument is not None:
+    raise ValueError("Cycles cannot be used with an instrument.")
+
+def _repeat_causes(causes, first, period, count):
+  if not isinstance(causes, list):
+    causes.repeat(first, period, count)
+    return
+  segment = causes[first:]
+  for copy in range(1, count + 1):
+    shift = period * copy
+    for cause in segment:
+      causes.append(cause.shifted(shift))
+
+class RunStats():
+  # `events` counts the transitions added to the histories, those computed
+  # in closed form or copied from a cycle included, so events per second
+  # compare across modes.
+  def __init__(self, events, elapsed, pending):
+    self.events = events
+    self.elapsed = elapsed
+    self.pending = pending
+
+  @property
+  def events_per_second(self):
+    if not self.elapsed:
+      return 0.0
+    return self.events / self.elapsed
+
+  def __repr__(self):
+    return (f"RunStats(events={self.events}, elapsed={self.elapsed:.6f}, "
+            f"events_per_second={self.events_per_second:.0f}, "
+            f"pending={self.pending})")
+
 class SignalHeap():
   def __init__(self):
     self.pq = []
     self.entry_finder = {}
     self.REMOVED = '<removed-task>'
-    self.counter = itertools.count()
+    self.counter = 0
+    # REMOVED entries still in pq.
+    self.removed = 0
+    self.compactions = 0
 
   def add_signal(self, signal, time=0):
     if signal in self.entry_finder:
       self.remove_signal(signal)
-    count = next(self.counter)
+    count = self.counter
+    self.counter += 1
     entry = [time, count, signal]
     self.entry_finder[signal] = entry
     heappush(self.pq, entry)
@@ -56,6 +671,17 @@ class SignalHeap():
   def remove_signal(self, signal):
     entry = self.entry_finder.pop(signal)
     entry[-1] = self.REMOVED
+    self.removed += 1
+    if self.removed > COMPACT_MIN and self.removed * 2 > len(self.pq):
+      self.compact()
+
+  def compact(self):
+    # In place, as the event loops hold on to pq.
+    removed = self.REMOVED
+    self.pq[:] = [entry for entry in self.pq if entry[-1] is not removed]
+    heapify(self.pq)
+    self.removed = 0
+    self.compactions += 1
 
   def pop_signal(self):
     while self.pq:
@@ -63,7 +689,146 @@ class SignalHeap():
       if signal is not self.REMOVED:
         del self.entry_finder[signal]
         return time, signal
+      self.removed -= 1
     raise KeyError('pop from an empty priority queue')
 
+  def pop_until(self, until_time):
+    time, signal = self.peek_signal()
+    if time is None or until_time < time:
+      return None, None
+    heappop(self.pq)
+    del self.entry_finder[signal]
+    return time, signal
+
+  def peek_signal(self):
+    pq = self.pq
+    while pq and pq[0][-1] is self.REMOVED:
+      heappop(pq)
+      self.removed -= 1
+    if pq:
+      return pq[0][0], pq[0][-1]
+    return None, None
+
   def __len__(self):
     return len(self.pq)
+
+class CalendarQueue():
+  # The interface of SignalHeap, with the entries in buckets `width` wide
+  # and a heap of the bucket numbers. Buckets are kept sorted. When event
+  # times sit on a grid of `width`, e.g. clock edges, every bucket holds a
+  # single time and entries are appended and popped from its ends.
+  def __init__(self, width=1):
+    self.width = width
+    self.buckets = {}
+    self.keys = []
+    self.entry_finder = {}
+    self.REMOVED = '<removed-task>'
+    self.counter = 0
+    self.size = 0
+    self.removed = 0
+    self.compactions = 0
+
+  def add_signal(self, signal, time=0):
+    if signal in self.entry_finder:
+      self.remove_signal(signal)
+    count = self.counter
+    self.counter += 1
+    entry = [time, count, signal]
+    self.entry_finder[signal] = entry
+    key = time // self.width
+    bucket = self.buckets.get(key)
+    if bucket is None:
+      self.buckets[key] = deque((entry,))
+      heappush(self.keys, key)
+    elif bucket[-1] < entry:
+      bucket.append(entry)
+    else:
+      insort(bucket, entry)
+    self.size += 1
+
+  def remove_signal(self, signal):
+    entry = self.entry_finder.pop(signal)
+    entry[-1] = self.REMOVED
+    self.removed += 1
+    if self.removed > COMPACT_MIN and self.removed * 2 > self.size:
+      self.compact()
+
+  def compact(self):
+    removed = self.REMOVED
+    for key in list(self.buckets):
+      bucket = deque(entry for entry in self.buckets[key]
+                     if entry[-1] is not removed)
+      if bucket:
+        self.buckets[key] = bucket
+      else:
+        del self.buckets[key]
+    self.keys = list(self.buckets)
+    heapify(self.keys)
+    self.size -= self.removed
+    self.removed = 0
+    self.compactions += 1
+
+  def resize(self, width):
+    # Moves the entries into buckets `width` wide.
+    removed = self.REMOVED
+    entries = sorted(entry for bucket in self.buckets.values()
+                     for entry in bucket if entry[-1] is not removed)
+    self.width = width
+    self.buckets = {}
+    for entry in entries:
+      key = entry[0] // width
+      bucket = self.buckets.get(key)
+      if bucket is None:
+        self.buckets[key] = deque((entry,))
+      else:
+        bucket.append(entry)
+    self.keys = list(self.buckets)
+    heapify(self.keys)
+    self.size = len(entries)
+    self.removed = 0
+
+  def _first(self):
+    # The bucket with the first live entry, after dropping the REMOVED
+    # entries in front of it.
+    buckets = self.buckets
+    keys = self.keys
+    removed = self.REMOVED
+    while keys:
+      bucket = buckets[keys[0]]
+      while bucket and bucket[0][-1] is removed:
+        bucket.popleft()
+        self.size -= 1
+        self.removed -= 1
+      if bucket:
+        return bucket
+      del buckets[heappop(keys)]
+    return None
+
+  def _pop(self, bucket):
+    time, _, signal = bucket.popleft()
+    self.size -= 1
+    if not bucket:
+      del self.buckets[heappop(self.keys)]
+    del self.entry_finder[signal]
+    return time, signal
+
+  def pop_signal(self):
+    bucket = self._first()
+    if bucket is None:
+      raise KeyError('pop from an empty priority queue')
+    return self._pop(bucket)
+
+  def pop_until(self, until_time):
+    bucket = self._first()
+    if bucket is None or until_time < bucket[0][0]:
+      return None, None
+    return self._pop(bucket)
+
+  def peek_signal(self):
+    bucket = self._first()
+    if bucket is None:
+      return None, None
+    return bucket[0][0], bucket[0][-1]
+
+  def __len__(self):
+    return self.size
@@ -0,0 +1,482 @@
+import numpy as np
+
+from signals.signal import Signal
+
+# Simulation times are taken to be in nanoseconds.
+TIME_UNIT = -9
+TIMESCALE = "1ps"
+
+# Transitions per signal merged and formatted at a time.
+CHUNK_SIZE = 1 << 16
+# Bytes read at a time.
+BLOCK_SIZE = 1 << 22
+
+# Both cases of x and z read the same, as in any VCD. DATA has no scalar
+# value, so signals with it are written as vectors, see _numbers, and
+# vectors read back as DATA unless all x or all z.
+SCALARS = {
+  Signal.LOW: "0",
+  Signal.HIGH: "1",
+  Signal.UNDEFINED: "x",
+  Signal.IMPEDANCE: "z",
+}
+_STATES = {ord(value): state for state, value in SCALARS.items()}
+_STATES[ord("X")] = Signal.UNDEFINED
+_STATES[ord("Z")] = Signal.IMPEDANCE
+
+# For reading blocks with numpy: the kind of change each first character
+# starts, and the state of changes as an index into _STATE_LIST.
+_SCALAR, _TIME, _VECTOR, _REAL = 1, 2, 3, 4
+_KINDS = np.zeros(256, dtype=np.int8)
+_KINDS[list(_STATES)] = _SCALAR
+_KINDS[ord("#")] = _TIME
+_KINDS[[ord("b"), ord("B")]] = _VECTOR
+_KINDS[[ord("r"), ord("R")]] = _REAL
+_STATE_LIST = list(SCALARS) + [Signal.DATA]
+_STATE_INDEX = np.zeros(256, dtype=np.int64)
+for _c, _state in _STATES.items():
+  _STATE_INDEX[_c] = _STATE_LIST.index(_state)
+_SPACES = np.zeros(256, dtype=bool)
+_SPACES[list(b" \t\n\r\v\f")] = True
+# Longest identifier and timestamp, in bytes, parsed with numpy.
+_KEY_SIZE = 8
+_TICK_DIGITS = 18
+
+_UNITS = {"s": 0, "ms": -3, "us": -6, "ns": -9, "ps": -12, "fs": -15}
+
+
+def write(file, signals, timescale=TIMESCALE, strings=False):
+  # Writes the histories of `signals`, a list or a dict such as
+  # SignalCollection.all, as a value change dump. `file` is a file name or
+  # a text file. With strings, signals with states other than scalars are
+  # written as strings, a GTKWave extension that reads back every state.
+  if isinstance(file, str):
+    with open(file, "w") as f:
+      return write(f, signals, timescale, strings)
+  if isinstance(signals, dict):
+    signals = list(signals.values())
+  number, exponent = _parse_timescale(timescale)
+  scale = 10**(TIME_UNIT - exponent) / number
+
+  values = []
+  file.write(f"$version timingdiagram $end\n$timescale {timescale} $end\n"
+             "$scope module timingdiagram $end\n")
+  for index, signal in enumerate(signals):
+    identifier = _identifier(index)
+    history = signal.history
+    states = [history.initial_state] + list(history.states)
+    if all(state in SCALARS for state in states if state is not None):
+      file.write(f"$var wire 1 {identifier} {signal.name} $end\n")
+      values.append([f"{SCALARS.get(state, 'x')}{identifier}\n"
+                     for state in states])
+    elif strings:
+      file.write(f"$var string 1 {identifier} {signal.name} $end\n")
+      values.append([f"s{_string(state)} {identifier}\n"
+                     for state in states])
+    else:
+      numbers = _numbers(states)
+      width = max(1, (len(numbers) - 1).bit_length())
+      file.write(f"$var wire {width} {identifier} {signal.name} $end\n")
+      values.append([f"b{_bits(state, numbers)} {identifier}\n"
+                     for state in states])
+  file.write("$upscope $end\n$enddefinitions $end\n#0\n$dumpvars\n")
+  file.write("".join(value[0] for value in values))
+  file.write("$end\n")
+
+  # Code 0 is the initial state, so transition codes are shifted by one.
+  table = np.array([value for value_list in values
+                    for value in value_list[1:]], dtype=object)
+  offsets = np.cumsum([0] + [len(value) - 1 for value in values])
+  histories = [(np.asarray(signal.history.times),
+                np.asarray(signal.history.codes)) for signal in signals]
+  positions = [0] * len(histories)
+  last_tick = 0
+  while True:
+    # Up to the time CHUNK_SIZE transitions ahead in the signal that gets
+    # there first, so every signal contributes a bounded slice.
+    end = np.inf
+    for (times, _), position in zip(histories, positions):
+      if position + CHUNK_SIZE < len(times):
+        end = min(end, times[position + CHUNK_SIZE])
+    chunk_times = []
+    chunk_values = []
+    for index, (times, codes) in enumerate(histories):
+      position = positions[index]
+      stop = len(times)
+      if end != np.inf:
+        stop = position + int(np.searchsorted(times[position:], end,
+                                              side="right"))
+      chunk_times.append(times[position:stop])
+      chunk_values.append(codes[position:stop].astype(np.int64) +
+                          offsets[index])
+      positions[index] = stop
+    times = np.concatenate(chunk_times)
+    if len(times):
+      order = np.argsort(times, kind="stable")
+      ticks = np.rint(times[order] * scale).astype(np.int64)
+      lines = table[np.concatenate(chunk_values)[order]]
+      changed = np.flatnonzero(np.diff(ticks, prepend=last_tick))
+      # The timestamps go in front of the first change at each tick.
+      out = np.empty(len(lines) + len(changed), dtype=object)
+      at = changed + np.arange(len(changed))
+      out[at] = [f"#{tick}\n" for tick in ticks[changed].tolist()]
+      keep = np.ones(len(out), dtype=bool)
+      keep[at] = False
+      out[keep] = lines
+      file.write("".join(out.tolist()))
+      last_tick = ticks[-1]
+    if end == np.inf:
+      break
+
+
+def read(file):
+  # Reads a value change dump into Signals with their histories filled in,
+  # ready for Canvas.add_signal. `file` is a file name or a binary file.
+  if isinstance(file, str):
+    with open(file, "rb") as f:
+      return read(f)
+  reader = _Reader()
+  tail = b""
+  while True:
+    block = file.read(BLOCK_SIZE)
+    if not block:
+      break
+    block = tail + block
+    # A token may continue into the next block.
+    cut = max(block.rfind(b" "), block.rfind(b"\n"), block.rfind(b"\t"),
+              block.rfind(b"\r"))
+    if cut < 0:
+      tail = block
+      continue
+    tail = block[cut + 1:]
+    reader.feed(block[:cut])
+  reader.feed(tail)
+  return reader.signals
+
+
+class _Reader():
+  # Parses the tokens of a dump as they are fed in.
+  def __init__(self):
+    self.signals = []
+    self.histories = {}
+    self.scopes = []
+    self.defined = False
+    self.keyword = None
+    self.arguments = []
+    self.factor = 1
+    self.divisor = 1
+    self.now = 0
+    self.value = None
+    self.pending = None
+    self.groups = {}
+    self.keys = None
+    self.key_groups = None
+
+  def feed(self, block):
+    if not self.defined:
+      block = b" ".join(self._header(block.split()))
+    while block:
+      block = block[self._fast_changes(block):]
+      # Commands up to their $end, anything else to the end of the block.
+      end = len(block)
+      if block.lstrip().startswith(b"$"):
+        found = block.find(b"$end")
+        if found >= 0:
+          end = found + len(b"$end")
+      self._changes(block[:end].split())
+      block = block[end:]
+
+  def _header(self, tokens):
+    # Declaration commands run up to $end. Returns the tokens left once
+    # the definitions end.
+    for index, token in enumerate(tokens):
+      if self.keyword is None:
+        if not token.startswith(b"$"):
+          raise ValueError(f"Unexpected token {token!r} in VCD header.")
+        self.keyword = token
+        self.arguments = []
+      elif token == b"$end":
+        keyword = self.keyword
+        self.keyword = None
+        self._command(keyword, self.arguments)
+        if self.defined:
+          return tokens[index + 1:]
+      else:
+        self.arguments.append(token)
+    return []
+
+  def _command(self, keyword, arguments):
+    if keyword == b"$scope":
+      self.scopes.append(arguments[-1].decode())
+    elif keyword == b"$upscope":
+      self.scopes.pop()
+    elif keyword == b"$timescale":
+      number, exponent = _parse_timescale(b"".join(arguments).decode())
+      exponent -= TIME_UNIT
+      if exponent >= 0:
+        self.factor = number * 10**exponent
+      else:
+        self.factor = number
+        self.divisor = 10**-exponent
+    elif keyword == b"$var":
+      identifier = arguments[2]
+      # Named by reference, under the scopes inside the outermost one.
+      name = ".".join(self.scopes[1:] +
+                      [b"".join(arguments[3:]).decode()])
+      signal = Signal(name, Signal.UNDEFINED)
+      signal.visible = True
+      self.signals.append(signal)
+      self.histories.setdefault(identifier, []).append(signal.history)
+    elif keyword == b"$enddefinitions":
+      self.groups = self.histories
+      self.histories = {identifier: _adder(histories)
+                        for identifier, histories in self.groups.items()}
+      if all(len(identifier) <= _KEY_SIZE for identifier in self.groups):
+        identifiers = list(self.groups)
+        keys = np.array([_key(identifier) for identifier in identifiers],
+                        dtype=np.uint64)
+        order = np.argsort(keys)
+        self.keys = keys[order]
+        self.key_groups = [self.groups[identifiers[index]]
+                           for index in order.tolist()]
+      self.defined = True
+
+  def _fast_changes(self, block):
+    # The same as _changes for the timestamps and scalar, vector and real
+    # changes `block` starts with, a column at a time. Returns how many
+    # bytes were done, none if it cannot tell the identifiers apart.
+    if self.keys is None or self.pending is not None:
+      return 0
+    data = np.frombuffer(block, dtype=np.uint8)
+    edges = np.diff(_SPACES[data].view(np.int8), prepend=1, append=1)
+    starts = np.flatnonzero(edges == -1)
+    lengths = np.flatnonzero(edges == 1) - starts
+    if not len(starts):
+      return len(block)
+    kinds = _KINDS[data[starts]]
+    values = kinds >= _VECTOR
+    # The token after a vector or real value is its identifier.
+    identifiers = np.concatenate(([False], values[:-1]))
+    stops = ((kinds == 0) & ~identifiers) | (values & identifiers)
+    count = int(np.argmax(stops)) if stops.any() else len(starts)
+    if count and values[count - 1]:
+      count -= 1
+    if not count:
+      return 0
+    done = len(block) if count == len(starts) else int(starts[count])
+    lengths = lengths[:count]
+    starts = starts[:count]
+    kinds = kinds[:count]
+    values = values[:count]
+    kinds[identifiers[:count]] = 0
+
+    changes = np.flatnonzero((kinds == _SCALAR) | values)
+    key_starts = np.where(values[changes], starts[changes + values[changes]],
+                          starts[changes] + 1)
+    key_lengths = np.where(values[changes], lengths[changes + values[changes]],
+                           lengths[changes] - 1)
+    if len(changes) and (key_lengths.max() > _KEY_SIZE or
+                         key_lengths.min() < 1):
+      return 0
+    columns = np.arange(int(key_lengths.max(initial=0)))
+    key_bytes = data[np.minimum(key_starts[:, None] + columns, len(data) - 1)]
+    key_bytes = np.where(columns < key_lengths[:, None], key_bytes, 0)
+    keys = (key_bytes.astype(np.uint64) <<
+            (8 * columns).astype(np.uint64)).sum(1, dtype=np.uint64)
+    positions = np.minimum(np.searchsorted(self.keys, keys),
+                           len(self.keys) - 1)
+    if (self.keys[positions] != keys).any():
+      return 0
+
+    timestamps = np.flatnonzero(kinds == _TIME)
+    ticks = _parse_ticks(block, data, starts[timestamps] + 1,
+                         lengths[timestamps] - 1)
+    if ticks is None:
+      return 0
+    times = np.concatenate(([self.now], _to_time(ticks, self.factor,
+                                                 self.divisor)))
+    change_times = times[np.cumsum(kinds == _TIME)[changes]]
+    states = _STATE_INDEX[data[starts[changes]]]
+    vectors = np.flatnonzero(values[changes])
+    states[vectors] = [
+      _STATE_LIST.index(_vector_state(block[start + 1:start + length]))
+      if block[start] in b"bB" else _STATE_LIST.index(Signal.DATA)
+      for start, length in zip(starts[changes[vectors]].tolist(),
+                               lengths[changes[vectors]].tolist())]
+
+    order = np.argsort(positions, kind="stable")
+    positions = positions[order]
+    bounds = np.flatnonzero(np.diff(positions)) + 1
+    for group, group_times, group_states in zip(
+        positions[np.concatenate(([0], bounds))[:len(positions)]].tolist(),
+        np.split(change_times[order], bounds),
+        np.split(states[order], bounds)):
+      for history in self.key_groups[group]:
+        _extend(history, group_times, group_states)
+    self.now = float(times[-1])
+    return done
+
+  def _changes(self, tokens):
+    histories = self.histories
+    states = _STATES
+    factor = self.factor
+    divisor = self.divisor
+    now = self.now
+    value = self.value
+    skip = self.pending
+    for token in tokens:
+      if skip is not None:
+        # Inside a $comment, or waiting for the identifier of a vector.
+        if value is None:
+          if token == b"$end":
+            skip = None
+          continue
+        histories[token](now, value)
+        value = None
+        skip = None
+        continue
+      c = token[0]
+      if c in states:
+        histories[token[1:]](now, states[c])
+      elif c == 35:
+        now = int(token[1:]) * factor / divisor
+      elif c == 98 or c == 66:
+        value = _vector_state(token[1:])
+        skip = token
+      elif c == 114 or c == 82:
+        value = Signal.DATA
+        skip = token
+      elif c == 115 or c == 83:
+        value = token[1:].decode()
+        skip = token
+      elif token == b"$comment":
+        skip = token
+      elif not token.startswith(b"$"):
+        raise ValueError(f"Unexpected token {token!r} in VCD.")
+    self.now = now
+    self.value = value
+    self.pending = skip
+
+
+def _adder(histories):
+  # Values at time 0 set the initial state, later ones are transitions.
+  if len(histories) == 1:
+    history = histories[0]
+    history_add = history.add
+
+    def add(time, state):
+      if time:
+        history_add(time, state)
+      else:
+        history.initial_state = state
+    return add
+
+  adders = [_adder([history]) for history in histories]
+
+  def add_all(time, state):
+    for add in adders:
+      add(time, state)
+  return add_all
+
+
+def _extend(history, times, states):
+  # Appends transitions, where states index _STATE_LIST. Values at time 0
+  # set the initial state, as in _adder.
+  zero = int(np.searchsorted(times, 0, side="right"))
+  if zero:
+    history.initial_state = _STATE_LIST[states[zero - 1]]
+  times = times[zero:]
+  states = states[zero:]
+  if not len(times):
+    return
+  # States are interned in the order they first appear.
+  used, first = np.unique(states, return_index=True)
+  codes = np.zeros(len(_STATE_LIST), dtype=np.int64)
+  for index in used[np.argsort(first)].tolist():
+    codes[index] = history.code(_STATE_LIST[index])
+  history.times.frombytes(times.tobytes())
+  dtype = np.uint8 if history.codes.typecode == "B" else np.uint16
+  history.codes.frombytes(codes[states].astype(dtype).tobytes())
+
+
+def _parse_ticks(block, data, starts, lengths):
+  # The integers at `starts`, a digit column at a time. None if they may
+  # not fit, or are not all digits.
+  if not len(starts):
+    return np.empty(0, dtype=np.int64)
+  width = int(lengths.max())
+  if width > _TICK_DIGITS or lengths.min() < 1:
+    return None
+  ticks = np.zeros(len(starts), dtype=np.int64)
+  for column in range(width):
+    inside = column < lengths
+    digits = data[np.minimum(starts + column, len(data) - 1)].astype(np.int64)
+    digits -= ord("0")
+    if ((digits[inside] < 0) | (digits[inside] > 9)).any():
+      return None
+    ticks = np.where(inside, ticks * 10 + digits, ticks)
+  return ticks
+
+
+def _to_time(ticks, factor, divisor):
+  # As int(tick) * factor / divisor does it, exact while the product fits
+  # in a double's mantissa.
+  if len(ticks) and int(ticks.max()) * factor >= 1 << 53:
+    return np.array([int(tick) * factor / divisor for tick in ticks.tolist()])
+  return (ticks * factor).astype(np.float64) / divisor
+
+
+def _key(identifier):
+  return int.from_bytes(identifier, "little")
+
+
+def _vector_state(bits):
+  if bits and bits.strip(b"xX") == b"":
+    return Signal.UNDEFINED
+  if bits and bits.strip(b"zZ") == b"":
+    return Signal.IMPEDANCE
+  return Signal.DATA
+
+
+def _identifier(index):
+  # Printable ASCII from "!" to "~".
+  identifier = ""
+  while True:
+    identifier += chr(33 + index % 94)
+    index //= 94
+    if not index:
+      return identifier
+
+
+def _numbers(states):
+  # The values of the states of a vector but UNDEFINED and IMPEDANCE,
+  # written as all x and all z: LOW and HIGH are 0 and 1 if there, and the
+  # others count up in the order they come.
+  numbers = {}
+  if Signal.LOW in states or Signal.HIGH in states:
+    numbers = {Signal.LOW: 0, Signal.HIGH: 1}
+  for state in states:
+    if state not in numbers and state not in (None, Signal.UNDEFINED,
+                                              Signal.IMPEDANCE):
+      numbers[state] = len(numbers)
+  return numbers
+
+
+def _bits(state, numbers):
+  if state in numbers:
+    return format(numbers[state], "b")
+  if state == Signal.IMPEDANCE:
+    return "z"
+  return "x"
+
+
+def _string(state):
+  return str(state).replace(" ", "_")
+
+
+def _parse_timescale(timescale):
+  number = timescale.rstrip("afmnpsu ")
+  unit = timescale[len(number):].strip()
+  if number not in ("1", "10", "100") or unit not in _UNITS:
+    raise ValueError(f"Invalid timescale [{timescale}].")
+  return int(number), _UNITS[unit]
@@ -0,0 +1,113 @@
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+# Coordinates buffered before they are formatted and written.
+BUFFER_SIZE = 1 << 16
+
+
+class SvgDraw():
+    # Writes the ImageDraw calls Canvas makes as SVG elements, straight to
+    # the file as they are made.
+    def __init__(self, file, width, height, background):
+        self.file = file
+        self.fill = None
+        self.coords = []
+        self.starts = []
+        self.file.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" '
+            f'height="{height}" viewBox="0 0 {width} {height}">\n'
+            f'<rect width="100%" height="100%" fill="{_color(background)}"/>\n'
+            '<g fill="none" stroke-width="1" stroke-linecap="square" '
+            'shape-rendering="crispEdges">\n')
+
+    def line(self, xy, fill=None, width=1):
+        if xy and not isinstance(xy[0], (int, float)):
+            xy = [c for point in xy for c in point]
+        # Consecutive lines of the same color are subpaths of one path.
+        if fill != self.fill:
+            self._end_path()
+            self.file.write(f'<path stroke="{_color(fill)}" d="')
+            self.fill = fill
+        self.starts.append(len(self.coords))
+        self.coords.extend(xy)
+        if len(self.coords) > BUFFER_SIZE:
+            self._flush()
+
+    def rectangle(self, xy, fill=None, outline=None, width=1):
+        self._end_path()
+        x0, y0, x1, y1 = xy
+        self.file.write(
+            f'<rect x="{x0:.2f}" y="{y0:.2f}" width="{x1 - x0:.2f}" '
+            f'height="{y1 - y0:.2f}" fill="{_color(fill)}" '
+            'stroke="none"/>\n')
+
+    def text(self, xy, text, fill=None, font=None):
+        self._end_path()
+        # Pillow places the top of the text at y, SVG its baseline.
+        x, y = xy
+        ascent, _ = font.getmetrics()
+        family, _ = font.getname()
+        self.file.write(
+            f'<text x="{x:.2f}" y="{y + ascent:.2f}" font-family="{family}" '
+            f'font-size="{font.size}" fill="{_color(fill)}" '
+            f'stroke="none">{escape(text)}</text>\n')
+
+    def close(self):
+        self._end_path()
+        self.file.write('</g>\n</svg>\n')
+
+    def _end_path(self):
+        if self.fill is not None:
+            self._flush()
+            self.file.write('"/>\n')
+            self.fill = None
+
+    def _flush(self):
+        if self.coords:
+            self.file.write(_format(self.coords, self.starts))
+        self.coords = []
+        self.starts = []
+
+
+def _color(color):
+    return "#%02x%02x%02x" % tuple(color)
+
+
+def _format(values, starts=None):
+    # Every value with two decimals, well below a pixel, like " %.2f" but
+    # rounding value * 100 half to even with np.rint, so the last digit can
+    # differ, and without a sign for values that round to zero. The text
+    # is built a column of characters at a time: separator, sign, integer
+    # digits, point and decimals, then the sign and leading zeros are
+    # dropped where not needed. Values at `starts` are separated by "M" to
+    # begin a new subpath.
+    cents = np.rint(np.asarray(values, dtype=np.float64) * 100)
+    cents = cents.astype(np.int64)
+    negative = cents < 0
+    cents = np.abs(cents)
+    digits = max(3, len(str(int(cents.max(initial=0)))))
+
+    chars = np.empty((len(cents), digits + 3), dtype=np.uint8)
+    keep = np.ones(chars.shape, dtype=bool)
+    chars[:, 0] = ord(" ")
+    if starts is not None:
+        chars[starts, 0] = ord("M")
+    chars[:, 1] = ord("-")
+    keep[:, 1] = negative
+    chars[:, digits] = ord(".")
+    columns = list(range(digits + 2, digits, -1)) + list(range(digits - 1, 1,
+                                                               -1))
+    rest = cents
+    if digits < 10:
+        rest = rest.astype(np.uint32)
+    for column in columns:
+        if column < digits - 1:
+            keep[:, column] = rest > 0
+        quotient = rest // 10
+        chars[:, column] = rest - quotient * 10
+        rest = quotient
+    chars[:, 2:] += np.uint8(ord("0"))
+    chars[:, digits] = ord(".")
+    return chars[keep].tobytes().decode("ascii")
@@ -0,0 +1,213 @@
+import argparse
+import copy
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import (ProcessPoolExecutor, FIRST_COMPLETED,
+                                as_completed, wait)
+from contextlib import nullcontext
+
+import numpy as np
+
+from canvas import Canvas
+from main import simulate
+from signals import analysis
+
+# Variants in flight per worker.
+QUEUE_DEPTH = 4
+
+
+class Sweep():
+    # Runs a base configuration, as main takes it, once for every
+    # combination of the values in data["parameters"]. Parameters are paths
+    # into the configuration, with signals named by their name, e.g.
+    # "signals.PXL_CLK.frequency", "signals.TC.true_state.CNT_1" or "time".
+    # Values are a list, or a range given as start, stop and either step
+    # or num, with stop included. The sink and vcd_output of the base are
+    # not used.
+    def __init__(self, base, data):
+        self.base = base
+        self.workers = os.cpu_count() or 1
+        self.output = None
+
+        if "parameters" not in data:
+            raise ValueError("Sweep malformed. Missing 'parameters'.")
+        self.parameters = {path: _values(path, values)
+                           for path, values in data["parameters"].items()}
+        if "workers" in data:
+            self.workers = data["workers"]
+        if "output" in data:
+            self.output = data["output"]
+
+        for path in self.parameters:
+            _set(copy.deepcopy(base), path, None)
+
+    def variants(self):
+        paths = list(self.parameters)
+        for values in itertools.product(*self.parameters.values()):
+            yield dict(zip(paths, values))
+
+    def __len__(self):
+        return math.prod(len(values) for values in self.parameters.values())
+
+    def run(self, progress=None):
+        # Yields a result for every variant, as they complete. `progress`
+        # is called with the number done, the total and the result.
+        total = len(self)
+        jobs = ((index, variant, self.output)
+                for index, variant in enumerate(self.variants()))
+        with self._executor() as executor:
+            for done, result in enumerate(self._map(executor, jobs), 1):
+                if progress is not None:
+                    progress(done, total, result)
+                yield result
+
+    def save(self, filename, progress=None):
+        results = sorted(self.run(progress), key=lambda r: r["index"])
+        with open(filename, "w") as f:
+            json.dump(results, f, indent=1)
+        return results
+
+    def _executor(self):
+        if self.workers <= 1:
+            _init_worker(self.base)
+            return nullcontext()
+        return ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                   initargs=(self.base,))
+
+    def _map(self, executor, jobs):
+        pending = set()
+        limit = self.workers * QUEUE_DEPTH
+        for args in jobs:
+            if executor is None:
+                yield _run_variant(*args)
+                continue
+            if len(pending) >= limit:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(executor.submit(_run_variant, *args))
+        for future in as_completed(pending):
+            yield future.result()
+
+
+# The base configuration, sent once to each worker.
+_base = None
+
+
+def _init_worker(base):
+    global _base
+    _base = base
+
+
+def _run_variant(index, variant, output):
+    # A variant that fails, e.g. with a config the schema rejects, reports
+    # its error instead of stopping the sweep.
+    result = {"index": index, "parameters": variant,
+              "elapsed": None, "signals": {}, "error": None}
+    try:
+        data = copy.deepcopy(_base)
+        for path, value in variant.items():
+            _set(data, path, value)
+        # Every variant would write to the same files.
+        data.pop("sink", None)
+        data.pop("vcd_output", None)
+        start = time.perf_counter()
+        signals = simulate(data)
+        result["elapsed"] = time.perf_counter() - start
+
+        for signal in signals:
+            result["signals"][signal.name] = _metrics(signal.history)
+        if output is not None:
+            cvs = Canvas(data["canvas"])
+            for signal in signals:
+                cvs.add_signal(signal)
+            result["output"] = output.format(index=index)
+            cvs.render(result["output"])
+    except Exception as error:
+        result["error"] = f"{type(error).__name__}: {error}"
+    return result
+
+
+def _metrics(history):
+    # The shortest time between two transitions is where glitches show.
+    metrics = {"edges": len(history) - 1, "state": history[-1][1],
+               "min_pulse": None, "min_pulse_at": None}
+    shortest = analysis.min_pulse_width(history)
+    if shortest is not None:
+        metrics["min_pulse"], metrics["min_pulse_at"] = shortest
+    return metrics
+
+
+def _values(path, values):
+    if isinstance(values, list):
+        return values
+    if not isinstance(values, dict) or "start" not in values or (
+            "stop" not in values):
+        raise ValueError(f"Parameter [{path}] needs a list of values or "
+                         "start and stop.")
+    start = values["start"]
+    stop = values["stop"]
+    if "num" in values:
+        return np.linspace(start, stop, values["num"]).tolist()
+    if "step" not in values:
+        raise ValueError(f"Parameter [{path}] needs step or num.")
+    step = values["step"]
+    count = math.floor((stop - start) / step + 1e-9) + 1
+    return [start + step * i for i in range(count)]
+
+
+def _set(data, path, value):
+    keys = path.split(".")
+    target = data
+    if keys[0] == "signals":
+        if len(keys) < 3:
+            raise ValueError(f"Parameter [{path}] needs a signal and a key.")
+        for signal in data["signals"]:
+            if signal["name"] == keys[1]:
+                target = signal
+                break
+        else:
+            raise ValueError(f"Parameter [{path}] names no signal.")
+        keys = keys[2:]
+    for key in keys[:-1]:
+        target = target.setdefault(key, {})
+        if not isinstance(target, dict):
+            raise ValueError(f"Parameter [{path}] is not a path of keys.")
+    target[keys[-1]] = value
+
+
+def _print_progress(done, total, result):
+    print(f"\r[{done}/{total}] variant {result['index']}", end="",
+          file=sys.stderr, flush=True)
+    if done == total:
+        print(file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a configuration over ranges of its parameters.")
+    parser.add_argument("base", help="configuration, as main takes it")
+    parser.add_argument("sweep", help="parameters, workers and output")
+    parser.add_argument("results", help="JSON file for the results")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    with open(args.base) as json_file:
+        base = json.load(json_file)
+    with open(args.sweep) as json_file:
+        data = json.load(json_file)
+    if args.workers is not None:
+        data["workers"] = args.workers
+    results = Sweep(base, data).save(args.results, progress=_print_progress)
+    for result in results:
+        if result["error"] is not None:
+            print(f"variant {result['index']}: {result['error']}",
+                  file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
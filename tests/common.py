@@ -0,0 +1,94 @@
+import json
+import random
+from pathlib import Path
+
+from canvas import Canvas
+from signals.json import deserialize
+from signals.utils import SignalCollection
+
+ROOT = Path(__file__).resolve().parent.parent
+FONT = str(ROOT / "fonts" / "Roboto-Regular.ttf")
+
+
+def tickers_config():
+    with open(ROOT / "tickers.json") as json_file:
+        return json.load(json_file)
+
+
+def tickers():
+    return tickers_config()["signals"]
+
+
+def random_signals(seed):
+    # Tickers sharing periods and counters with no or short delays, so that
+    # edges often fall at the same time, and parameters reading them.
+    rng = random.Random(seed)
+    signals = []
+    names = []
+    for number in range(rng.randint(1, 3)):
+        name = f"K{number}"
+        signals.append({"type": "ticker", "name": name,
+                        "period": rng.choice([2, 2, 3, 4, 6])})
+        names.append(name)
+    for number in range(rng.randint(1, 6)):
+        signal = {"type": "counter", "name": f"C{number}",
+                  "dependencies": [rng.choice(names)]}
+        if rng.random() < .5:
+            signal["old_state_trigger"] = "HIGH"
+            signal["new_state_trigger"] = "LOW"
+        if rng.random() < .6:
+            signal["delay"] = rng.choice([0, 0.5, 1, 2])
+        signals.append(signal)
+        names.append(signal["name"])
+    for number in range(rng.randint(1, 3)):
+        dependencies = rng.sample(names, min(len(names), rng.randint(1, 3)))
+        signal = {"type": "parameter", "name": f"P{number}",
+                  "true_state": {name: rng.choice(["HIGH", "LOW"])
+                                 for name in dependencies},
+                  "delay": rng.choice([0, 1, 2])}
+        signals.append(signal)
+        names.append(signal["name"])
+    if rng.random() < .3:
+        signals.append({"type": "counter", "name": "CP",
+                        "dependencies": [rng.choice(names[-2:])],
+                        "delay": rng.choice([0, 1])})
+    return signals
+
+
+def workloads(until_time=10**5, seeds=20):
+    return [("tickers", tickers(), until_time)] + [
+        (f"random_{seed}", random_signals(seed), 300) for seed in range(seeds)]
+
+
+def collection(signals=None, sc=None, **options):
+    # `signals`, those of tickers.json by default, added to sc or to a new
+    # SignalCollection made with `options`.
+    if sc is None:
+        sc = SignalCollection(**options)
+    for signal in deserialize(tickers() if signals is None else signals):
+        sc.add(signal)
+    return sc
+
+
+def histories(sc):
+    return {name: list(signal.history) for name, signal in sc.all.items()}
+
+
+def causes(sc):
+    # Only those of visible signals with show_cause, the causes that are
+    # drawn, which every engine mode keeps.
+    return {name: [(cause.event, dict(cause.dependencies))
+                   for cause in signal.causes]
+            for name, signal in sc.all.items()
+            if signal.visible and signal.show_cause}
+
+
+def tickers_canvas(**settings):
+    # tickers.json simulated to 3000 on its canvas, with the bundled font.
+    data = tickers_config()
+    sc = collection(data["signals"])
+    sc.run(3000)
+    cvs = Canvas(dict(data["canvas"], font_file=FONT, **settings))
+    for signal in sc.all.values():
+        cvs.add_signal(signal)
+    return cvs
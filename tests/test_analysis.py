@@ -0,0 +1,182 @@
+import math
+
+import numpy as np
+import pytest
+
+from signals import analysis
+from signals.signal import Signal, _Cause
+from signals.sink import HistorySink
+from tests.common import collection, tickers, workloads
+
+
+def simulated(signals, until_time):
+    sc = collection(signals)
+    sc.run(until_time)
+    return sc
+
+
+@pytest.fixture(params=workloads(2 * 10**4, seeds=10),
+                ids=lambda workload: workload[0])
+def sc(request):
+    _, signals, until_time = request.param
+    return simulated(signals, until_time)
+
+
+def transitions(signal, start=None, end=None):
+    # (time, state before, state after) of every transition.
+    history = list(signal.history)
+    return [(time, before, after)
+            for (_, before), (time, after) in zip(history, history[1:])
+            if (start is None or time >= start) and (end is None or time < end)]
+
+
+def window(sc):
+    times = [time for signal in sc.all.values()
+             for time, _, _ in transitions(signal)]
+    if not times:
+        return None, None
+    return times[len(times) // 3], times[2 * len(times) // 3]
+
+
+def test_edges(sc):
+    start, end = window(sc)
+    for signal in sc.all.values():
+        states = {state for _, state in signal.history}
+        for into in [None] + sorted(states):
+            for out_of in [None] + sorted(states):
+                assert analysis.edges(signal, into, out_of).tolist() == [
+                    time for time, before, after in transitions(signal)
+                    if into in (None, after) and out_of in (None, before)]
+        assert analysis.edges(signal, start=start, end=end).tolist() == [
+            time for time, _, _ in transitions(signal, start, end)]
+        assert len(analysis.edges(signal, into="NOT A STATE")) == 0
+
+
+def test_state_at(sc):
+    for signal in sc.all.values():
+        times = [time for time, _, _ in transitions(signal)]
+        probes = [-1.0] + times + [time + 0.01 for time in times] + [1e9]
+        assert analysis.state_at(signal, probes).tolist() == [
+            signal.history.value_at(time) for time in probes]
+
+
+def test_pulse_widths(sc):
+    start, end = window(sc)
+    for signal in sc.all.values():
+        found = transitions(signal, start, end)
+        pulses = [(time, after, following - time) for (time, _, after),
+                  (following, _, _) in zip(found, found[1:])]
+        times, widths = analysis.pulse_widths(signal, start=start, end=end)
+        assert list(zip(times.tolist(), widths.tolist())) == [
+            (time, width) for time, _, width in pulses]
+        for state in {state for _, state in signal.history}:
+            times, widths = analysis.pulse_widths(signal, state, start, end)
+            expected = [(time, width) for time, after, width in pulses
+                        if after == state]
+            assert list(zip(times.tolist(), widths.tolist())) == expected
+            narrowest = analysis.min_pulse_width(signal, state, start, end)
+            if expected:
+                width = min(width for _, width in expected)
+                time = next(time for time, w in expected if w == width)
+                assert narrowest == (width, time)
+            else:
+                assert narrowest is None
+        if pulses:
+            limit = sorted(width for _, _, width in pulses)[len(pulses) // 2]
+            times, widths = analysis.glitches(signal, limit, start=start,
+                                              end=end)
+            assert times.tolist() == [time for time, _, width in pulses
+                                      if width < limit]
+
+
+def test_edge_to_edge(sc):
+    signals = list(sc.all.values())
+    for a, b in zip(signals, signals[1:] + signals[:1]):
+        b_times = [time for time, _, _ in transitions(b)]
+        for window in (math.inf, 5):
+            times, latencies = analysis.edge_to_edge(a, b, window)
+            expected = []
+            for time, _, _ in transitions(a):
+                later = [t - time for t in b_times if t >= time]
+                if later and later[0] <= window:
+                    expected.append(later[0])
+                else:
+                    expected.append(None)
+            assert times.tolist() == [time for time, _, _ in transitions(a)]
+            assert [None if math.isnan(latency) else latency
+                    for latency in latencies.tolist()] == expected
+
+
+def test_setup_hold():
+    data = Signal("D", Signal.LOW)
+    clock = Signal("CLK", Signal.LOW)
+    for time in (1, 4, 10, 11):
+        data.history.add(time, [Signal.HIGH, Signal.LOW][time % 2])
+    for time in range(2, 15, 3):
+        clock.history.add(time, [Signal.LOW, Signal.HIGH][time % 2])
+    times, setup, hold = analysis.setup_hold(data, clock, Signal.HIGH)
+    assert times.tolist() == [5, 11]
+    assert setup.tolist() == [1, 0]
+    assert hold[0] == 5
+    assert math.isnan(hold[1])
+    times, setup, hold = analysis.setup_hold(data, clock, Signal.LOW)
+    assert times.tolist() == [2, 8, 14]
+    assert setup.tolist() == [1, 4, 3]
+    assert hold[:2].tolist() == [2, 2]
+    assert math.isnan(hold[2])
+
+
+def test_simulations_are_causal(sc):
+    analysis.assert_causality(sc.all)
+    for signal in sc.all.values():
+        if signal.causes is None or not signal.causes:
+            continue
+        origins = {name for cause in signal.causes
+                   for name in cause.dependencies}
+        for origin in origins:
+            times, latencies = analysis.cause_latencies(signal, origin)
+            expected = [(cause.event[1], cause.event[1] - time)
+                        for cause in signal.causes
+                        for name, time in cause.dependencies.items()
+                        if name == origin]
+            assert list(zip(times.tolist(), latencies.tolist())) == expected
+
+
+def test_violations_are_found():
+    sc = simulated(tickers(), 2 * 10**4)
+    signal = next(signal for signal in sc.all.values() if signal.causes)
+    cause = signal.causes[len(signal.causes) // 2]
+    name, event_time = cause.event
+    origin = next(iter(cause.dependencies))
+    cause.dependencies[origin] = event_time + 1
+    late = _Cause(origin, 0.123, name, event_time)
+    signal.causes.append(late)
+    violations = analysis.causality_violations(sc.all)
+    assert (name, event_time, origin, event_time + 1,
+            "origin after event") in violations
+    assert (name, event_time, origin, 0.123,
+            "no edge of origin") in violations
+    with pytest.raises(AssertionError, match="causality violations"):
+        analysis.assert_causality(sc.all)
+    assert analysis.causality_violations(sc.all, tolerance=10**6) == []
+
+
+def test_spilled_histories(tmp_path):
+    expected = simulated(tickers(), 2 * 10**4)
+    sink = HistorySink(str(tmp_path), chunk_size=64)
+    sc = collection(sink=sink)
+    sc.run(2 * 10**4)
+    signal = next(iter(sc.all.values()))
+    with pytest.raises(ValueError):
+        analysis.edges(signal)
+    sink.close()
+    for name, signal in sc.all.items():
+        assert analysis.edges(signal).tolist() == analysis.edges(
+            expected.all[name]).tolist()
+        if signal.causes is None:
+            continue
+        for origin in expected.all[name].dependencies or ():
+            assert np.array_equal(
+                analysis.cause_latencies(signal, origin),
+                analysis.cause_latencies(expected.all[name], origin))
+    analysis.assert_causality(sc.all)
@@ -0,0 +1,185 @@
+import random
+
+import pytest
+
+from canvas import Canvas
+from signals.signal import Signal
+from tests.common import FONT
+
+ALPHABETS = [
+    [Signal.LOW, Signal.HIGH],
+    [Signal.DATA, Signal.UNDEFINED],
+    [Signal.DATA],
+    [Signal.UNDEFINED],
+    [Signal.LOW, Signal.DATA, Signal.IMPEDANCE, Signal.UNDEFINED,
+     Signal.HIGH],
+]
+
+
+def random_signals(rng, edges=30):
+    signals = []
+    for number in range(rng.randint(1, 4)):
+        alphabet = rng.choice(ALPHABETS)
+        signal = Signal(f"S{number}", rng.choice(alphabet))
+        signal.visible = True
+        signal.show_cause = False
+        time = 0
+        for _ in range(rng.randint(1, edges)):
+            time += rng.choice([0.5, 3, 20, 77.3, 150, rng.uniform(0.1, 200)])
+            signal.history.add(time, rng.choice(alphabet))
+        signals.append(signal)
+    return signals
+
+
+def random_settings(rng):
+    return {"time_multiplier": rng.choice([0.5, 1, 2, 0.37, 3]),
+            "slope_time": rng.choice([1, 5, 0.6, 2.5, 3]),
+            "h_spacing": rng.choice([60, 80.5]),
+            "start": rng.choice([40, 11.3])}
+
+
+def render(signals, settings, extra=0):
+    cvs = Canvas(dict(settings, font_file=FONT))
+    for signal in signals:
+        cvs.add_signal(signal)
+    cvs.oldest += extra
+    cvs.render()
+    return cvs.image.tobytes()
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_polylines_match_segments(seed):
+    rng = random.Random(seed)
+    settings = random_settings(rng)
+    signals = random_signals(rng)
+    extra = rng.choice([0, 0, 100])
+    assert (render(signals, dict(settings, polyline=True), extra) ==
+            render(signals, dict(settings, polyline=False), extra))
+
+
+def test_binary_signal_is_one_polyline():
+    signal = Signal("CLK", Signal.LOW)
+    for edge in range(1, 101):
+        signal.history.add(edge * 10.0, [Signal.HIGH, Signal.LOW][edge % 2])
+    cvs = Canvas({"font_file": FONT})
+    cvs.end = 1010
+    lines, bands = cvs._get_shapes(signal.history, 0)
+    assert len(lines) == 1
+    assert bands == []
+    segments, _ = cvs._get_segments(signal.history, 0)
+    points = [segments[0][0]] + [point for line in segments
+                                 for point in line[1:]]
+    assert lines[0] == [coordinate for point in points
+                        for coordinate in point]
+
+
+def burst(initial_state, states, count=100, spacing=1.0):
+    # `count` edges `spacing` apart, then four far apart.
+    signal = Signal("B", initial_state)
+    for edge in range(1, count + 1):
+        signal.history.add(edge * spacing, states[edge % 2])
+    for edge in range(1, 5):
+        signal.history.add(count * spacing + edge * 50, states[edge % 2])
+    return signal
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_sparse_edges_are_not_decimated(seed):
+    # Edges further apart than min_edge_spacing are drawn as they are.
+    rng = random.Random(seed)
+    settings = dict(random_settings(rng), min_edge_spacing=0.01)
+    signals = random_signals(rng)
+    assert (render(signals, dict(settings, decimate=True)) ==
+            render(signals, dict(settings, decimate=False)))
+
+
+@pytest.mark.parametrize("initial_state, states", [
+    (Signal.LOW, [Signal.HIGH, Signal.LOW]),
+    (Signal.UNDEFINED, [Signal.DATA, Signal.UNDEFINED]),
+])
+def test_dense_edges_become_a_band(initial_state, states):
+    signal = burst(initial_state, states)
+    cvs = Canvas({"font_file": FONT, "decimate": True})
+    cvs.end = 400
+    lines, bands = cvs._get_shapes(signal.history, 0)
+    # From the first slope of the burst to its last one.
+    assert bands == [[2 - 5 + 60, 0, 200 + 5 + 60, 40]]
+    plain = Canvas({"font_file": FONT})
+    plain.end = 400
+    plain_lines, _ = plain._get_shapes(signal.history, 0)
+    assert len(points(plain_lines, 57, 265)) > 100
+    # Only the start of the signal is left under the band, and after it
+    # the points are the same.
+    assert len(points(lines, 57, 265)) <= 2
+    assert points(lines, 265, 1000) == points(plain_lines, 265, 1000)
+
+
+def points(lines, low, high):
+    return {(x, y) for line in lines
+            for x, y in zip(line[0::2], line[1::2]) if low < x < high}
+
+
+def test_min_edge_spacing():
+    signal = burst(Signal.LOW, [Signal.HIGH, Signal.LOW], spacing=10.0)
+    cvs = Canvas({"font_file": FONT, "decimate": True})
+    cvs.end = 2000
+    assert cvs._get_shapes(signal.history, 0)[1] == []
+    cvs = Canvas({"font_file": FONT, "decimate": True,
+                  "min_edge_spacing": 25})
+    cvs.end = 2000
+    assert len(cvs._get_shapes(signal.history, 0)[1]) == 1
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_decimated_segments_match_polylines(seed):
+    rng = random.Random(seed)
+    settings = dict(random_settings(rng), decimate=True,
+                    min_edge_spacing=rng.choice([3, 10, 40]))
+    signals = random_signals(rng, edges=80)
+    assert (render(signals, dict(settings, polyline=True)) ==
+            render(signals, dict(settings, polyline=False)))
+
+
+@pytest.mark.parametrize("polyline, states", [
+    (False, [Signal.HIGH, Signal.LOW]),
+    (False, [Signal.DATA, Signal.UNDEFINED]),
+    # Mixed states are drawn as segments on the polyline path too.
+    (True, [Signal.HIGH, Signal.DATA]),
+])
+def test_decimation_bounds_the_segments(polyline, states):
+    signal = burst(states[1], states, count=10**5, spacing=0.01)
+    cvs = Canvas({"font_file": FONT, "decimate": True,
+                  "polyline": polyline})
+    cvs.end = 1400
+    lines, bands = cvs._get_shapes(signal.history, 0)
+    assert bands == [[0.02 - 5 + 60, 0, 2000 + 5 + 60, 40]]
+    assert len(lines) < 100
+
+
+def cut(signal, start, end):
+    # The signal between start and end, moved to start at 0.
+    window = Signal(signal.name, signal.history.value_at(start - 1e-9))
+    window.visible = True
+    window.show_cause = False
+    for time, state in list(signal.history)[1:]:
+        if start <= time < end:
+            window.history.add(time - start, state)
+    return window
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_window_renders_the_cut_histories(seed):
+    rng = random.Random(seed)
+    settings = random_settings(rng)
+    signals = random_signals(rng, edges=60)
+    oldest = max(signal.history[-1][0] for signal in signals)
+    start = rng.uniform(0, oldest / 2)
+    end = rng.uniform(start + 1, oldest)
+    window = render(signals, dict(settings, window_start=start,
+                                  window_end=end))
+    cvs = Canvas(dict(settings, font_file=FONT))
+    for signal in signals:
+        cvs.add_signal(cut(signal, start, end))
+    cvs.oldest = end - start
+    cvs.render()
+    assert window == cvs.image.tobytes()
@@ -0,0 +1,115 @@
+import random
+
+import numpy as np
+import pytest
+
+from signals import causes as causes_module
+from signals.causes import CauseTable, IntervalIndex
+from signals.signal import _Cause
+from signals.sink import CAUSE_RECORD
+
+NAMES = ["A", "B", "C", "D", "E"]
+
+
+def random_causes(rng, name, count):
+    causes = []
+    for _ in range(count):
+        event_time = rng.choice([rng.randint(0, 100), rng.uniform(0, 100)])
+        cause = _Cause(event_name=name, event_time=event_time)
+        for orig_name in rng.sample(NAMES, rng.randint(1, 3)):
+            cause.add_cause(orig_name, event_time - rng.uniform(-5, 20))
+        causes.append(cause)
+    return causes
+
+
+def rows(name, causes):
+    return [(name, cause.event[1], orig_name, orig_time)
+            for cause in causes
+            for orig_name, orig_time in cause.dependencies.items()]
+
+
+def named(table, columns):
+    events, event_times, origs, orig_times = columns
+    return [(table.names[event], event_time, table.names[orig], orig_time)
+            for event, event_time, orig, orig_time
+            in zip(events.tolist(), event_times.tolist(), origs.tolist(),
+                   orig_times.tolist())]
+
+
+class Records():
+    # Causes as a HistorySink maps them.
+    def __init__(self, causes):
+        self.names = NAMES
+        found = rows(None, causes)
+        self.records = np.zeros(len(found), CAUSE_RECORD)
+        for record, (_, event_time, orig, orig_time) in zip(self.records,
+                                                            found):
+            record["event_time"] = event_time
+            record["orig"] = NAMES.index(orig)
+            record["orig_time"] = orig_time
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_queries_match_brute_force(seed, monkeypatch):
+    monkeypatch.setattr(causes_module, "CHUNK_SIZE", 50)
+    rng = random.Random(seed)
+    table = CauseTable()
+    expected = []
+    # Rows are added while the table is queried, as a live render does.
+    for _ in range(rng.randint(1, 12)):
+        name = rng.choice(NAMES)
+        causes = random_causes(rng, name, rng.choice([0, 1, 10, 200]))
+        if rng.random() < 0.3:
+            table.add(name, Records(causes))
+        else:
+            table.add(name, causes)
+        expected += rows(name, causes)
+        assert len(table) == len(expected)
+        for _ in range(3):
+            start = rng.choice([None, rng.uniform(-10, 110)])
+            end = rng.choice([None, rng.uniform(-10, 110)])
+            assert named(table, table.between(start, end)) == [
+                row for row in expected
+                if (start is None or row[1] >= start) and
+                (end is None or row[1] < end)]
+            start = rng.uniform(-30, 110)
+            end = start + rng.choice([0, 1, 30])
+            assert named(table, table.crossing(start, end)) == [
+                row for row in expected
+                if min(row[1], row[3]) <= end and max(row[1], row[3]) >= start]
+    assert named(table, table.get_columns()) == expected
+    assert len(table.runs) <= 1
+
+
+def test_runs_halve_in_size(monkeypatch):
+    monkeypatch.setattr(causes_module, "CHUNK_SIZE", 8)
+    rng = random.Random(0)
+    table = CauseTable()
+    for _ in range(100):
+        table.add("A", random_causes(rng, "A", rng.randint(1, 30)))
+        table.between()
+        sizes = [len(run) for run in table.runs]
+        assert all(size >= 2 * following
+                   for size, following in zip(sizes, sizes[1:]))
+
+
+def test_empty_table():
+    table = CauseTable()
+    assert len(table) == 0
+    for columns in (table.between(0, 10), table.crossing(0, 10),
+                    table.get_columns()):
+        assert [len(column) for column in columns] == [0, 0, 0, 0]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_interval_index(seed):
+    rng = np.random.default_rng(seed)
+    count = int(rng.integers(0, 300))
+    lows = rng.integers(0, 100, count).astype(float)
+    highs = lows + rng.choice([0, 1, 5, 80], count)
+    index = IntervalIndex(lows, highs)
+    for _ in range(20):
+        start = float(rng.uniform(-10, 110))
+        end = start + float(rng.choice([0, 0.5, 10, 50]))
+        assert index.find(start, end).tolist() == [
+            i for i in range(count) if lows[i] <= end and highs[i] >= start]
@@ -0,0 +1,39 @@
+import pytest
+
+from signals.signal import TickerSignal
+from tests.common import causes, collection, histories, workloads
+
+
+@pytest.mark.parametrize("workload", workloads(),
+                         ids=lambda workload: workload[0])
+def test_compiled(workload):
+    _, signals, until_time = workload
+    expected = collection(signals)
+    expected.run(until_time)
+    sc = collection(signals).compile()
+    sc.run(until_time)
+    assert histories(sc) == histories(expected)
+    assert causes(sc) == causes(expected)
+
+
+def test_order_and_schedule():
+    sc = collection().compile()
+    positions = {signal.name: signal.index for signal in sc.order}
+    assert sorted(positions.values()) == list(range(len(sc.all)))
+    for signal in sc.all.values():
+        for dependency in signal.dependencies or ():
+            assert positions[dependency] < positions[signal.name]
+        name, dependents = sc.schedule[signal.index]
+        assert name == signal.name
+        assert [dependency for _, dependency in dependents] == (
+            sc.dependent[name])
+    # Causes that are never drawn are dropped.
+    assert all((signal.causes is None) ==
+               (not signal.visible or not signal.show_cause)
+               for signal in sc.all.values())
+
+
+def test_no_signals_once_compiled():
+    sc = collection().compile()
+    with pytest.raises(RuntimeError):
+        sc.add(TickerSignal("LATE", period=2))
@@ -0,0 +1,40 @@
+from tests.common import causes, collection, histories, tickers
+
+
+def run(signals, until_time, cycles):
+    sc = collection(signals, cycles=cycles).compile()
+    sc.run(until_time)
+    return sc
+
+
+def states(sc):
+    return histories(sc), causes(sc)
+
+
+def test_periods_close_to_each_other():
+    signals = [
+        {"type": "ticker", "name": "A", "period": 2.0},
+        {"type": "ticker", "name": "B", "period": 2.0000001},
+        {"type": "parameter", "name": "P",
+         "true_state": {"A": "HIGH", "B": "HIGH"}},
+    ]
+    expected = states(run(signals, 2000, False))
+    assert states(run(signals, 2000, True)) == expected
+
+
+def test_tickers():
+    signals = tickers()
+    expected = states(run(signals, 20000, False))
+    assert states(run(signals, 20000, True)) == expected
+
+
+def test_tickers_on_a_grid():
+    # With a whole period the times are exact, and the cycle is replayed.
+    signals = tickers()
+    for signal in signals:
+        if "frequency" in signal:
+            del signal["frequency"]
+            signal["period"] = 40
+    sc = run(signals, 20000, True)
+    assert sc.cycle is not None
+    assert states(sc) == states(run(signals, 20000, False))
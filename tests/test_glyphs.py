@@ -0,0 +1,49 @@
+import random
+
+import pytest
+from PIL import Image, ImageDraw
+
+import glyphs
+from canvas import Canvas
+from signals.signal import Signal
+from tests.common import FONT
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_labels_match_text(seed):
+    rng = random.Random(seed)
+    text = rng.choice(["CLK", "PXL_CLK", "gjy|", "A", "TC_2 (x)"])
+    size = rng.choice([9, 15, 22])
+    color = tuple(rng.randrange(256) for _ in range(3))
+    xy = (rng.uniform(-8, 40), rng.uniform(-8, 30))
+    expected = Image.new("RGB", (80, 60), (255, 255, 255))
+    ImageDraw.Draw(expected).text(xy, text, fill=color,
+                                  font=glyphs.get_font(FONT, size))
+    image = Image.new("RGB", (80, 60), (255, 255, 255))
+    glyphs.draw_label(ImageDraw.Draw(image), xy, text, FONT, size, color)
+    assert image.tobytes() == expected.tobytes()
+
+
+def render(names):
+    cvs = Canvas({"font_file": FONT})
+    for name in names:
+        signal = Signal(name, Signal.LOW)
+        signal.visible = True
+        signal.history.add(10.5, Signal.HIGH)
+        cvs.add_signal(signal)
+    cvs.render()
+    return cvs.image.tobytes()
+
+
+def test_canvases_share_the_caches():
+    glyphs.cache_clear()
+    first = render(["CLK", "DATA"])
+    info = glyphs.cache_info()
+    assert info["font"].misses == 1
+    assert info["label"].misses == 2
+    assert render(["CLK", "DATA"]) == first
+    info = glyphs.cache_info()
+    assert info["font"].misses == 1
+    assert info["label"].misses == 2
+    assert info["label"].hits == 2
+    assert info["text_bbox"].misses == 2
@@ -0,0 +1,96 @@
+import pytest
+
+from signals.history import History
+from signals.signal import Signal
+
+
+def entries(count):
+    states = [Signal.LOW, Signal.HIGH, Signal.DATA, Signal.UNDEFINED]
+    return [(index * 2.5, states[index % len(states)])
+            for index in range(1, count + 1)]
+
+
+def history(initial_state, transitions):
+    history = History(initial_state)
+    for entry in transitions:
+        history.append(entry)
+    return history
+
+
+def test_reads_as_a_list():
+    transitions = entries(10)
+    expected = [(None, Signal.LOW)] + transitions
+    h = history(Signal.LOW, transitions)
+    assert list(h) == expected
+    assert h == expected
+    assert len(h) == len(expected)
+    assert [h[index] for index in range(len(h))] == expected
+    assert h[-1] == expected[-1]
+    assert h[-len(h)] == expected[0]
+    assert h[2:7] == expected[2:7]
+    assert h[::-3] == expected[::-3]
+
+
+def test_index_out_of_range():
+    h = history(Signal.LOW, entries(3))
+    for index in (4, -5):
+        with pytest.raises(IndexError):
+            h[index]
+
+
+def test_states_are_interned():
+    h = history(Signal.LOW, entries(100))
+    assert h.states == [Signal.HIGH, Signal.DATA, Signal.UNDEFINED,
+                        Signal.LOW]
+    assert h.codes.typecode == "B"
+    assert h.times.typecode == "d"
+
+
+def test_codes_widen_past_256_states():
+    transitions = [(float(time), f"S{time % 300}") for time in range(1, 601)]
+    h = history(Signal.LOW, transitions)
+    assert h.codes.typecode == "H"
+    assert len(h.states) == 300
+    assert list(h)[1:] == transitions
+
+
+def test_equality():
+    h = history(Signal.LOW, entries(5))
+    assert h == history(Signal.LOW, entries(5))
+    assert h != history(Signal.HIGH, entries(5))
+    assert h != history(Signal.LOW, entries(4))
+    assert h != "LOW"
+
+
+def test_signal_histories():
+    signal = Signal("S", Signal.HIGH)
+    assert signal.history == [(None, Signal.HIGH)]
+    signal._save(1.5, Signal.LOW)
+    assert signal.history == [(None, Signal.HIGH), (1.5, Signal.LOW)]
+
+
+def test_value_at():
+    transitions = entries(50)
+    h = history(Signal.UNDEFINED, transitions)
+    for time in [0, 1, 2.5, 2.6, 60, 125, 125.1, 1000]:
+        expected = Signal.UNDEFINED
+        for transition_time, state in transitions:
+            if transition_time <= time:
+                expected = state
+        assert h.value_at(time) == expected
+
+
+def test_slice():
+    transitions = entries(50)
+    h = history(Signal.UNDEFINED, transitions)
+    for start, end in [(0, 1000), (10, 20), (10.1, 19.9), (30, 30),
+                       (200, 300), (0, 2.5)]:
+        window = h.slice(start, end)
+        assert window.initial_state == h.value_at(start - 1e-9)
+        assert list(window)[1:] == [(time, state)
+                                    for time, state in transitions
+                                    if start <= time < end]
+    # The slice is a copy.
+    window = h.slice(0, 10)
+    window.add(11, Signal.HIGH)
+    assert len(h) == 51
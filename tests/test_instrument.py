@@ -0,0 +1,91 @@
+import io
+import json
+
+import pytest
+
+from canvas import Canvas
+from main import main
+from signals.instrument import Instrument
+from tests.common import FONT, collection, histories, tickers_config
+
+
+@pytest.mark.parametrize("options", [{}, {"queue": "calendar"},
+                                     {"periodic": True}])
+def test_run_is_unchanged_and_counted(options):
+    expected = collection(**options)
+    expected_stats = expected.run(20000)
+    instrument = Instrument()
+    sc = collection(instrument=instrument, **options)
+    stats = sc.run(20000)
+    assert histories(sc) == histories(expected)
+    assert stats.events == expected_stats.events
+    counters = instrument.counters
+    assert counters["events"] == {
+        name: len(signal.history) - 1 for name, signal in sc.all.items()}
+    assert instrument.phases["simulate.run"][0] == 1
+    assert "heap.high_water" in instrument.values
+    if not options:
+        assert instrument.phases["simulate.tick"][0] == stats.events
+        assert counters["heap"]["pushes"] >= stats.events
+
+
+def test_render_is_unchanged_and_counted():
+    data = tickers_config()
+    sc = collection()
+    sc.run(3000)
+    images = []
+    instrument = Instrument()
+    for cvs_instrument in (None, instrument):
+        cvs = Canvas(dict(data["canvas"], font_file=FONT))
+        cvs.instrument = cvs_instrument
+        for signal in sc.all.values():
+            cvs.add_signal(signal)
+        cvs.render()
+        images.append(cvs.image.tobytes())
+    assert images[0] == images[1]
+    visible = [signal for signal in sc.all.values() if signal.visible]
+    transitions = instrument.counters["transitions"]
+    assert sum(transitions.values()) == sum(len(signal.history) - 1
+                                            for signal in visible)
+    assert transitions["LOW->HIGH"] > 0
+    for name in ("render.labels", "render.shapes", "render.draw"):
+        assert instrument.phases[name][0] == len(visible)
+    assert instrument.counters["render"]["cause_lines"] == len(
+        cvs.get_cause_lines())
+
+
+def test_report():
+    instrument = Instrument()
+    with instrument.phase("a"):
+        pass
+    instrument.add_time("a", 1.5, 2)
+    instrument.count("g", "k")
+    instrument.count("g", "k", 4)
+    instrument.maximum("m", 3)
+    instrument.maximum("m", 2)
+    instrument.set("v", 0.5)
+    report = instrument.report()
+    assert report["phases"]["a"]["calls"] == 3
+    assert report["phases"]["a"]["seconds"] >= 1.5
+    assert report["counters"] == {"g": {"k": 5}}
+    assert report["values"] == {"m": 3, "v": 0.5}
+    file = io.StringIO()
+    instrument.dump(file)
+    assert json.loads(file.getvalue()) == report
+
+
+def test_main_writes_the_report(tmp_path):
+    data = tickers_config()
+    data["time"] = 2000
+    data["canvas"]["font_file"] = FONT
+    data["canvas"]["output"] = str(tmp_path / "diagram.png")
+    data["instrument"] = str(tmp_path / "report.json")
+    config = tmp_path / "config.json"
+    config.write_text(json.dumps(data))
+    main(str(config), cache_dir=None)
+    with open(tmp_path / "report.json") as json_file:
+        report = json.load(json_file)
+    for phase in ("load", "compile", "simulate.run",
+                  "render", "render.save"):
+        assert phase in report["phases"]
+    assert (tmp_path / "diagram.png").exists()
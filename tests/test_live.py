@@ -0,0 +1,87 @@
+import pytest
+from PIL import Image
+
+from canvas import Canvas
+from live import LiveRenderer
+from main import simulate
+from signals.json import deserialize
+from tests.common import FONT, random_signals, tickers_config
+
+
+def configs():
+    data = tickers_config()
+    canvas = dict(data["canvas"], font_file=FONT)
+    yield "tickers", dict(data, canvas=canvas)
+    yield "tickers_long", dict(data, canvas=canvas, time=5000)
+    for seed in range(5):
+        yield f"random_{seed}", {"signals": random_signals(seed),
+                                 "canvas": canvas, "time": 300}
+
+
+def render(data):
+    cvs = Canvas(data["canvas"])
+    for signal in simulate(data):
+        cvs.add_signal(signal)
+    cvs.render()
+    return cvs.image
+
+
+@pytest.mark.parametrize("name, data", list(configs()),
+                         ids=lambda value: value if isinstance(value, str)
+                         else "")
+@pytest.mark.parametrize("steps", [1, 7, 100])
+def test_last_frame_is_the_render(name, data, steps):
+    expected = render(data)
+    cvs = Canvas(data["canvas"])
+    # A frame after every step.
+    live = LiveRenderer(cvs, {"fps": 10**6, "steps": steps})
+    boxes = []
+    live.on_frame = lambda image, box: boxes.append(box)
+    simulate(data, run=live.run)
+    assert cvs.image.size == expected.size
+    assert cvs.image.tobytes() == expected.tobytes()
+    assert len(boxes) == live.frames
+    assert live.frames >= 1
+    assert boxes[0][0] == 0
+
+
+def test_frames_output(tmp_path):
+    data = next(configs())[1]
+    frames = tmp_path / "frame.png"
+    output = tmp_path / "out.png"
+    cvs = Canvas(dict(data["canvas"], output=str(output)))
+    live = LiveRenderer(cvs, {"steps": 10, "frames_output": str(frames)})
+    simulate(data, run=live.run)
+    # The last frame, before it is cut to where the diagram ends.
+    with Image.open(frames) as frame, Image.open(output) as image:
+        assert frame.crop((0, 0) + image.size).tobytes() == image.tobytes()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "frame.png", "out.png"]
+
+
+@pytest.mark.parametrize("settings, live", [
+    ({}, {"fps": 0}), ({}, {"steps": -1}),
+    ({"backend": "svg"}, {}), ({"window_start": 10}, {}),
+])
+def test_unsupported_settings(settings, live):
+    cvs = Canvas(dict(tickers_config()["canvas"], font_file=FONT,
+                      **settings))
+    with pytest.raises(ValueError):
+        LiveRenderer(cvs, live)
+
+
+class Failing():
+    # A simulation that stops with an error.
+    def __init__(self, signals):
+        self.all = {signal.name: signal for signal in signals}
+
+    def run(self, until_time):
+        raise RuntimeError("simulation failed")
+
+
+def test_simulation_errors_are_raised():
+    data = tickers_config()
+    cvs = Canvas(dict(data["canvas"], font_file=FONT))
+    live = LiveRenderer(cvs, {"steps": 10})
+    with pytest.raises(RuntimeError, match="simulation failed"):
+        live.run(Failing(deserialize(data["signals"])), 1000)
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from signals.signal import ParameterSignal, Signal
+
+STATES = [Signal.LOW, Signal.HIGH, Signal.UNDEFINED]
+
+
+def expected(true_state, dependency_states):
+    # The condition as it was checked before the bitmask.
+    return all(name in dependency_states and
+               dependency_states[name] == state
+               for name, state in true_state.items())
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_the_true_states(seed):
+    rng = random.Random(seed)
+    names = [f"S{number}" for number in range(rng.choice([1, 3, 70]))]
+    true_state = {name: rng.choice(STATES) for name in names}
+    signal = ParameterSignal("P", true_state, initial_state=Signal.LOW)
+    states = {}
+    for name in names:
+        if rng.random() < 0.5:
+            value = rng.choice(STATES)
+            states[name] = value
+            signal.set_dependency_state(name, value)
+    assert signal.current_state == expected(true_state, states)
+    for time in range(500):
+        # Mostly the true state, so the condition is met now and then.
+        name = rng.choice(names + ["OTHER"])
+        old_state = states.get(name)
+        value = true_state.get(name, Signal.HIGH)
+        if rng.random() < 0.3:
+            value = rng.choice(STATES)
+        was = signal.current_state
+        states[name] = value
+        trigger_time = signal.context(name, old_state, value, time, None)
+        assert signal.current_state == expected(true_state, states)
+        if signal.current_state == was:
+            assert trigger_time is None
+        else:
+            assert trigger_time == time
+
+
+def test_flips_after_the_delay():
+    signal = ParameterSignal("P", {"A": Signal.HIGH, "B": Signal.LOW},
+                             initial_state=Signal.LOW)
+    signal.delay = {Signal.LOW: 2, Signal.HIGH: 5}
+    signal.set_dependency_state("B", Signal.LOW)
+    assert signal.context("A", Signal.LOW, Signal.HIGH, 10, None) == 12
+    assert signal.tick(12) == (Signal.LOW, Signal.HIGH, None)
+    assert signal.context("B", Signal.LOW, Signal.HIGH, 20, None) == 25
+    assert [(cause.event, cause.dependencies) for cause in signal.causes] == [
+        (("P", 12), {"A": 10}), (("P", 25), {"B": 20})]
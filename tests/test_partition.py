@@ -0,0 +1,107 @@
+import pytest
+
+import main
+from signals import partition
+from signals.instrument import Instrument
+from signals.partition import PartitionedCollection
+from signals.utils import SignalCollection
+from tests.common import collection, histories, tickers
+
+
+def domains(count, coupled):
+    # Copies of tickers.json with their own names and clock, and when
+    # coupled, a counter in every copy but the first triggered by the one
+    # before, the boundaries.
+    signals = []
+    for number in range(count):
+        for signal in tickers():
+            signal["name"] = f"{signal['name']}_{number}"
+            if "dependencies" in signal:
+                signal["dependencies"] = [f"{name}_{number}"
+                                          for name in signal["dependencies"]]
+            if "true_state" in signal:
+                signal["true_state"] = {
+                    f"{name}_{number}": state
+                    for name, state in signal["true_state"].items()}
+            if "frequency" in signal:
+                signal["frequency"] *= 1 + number / 7
+            signals.append(signal)
+    boundaries = []
+    if coupled:
+        for number in range(1, count):
+            signals.append({"type": "counter", "name": f"SYNC_{number}",
+                            "dependencies": [f"CHR_CLK_{number - 1}"],
+                            "old_state_trigger": "HIGH",
+                            "new_state_trigger": "LOW",
+                            "delay": 100})
+            signals.append({"type": "counter", "name": f"SYNC_CNT_{number}",
+                            "dependencies": [f"SYNC_{number}",
+                                             f"CNT_1_{number}"]})
+            boundaries.append(f"SYNC_{number}")
+    return signals, boundaries
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("coupled", [False, True])
+def test_partition(workers, coupled):
+    signals, boundaries = domains(3, coupled)
+    expected = collection(signals)
+    expected.run(2 * 10**4)
+    sc = collection(signals, PartitionedCollection(workers=workers,
+                                                   boundaries=boundaries))
+    sc.run(2 * 10**4)
+    assert sorted(sc.boundary) == boundaries
+    assert histories(sc) == histories(expected)
+
+
+@pytest.mark.parametrize("options", [
+    {"queue": "calendar"}, {"queue": "calendar", "queue_width": 7},
+    {"periodic": True}])
+def test_partition_options(options):
+    signals, boundaries = domains(3, True)
+    expected = collection(signals)
+    expected.run(2 * 10**4)
+    sc = collection(signals, PartitionedCollection(workers=1,
+                                                   boundaries=boundaries,
+                                                   **options))
+    sc.run(2 * 10**4)
+    assert histories(sc) == histories(expected)
+
+
+def test_queue_width_reaches_the_domains(monkeypatch):
+    widths = []
+
+    class Recording(SignalCollection):
+        def __init__(self, **options):
+            super().__init__(**options)
+            widths.append(self.heap.width)
+    monkeypatch.setattr(partition, "SignalCollection", Recording)
+    signals, boundaries = domains(2, True)
+    sc = collection(signals, PartitionedCollection(
+        workers=1, boundaries=boundaries, queue="calendar", queue_width=7))
+    sc.run(1000)
+    assert widths == [7, 7]
+
+
+def test_main_passes_the_queue_width(monkeypatch):
+    options = []
+
+    class Recording(PartitionedCollection):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            options.append(self.options)
+    monkeypatch.setattr(main, "PartitionedCollection", Recording)
+    main.simulate({"signals": tickers(), "time": 1000, "queue": "calendar",
+                   "queue_width": 3, "partition": {"workers": 1}})
+    assert options[0]["queue_width"] == 3
+
+
+@pytest.mark.parametrize("options", [
+    {"sink": "history"}, {"run": lambda sc, until_time: None},
+    {"instrument": Instrument()}])
+def test_partition_refuses_what_it_cannot_pass_on(tmp_path, options):
+    data = {"signals": tickers(), "partition": {"workers": 1}}
+    if "sink" in options:
+        data["sink"] = str(tmp_path / options.pop("sink"))
+    with pytest.raises(ValueError):
+        main.simulate(data, **options)
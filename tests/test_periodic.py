@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from signals import analysis
+from tests.common import causes, collection, histories, random_signals, tickers
+
+
+def run(signals, until_time, steps=1, **options):
+    sc = collection(signals, **options)
+    for step in range(1, steps + 1):
+        sc.run(until_time * step / steps)
+    return sc
+
+
+def test_same_time_edges_of_different_tickers():
+    signals = [
+        {"type": "ticker", "name": "CLK", "period": 2},
+        {"type": "ticker", "name": "K2", "period": 2},
+        {"type": "counter", "name": "C0", "dependencies": ["CLK"],
+         "delay": 1},
+        {"type": "counter", "name": "C1", "dependencies": ["C0"]},
+        {"type": "counter", "name": "C2", "dependencies": ["K2"]},
+        {"type": "counter", "name": "C3", "dependencies": ["C0"],
+         "delay": 1},
+        {"type": "parameter", "name": "P0", "delay": 1,
+         "true_state": {"C1": "LOW", "CLK": "LOW", "C0": "LOW"}},
+        {"type": "parameter", "name": "P1", "delay": 0,
+         "true_state": {"K2": "LOW", "C0": "HIGH", "CLK": "LOW"}},
+    ]
+    expected = run(signals, 300)
+    sc = run(signals, 300, periodic=True)
+    assert histories(sc) == histories(expected)
+    assert len(sc.all["P1"].history) == 151
+
+
+def test_causes_of_hidden_counters_are_not_kept():
+    # CNT_1 is hidden, as are its causes once periodic, as when compiled.
+    expected = run(tickers(), 3000)
+    sc = run(tickers(), 3000, periodic=True)
+    assert causes(sc) == causes(expected)
+    for name in ("MA", "CHAR"):
+        assert [values.tolist() for values in analysis.cause_latencies(
+            sc.all[name], "CHR_CLK")] == [
+            values.tolist() for values in analysis.cause_latencies(
+                expected.all[name], "CHR_CLK")]
+    assert len(analysis.cause_latencies(expected.all["CNT_1"],
+                                        "PXL_CLK")[0])
+    with pytest.raises(ValueError, match="not kept"):
+        analysis.cause_latencies(sc.all["CNT_1"], "PXL_CLK")
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_random_configs(seed):
+    signals = random_signals(seed)
+    expected = run(signals, 300)
+    sc = run(signals, 300, steps=1 + seed % 3, periodic=True)
+    assert histories(sc) == histories(expected)
+    assert causes(sc) == causes(expected)
+
+
+@pytest.mark.parametrize("seed", range(0, 200, 5))
+def test_random_configs_in_small_blocks(seed, monkeypatch):
+    # Blocks of an edge carry fires and the order of edges over from one
+    # block to the next.
+    monkeypatch.setattr("signals.periodic.BLOCK_EDGES", 1)
+    signals = random_signals(seed)
+    rng = random.Random(seed)
+    for signal in signals:
+        if signal["type"] == "counter" and rng.random() < .3:
+            signal["delay"] = rng.choice([3, 5, 7.5])
+    expected = run(signals, 200)
+    sc = run(signals, 200, steps=1 + seed % 4, periodic=True)
+    assert histories(sc) == histories(expected)
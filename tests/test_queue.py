@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from signals import utils
+from signals.instrument import Instrument
+from signals.partition import PartitionedCollection
+from signals.utils import CalendarQueue, SignalCollection, SignalHeap
+from tests.common import causes, collection, histories, tickers, workloads
+
+
+@pytest.fixture(params=workloads(), ids=lambda workload: workload[0])
+def workload(request):
+    _, signals, until_time = request.param
+    sc = collection(signals, SignalCollection())
+    sc.run(until_time)
+    return signals, until_time, sc
+
+
+@pytest.mark.parametrize("queue_width", [None, 0.25, 1000])
+def test_calendar_queue(workload, queue_width):
+    signals, until_time, expected = workload
+    sc = collection(signals, SignalCollection(queue="calendar",
+                                              queue_width=queue_width))
+    sc.run(until_time)
+    assert histories(sc) == histories(expected)
+    assert causes(sc) == causes(expected)
+
+
+@pytest.mark.parametrize("options", [
+    {"queue": "calendar"}, {"instrument": Instrument()},
+    {"queue": "calendar", "instrument": Instrument()}])
+def test_compiled_with_other_loops(workload, options):
+    signals, until_time, expected = workload
+    sc = collection(signals, SignalCollection(**options)).compile()
+    sc.run(until_time)
+    assert histories(sc) == histories(expected)
+    assert causes(sc) == causes(expected)
+
+
+@pytest.mark.parametrize("queue", [SignalHeap, CalendarQueue])
+def test_queue_order(queue, monkeypatch):
+    # Against a sorted list, while entries are moved and compacted.
+    monkeypatch.setattr(utils, "COMPACT_MIN", 16)
+    rng = random.Random(0)
+    q = queue()
+    pending = {}
+    counter = 0
+    for signal in range(200):
+        time = rng.randint(0, 50) / 2
+        q.add_signal(signal, time)
+        pending[signal] = (time, counter)
+        counter += 1
+    now = 0
+    while pending:
+        for signal in rng.sample(sorted(pending), min(5, len(pending))):
+            time = now + rng.randint(0, 50) / 2
+            q.add_signal(signal, time)
+            pending[signal] = (time, counter)
+            counter += 1
+        assert len(q) - q.removed == len(pending)
+        expected = min(pending, key=pending.get)
+        assert q.peek_signal() == (pending[expected][0], expected)
+        now, signal = q.pop_signal()
+        assert signal == expected
+        del pending[signal]
+    assert q.compactions > 0
+    with pytest.raises(KeyError):
+        q.pop_signal()
+
+
+def test_compaction_bounds_the_heap(monkeypatch):
+    monkeypatch.setattr(utils, "COMPACT_MIN", 64)
+    heap = SignalHeap()
+    for signal in range(100):
+        heap.add_signal(signal, signal)
+    for time in range(10000):
+        heap.add_signal(time % 100, 100 + time)
+        assert len(heap.pq) <= 2 * 64 + 100 + 1
+    assert heap.compactions > 0
+    assert [heap.pop_signal()[1] for _ in range(100)] == [
+        signal for _, signal in sorted(((100 + time, time % 100)
+                                        for time in range(9900, 10000)))]
+
+
+def test_calendar_width_follows_the_fastest_ticker():
+    sc = collection(tickers(), SignalCollection(queue="calendar"))
+    clock = sc.all["PXL_CLK"]
+    assert sc.heap.width == clock.period / 2
+    sc = collection(tickers(), SignalCollection(queue="calendar",
+                                                queue_width=3))
+    assert sc.heap.width == 3
+
+
+@pytest.mark.parametrize("options", [
+    {"queue": "calendar"}, {"periodic": True}, {"instrument": Instrument()}])
+def test_cycles_need_the_plain_loop(options):
+    with pytest.raises(ValueError):
+        SignalCollection(cycles=True, **options)
+    if "instrument" not in options:
+        with pytest.raises(ValueError):
+            PartitionedCollection(cycles=True, **options)
+
+
+def test_cycles_without_max_events():
+    sc = collection(tickers(), SignalCollection(cycles=True))
+    with pytest.raises(ValueError):
+        sc.run(1000, max_events=10)
+
+
+def test_unknown_queue():
+    with pytest.raises(ValueError):
+        SignalCollection(queue="list")
@@ -0,0 +1,56 @@
+import pytest
+
+from tests.common import collection, histories
+
+
+def transitions(sc):
+    return sum(len(signal.history) - 1 for signal in sc.all.values())
+
+
+@pytest.mark.parametrize("options", [{}, {"queue": "calendar"}])
+def test_run_matches_tick(options):
+    expected = collection(**options)
+    while expected.tick(20000):
+        continue
+    sc = collection(**options)
+    stats = sc.run(20000)
+    assert histories(sc) == histories(expected)
+    assert stats.events == transitions(sc)
+    assert stats.pending == len(sc.heap)
+
+
+def test_event_past_the_horizon_is_kept():
+    expected = collection()
+    expected.run(20000)
+    sc = collection()
+    for until_time in range(1000, 20001, 1000):
+        sc.run(until_time)
+    assert histories(sc) == histories(expected)
+    assert sc.until == 20000
+
+
+def test_max_events():
+    sc = collection()
+    stats = sc.run(20000, max_events=100)
+    assert stats.events == 100
+    assert transitions(sc) == 100
+    assert sc.until == 0
+    sc.run(20000)
+    assert sc.until == 20000
+    expected = collection()
+    expected.run(20000)
+    assert histories(sc) == histories(expected)
+
+
+@pytest.mark.parametrize("options", [{"periodic": True}, {"cycles": True},
+                                     {"queue": "calendar"}])
+def test_events_count_transitions_in_every_mode(options):
+    # Also those computed in closed form, or copied from a cycle.
+    expected = collection()
+    counts = [expected.run(until_time).events
+              for until_time in (5 * 10**4, 10**5)]
+    sc = collection(**options)
+    sc.compile()
+    assert [sc.run(until_time).events
+            for until_time in (5 * 10**4, 10**5)] == counts
+    assert transitions(sc) == sum(counts)
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+
+import pytest
+
+import main
+from signals import schema
+from signals.json import deserialize
+from signals.schema import SchemaError, load
+from signals.signal import CounterSignal, ParameterSignal, Signal, TickerSignal
+from tests.common import FONT, tickers, tickers_config
+
+
+def errors(data):
+    with pytest.raises(SchemaError) as info:
+        deserialize(data)
+    return info.value.errors
+
+
+def test_builds_every_type():
+    clock, counter, parameter = deserialize([
+        {"type": "ticker", "name": "CLK", "frequency": 4, "delay": 0.5},
+        {"type": "counter", "name": "CNT", "dependencies": ["CLK"],
+         "states": ["0", "1", "2"], "visible": False},
+        {"type": "parameter", "name": "P", "initial_state": Signal.LOW,
+         "true_state": {"CLK": Signal.HIGH}, "show_cause": False,
+         "delay": {Signal.HIGH: 1, Signal.LOW: 2}},
+    ])
+    assert isinstance(clock, TickerSignal)
+    assert clock.period == 0.25
+    assert clock.delay == 0.5
+    assert isinstance(counter, CounterSignal)
+    assert counter.dependencies == ["CLK"]
+    assert counter.states == ["0", "1", "2"]
+    assert counter.visible is False
+    assert counter.show_cause is True
+    assert isinstance(parameter, ParameterSignal)
+    assert parameter.state == Signal.LOW
+    assert parameter.show_cause is False
+    assert parameter.delay == {Signal.HIGH: 1, Signal.LOW: 2}
+
+
+def test_single_signal():
+    signal = deserialize({"type": "ticker", "name": "CLK", "period": 2})
+    assert isinstance(signal, TickerSignal)
+
+
+def test_single_signal_with_dependencies():
+    # Its dependencies are only known once it is added to a collection.
+    counter = deserialize({"type": "counter", "name": "X",
+                           "dependencies": ["A"]})
+    assert isinstance(counter, CounterSignal)
+    assert counter.dependencies == ["A"]
+    parameter = deserialize({"type": "parameter", "name": "P",
+                             "true_state": {"A": Signal.HIGH}})
+    assert isinstance(parameter, ParameterSignal)
+    assert parameter.dependencies == ["A"]
+
+
+def test_flags_and_initial_state_take_any_value():
+    # As deserialize took them before there was a schema.
+    signal = deserialize({"type": "ticker", "name": "CLK", "period": 2,
+                          "visible": 0, "show_cause": 1,
+                          "initial_state": 3})
+    assert signal.visible == 0
+    assert signal.show_cause == 1
+    assert signal.state == 3
+
+
+def test_every_error_is_listed():
+    assert errors([
+        {"name": "A", "period": 1},
+        {"type": "clock", "name": "B"},
+        {"type": "ticker", "name": "C"},
+        {"type": "ticker", "name": "D", "period": 1, "frequency": 1},
+        {"type": "ticker", "name": "E", "period": 0},
+        {"type": "ticker", "name": "F", "period": True},
+        {"type": "ticker", "period": 1},
+        {"type": "counter", "name": "G", "dependencies": ["H"]},
+        {"type": "parameter", "name": "H"},
+        {"type": "ticker", "name": "C", "period": 1, "delay": "1"},
+        {"type": "ticker", "name": "I", "period": 1,
+         "delay": {Signal.HIGH: "1"}},
+        "J",
+    ]) == [
+        "signals[0] [A]: [type] is missing",
+        "signals[1] [B]: type [clock] not implemented",
+        "signals[2] [C]: One of [period] and [frequency] has to be present",
+        "signals[3] [D]: Only one of [period] and [frequency] can be "
+        "present",
+        "signals[4] [E]: [period] must be positive",
+        "signals[5] [F]: [period] must be a number",
+        "signals[6]: [name] is missing",
+        "signals[7] [G]: dependency [H] is not a signal listed before it",
+        "signals[8] [H]: [true_state] is missing",
+        "signals[9] [C]: [delay] must be a number or an object",
+        "signals[9] [C]: another signal is named [C]",
+        "signals[10] [I]: [delay] must be a number or numbers by state",
+        "signals[11]: must be an object",
+    ]
+
+
+def test_schema_error_is_a_value_error():
+    with pytest.raises(ValueError, match="1 errors in the signals"):
+        deserialize({"type": "ticker", "name": "CLK"})
+
+
+def config(tmp_path):
+    filename = tmp_path / "config.json"
+    filename.write_text(json.dumps({"canvas": {"output": "out.png"},
+                                    "signals": tickers()}))
+    return filename
+
+
+def names(signals):
+    return [(type(signal), signal.name) for signal in signals]
+
+
+def test_load_without_a_cache(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data, signals = load(config(tmp_path))
+    assert data == {"canvas": {"output": "out.png"}}
+    assert names(signals) == names(deserialize(tickers()))
+    assert os.listdir(tmp_path) == ["config.json"]
+
+
+def test_load_from_the_cache(tmp_path, monkeypatch):
+    filename = config(tmp_path)
+    cache_dir = tmp_path / "cache"
+    expected = load(filename, cache_dir)
+    assert len(os.listdir(cache_dir)) == 1
+
+    def validate(data):
+        raise AssertionError("validated again")
+    monkeypatch.setattr(schema.SCHEMA, "validate", validate)
+    data, signals = load(filename, cache_dir)
+    assert data == expected[0]
+    assert names(signals) == names(expected[1])
+
+
+@pytest.mark.parametrize("content", [
+    b"", b"not a pickle",
+    # Classes that are gone, from an older version.
+    b"csignals.signal\nNoSuchSignal\n.", b"cno_such_module\nSignal\n.",
+])
+def test_unreadable_cache_files_are_replaced(tmp_path, content):
+    filename = config(tmp_path)
+    cache_dir = tmp_path / "cache"
+    load(filename, cache_dir)
+    [path] = cache_dir.iterdir()
+    path.write_bytes(content)
+    data, signals = load(filename, cache_dir)
+    assert names(signals) == names(deserialize(tickers()))
+    assert path.read_bytes() != content
+
+
+def test_cache_is_keyed_on_the_version(tmp_path, monkeypatch):
+    filename = config(tmp_path)
+    cache_dir = tmp_path / "cache"
+    load(filename, cache_dir)
+    monkeypatch.setattr(schema, "CACHE_VERSION", schema.CACHE_VERSION + 1)
+    load(filename, cache_dir)
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_cache_dir_is_not_in_the_working_directory():
+    assert os.path.isabs(schema.CACHE_DIR)
+
+
+def test_main_loads_an_unchanged_config_from_the_cache(tmp_path,
+                                                       monkeypatch):
+    data = tickers_config()
+    data["time"] = 2000
+    data["canvas"]["font_file"] = FONT
+    data["canvas"]["output"] = str(tmp_path / "diagram.png")
+    filename = tmp_path / "config.json"
+    filename.write_text(json.dumps(data))
+    cache_dir = tmp_path / "cache"
+    main.main(str(filename), str(cache_dir))
+
+    def validate(data):
+        raise AssertionError("validated again")
+    monkeypatch.setattr(schema.SCHEMA, "validate", validate)
+    main.main(str(filename), str(cache_dir))
+    assert (tmp_path / "diagram.png").exists()
+
+
+def test_command_line_uses_the_cache():
+    assert main._parse_args([]).cache_dir == schema.CACHE_DIR
+    assert main._parse_args(["config.json", "--cache-dir", "here"]) == (
+        argparse.Namespace(config="config.json", cache_dir="here",
+                           no_cache=False))
+    assert main._parse_args(["--no-cache"]).cache_dir is None
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from service import RESULTS_DIR, RenderService, ResultCache, _write
+from signals.schema import CACHE_DIR
+from tests.common import FONT, tickers, tickers_config
+
+
+def config(directory, name, time=300, **canvas):
+    data = tickers_config()
+    data["time"] = time
+    data["canvas"] = dict(data["canvas"], font_file=FONT,
+                          output=str(directory / f"{name}.out"))
+    data["canvas"].update(canvas)
+    filename = directory / f"{name}.json"
+    filename.write_text(json.dumps(data))
+    return str(filename)
+
+
+def render_batches(tmp_path, *batches):
+    async def run():
+        reports = []
+        async with RenderService(ResultCache(str(tmp_path / "results")), 2,
+                                 config_cache=None) as service:
+            for filenames in batches:
+                reports.append(await service.render_batch(filenames))
+        assert service.executor is None
+        return reports
+    return asyncio.run(run())
+
+
+def test_batches(tmp_path):
+    # a and b only differ in where they are written.
+    a = config(tmp_path, "a")
+    b = config(tmp_path, "b")
+    c = config(tmp_path, "c", time=400)
+    svg = config(tmp_path, "svg", backend="svg")
+    broken = tmp_path / "broken.json"
+    broken.write_text(json.dumps({"signals": tickers()}))
+    d = config(tmp_path, "d", time=500)
+    (first, cold), (second, warm), (third, mixed) = render_batches(
+        tmp_path, [a, b, c, svg, str(broken)], [a, b, c, svg], [a, b, d])
+
+    assert [result["error"] is None for result in first] == [
+        True, True, True, True, False]
+    assert first[0]["key"] == first[1]["key"] != first[2]["key"]
+    assert (cold.configs, cold.unique, cold.hits, cold.rendered,
+            cold.errors) == (5, 3, 0, 3, 1)
+    assert cold.hit_ratio == 0
+    outputs = {name: (tmp_path / f"{name}.out").read_bytes()
+               for name in ("a", "b", "c", "svg")}
+    assert outputs["a"] == outputs["b"] != outputs["c"]
+    assert outputs["a"].startswith(b"\x89PNG")
+    assert outputs["svg"].startswith(b"<")
+
+    assert all(result["cached"] for result in second)
+    assert (warm.hits, warm.rendered, warm.hit_ratio) == (4, 0, 1)
+    # Per config: a and b are served from the cache, d is rendered.
+    assert (mixed.hits, mixed.rendered, mixed.misses) == (2, 1, 1)
+    assert mixed.hit_ratio == pytest.approx(2 / 3)
+    assert sorted(name for name in os.listdir(tmp_path / "results")) == (
+        sorted(f"{result['key']}.{name}" for result, name in zip(
+            first[1:4] + third[2:], ("png", "png", "svg", "png"))))
+
+
+def test_failed_render_is_not_counted_as_rendered(tmp_path):
+    a = config(tmp_path, "a")
+    missing = config(tmp_path, "missing",
+                     font_file=str(tmp_path / "missing.ttf"))
+    [(results, report)] = render_batches(tmp_path, [a, missing])
+    assert results[0]["error"] is None
+    assert results[1]["error"] is not None
+    assert (report.unique, report.rendered, report.errors) == (2, 1, 1)
+
+
+def test_results_are_kept_next_to_the_config_cache():
+    assert os.path.isabs(RESULTS_DIR)
+    assert os.path.dirname(RESULTS_DIR) == os.path.dirname(CACHE_DIR)
+
+
+def test_cache_is_used_off_the_event_loop(tmp_path):
+    threads = []
+
+    class Recording(ResultCache):
+        def get(self, key, format):
+            threads.append(threading.get_ident())
+            return super().get(key, format)
+
+        def put(self, key, format, result):
+            threads.append(threading.get_ident())
+            super().put(key, format, result)
+
+    async def run():
+        async with RenderService(Recording(str(tmp_path / "results")), 1,
+                                 config_cache=None) as service:
+            for _ in range(2):
+                await service.render_batch([config(tmp_path, "a")])
+        return threading.get_ident()
+    loop_thread = asyncio.run(run())
+    assert len(threads) == 3
+    assert loop_thread not in threads
+
+
+def test_least_recently_used_results_are_removed(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=25)
+    for key in "abc":
+        cache.put(key, "png", b"x" * 10)
+    assert cache.get("a", "png") is None
+    assert cache.get("b", "png") == b"x" * 10
+    cache.put("d", "png", b"y" * 10)
+    assert cache.get("c", "png") is None
+    assert sorted(os.listdir(tmp_path)) == ["b.png", "d.png"]
+    assert ResultCache(str(tmp_path)).size == 20
+
+
+def test_writes_from_threads(tmp_path):
+    path = str(tmp_path / "result")
+    contents = [bytes([index]) * 10**5 for index in range(8)]
+    threads = [threading.Thread(target=_write, args=(path, content))
+               for content in contents]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(path, "rb") as f:
+        assert f.read() in contents
+    assert os.listdir(tmp_path) == ["result"]
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from canvas import Canvas
+from signals.signal import Signal
+from signals.sink import HistorySink, SpillingHistory
+from tests.common import (FONT, causes, collection, histories, tickers,
+                          tickers_config)
+
+
+@pytest.mark.parametrize("options", [{}, {"periodic": True}])
+def test_round_trip(tmp_path, options):
+    expected = collection(**options)
+    expected.run(10**5)
+    sink = HistorySink(str(tmp_path), chunk_size=256)
+    sc = collection(sink=sink, **options)
+    sc.run(10**5)
+    sink.close()
+    assert histories(sc) == histories(expected)
+    assert causes(sc) == causes(expected)
+    # Every record was written, the last chunk on close.
+    for index, signal in enumerate(sc.all.values()):
+        history = tmp_path / f"{index}.history"
+        assert history.stat().st_size == 10 * (len(signal.history) - 1)
+
+    opened = HistorySink.open(str(tmp_path))
+    assert {name: list(history) for name, (history, _) in opened.items()} == (
+        histories(expected))
+    shown = causes(expected)
+    assert {name: [(cause.event, dict(cause.dependencies))
+                   for cause in mapped]
+            for name, (_, mapped) in opened.items() if name in shown} == shown
+
+
+def test_queries_on_mapped_histories(tmp_path):
+    expected = collection()
+    expected.run(20000)
+    sink = HistorySink(str(tmp_path), chunk_size=100)
+    sc = collection(sink=sink)
+    sc.run(20000)
+    sink.close()
+    for name, signal in sc.all.items():
+        history = signal.history
+        plain = expected.all[name].history
+        assert isinstance(history.times, np.memmap) or not len(history.times)
+        for time in (0, 1000, 1000.5, 19999):
+            assert history.value_at(time) == plain.value_at(time)
+        assert list(history.slice(5000, 7000)) == list(plain.slice(5000,
+                                                                   7000))
+        assert history[-1] == plain[-1]
+
+
+def test_spilling_history_before_close(tmp_path):
+    # Spilled transitions are read back from the file.
+    history = SpillingHistory(Signal("S", Signal.LOW).history,
+                              str(tmp_path / "0.history"), chunk_size=4)
+    plain = Signal("S", Signal.LOW).history
+    for edge in range(1, 11):
+        state = [Signal.HIGH, Signal.LOW, Signal.DATA][edge % 3]
+        history.add(edge * 1.5, state)
+        plain.add(edge * 1.5, state)
+    assert history.spilled == 8
+    assert len(history) == len(plain)
+    assert [history[index] for index in range(len(plain))] == list(plain)
+    assert history[-1] == plain[-1] and history[-11] == plain[-11]
+    assert history[2:9] == plain[2:9]
+    assert list(history) == list(plain)
+    for index in (11, -12):
+        with pytest.raises(IndexError):
+            history[index]
+    for time in (0, 1.5, 5, 12, 15, 20):
+        assert history.value_at(time) == plain.value_at(time)
+    for start, end in ((0, 20), (2, 13), (12.5, 14), (13, 20)):
+        assert list(history.slice(start, end)) == list(plain.slice(start,
+                                                                   end))
+
+
+def test_cycles_repeat_spilled_causes(tmp_path):
+    signals = tickers()
+    for signal in signals:
+        if "frequency" in signal:
+            del signal["frequency"]
+            signal["period"] = 40
+        signal["show_cause"] = True
+        signal["visible"] = True
+    expected = collection(signals)
+    sink = HistorySink(str(tmp_path), chunk_size=64)
+    sc = collection(signals, sink=sink, cycles=True)
+    for collected in (expected, sc):
+        collected.run(20000)
+    sink.close()
+    assert sc.cycle is not None
+    assert histories(sc) == histories(expected)
+    assert causes(sc) == causes(expected)
+
+
+def test_canvas_reads_the_sink(tmp_path):
+    data = tickers_config()
+    images = []
+    for sink in (None, HistorySink(str(tmp_path), chunk_size=128)):
+        sc = collection(sink=sink)
+        sc.run(3000)
+        if sink is not None:
+            sink.close()
+        cvs = Canvas(dict(data["canvas"], font_file=FONT,
+                          window_start=500, window_end=2500))
+        for signal in sc.all.values():
+            cvs.add_signal(signal)
+        cvs.render()
+        images.append(cvs.image.tobytes())
+    assert images[0] == images[1]
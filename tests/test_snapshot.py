@@ -0,0 +1,56 @@
+import pickle
+
+import pytest
+
+from signals.utils import SignalCollection
+from tests.common import causes, collection, histories, tickers, workloads
+
+
+@pytest.fixture(params=workloads(), ids=lambda workload: workload[0])
+def workload(request):
+    _, signals, until_time = request.param
+    sc = collection(signals)
+    sc.run(until_time)
+    return signals, until_time, sc
+
+
+@pytest.mark.parametrize("options", [{}, {"queue": "calendar"},
+                                     {"periodic": True}])
+def test_snapshot(workload, options):
+    signals, until_time, expected = workload
+    sc = collection(signals, **options)
+    sc.run(until_time / 3)
+    sc = SignalCollection.restore(sc.snapshot())
+    assert sc.until == until_time / 3
+    sc.run(until_time)
+    assert histories(sc) == histories(expected)
+    assert causes(sc) == causes(expected)
+
+
+def test_snapshot_is_a_copy():
+    sc = collection(tickers())
+    sc.run(1000)
+    snapshot = sc.snapshot()
+    lengths = {name: len(history) for name, history in histories(sc).items()}
+    sc.run(2000)
+    restored = SignalCollection.restore(snapshot)
+    assert {name: len(history)
+            for name, history in histories(restored).items()} == lengths
+
+
+def test_restore_checks_the_type():
+    with pytest.raises(TypeError):
+        SignalCollection.restore(pickle.dumps([1, 2]))
+
+
+def test_save_and_load(tmp_path):
+    expected = collection(tickers())
+    expected.run(20000)
+    sc = collection(tickers())
+    sc.run(5000)
+    filename = tmp_path / "checkpoint"
+    sc.save(filename)
+    assert [path.name for path in tmp_path.iterdir()] == ["checkpoint"]
+    sc = SignalCollection.load(filename)
+    sc.run(20000)
+    assert histories(sc) == histories(expected)
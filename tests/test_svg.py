@@ -0,0 +1,81 @@
+import io
+import random
+import re
+from xml.etree import ElementTree
+
+import numpy as np
+import pytest
+
+from canvas import Canvas
+from svg import _format
+from tests.common import FONT, tickers_canvas
+
+SVG = "{http://www.w3.org/2000/svg}"
+
+
+def test_format_rounds_to_hundredths():
+    rng = random.Random(0)
+    values = [0, 0.004, 0.005, -0.004, -0.006, 1, -1, 9.995, 123.456,
+              -98765.4321, 1e9 + 0.25, 2.675]
+    values += [rng.uniform(-1e6, 1e6) for _ in range(1000)]
+    values += [rng.uniform(-1, 1) for _ in range(1000)]
+    text = _format(values)
+    assert re.fullmatch(r"( -?(0|[1-9][0-9]*)\.[0-9][0-9])*", text)
+    # value * 100 rounded half to even, without the sign of a rounded zero.
+    assert [float(value) for value in text.split()] == (
+        np.rint(np.array(values) * 100) / 100).tolist()
+
+
+def test_format_starts_subpaths():
+    assert _format([1, 2, 3, 4.5], [0, 2]) == "M1.00 2.00M3.00 4.50"
+
+
+def subpaths(path):
+    return [[float(value) for value in subpath.split()]
+            for subpath in path.get("d").split("M")[1:]]
+
+
+@pytest.mark.parametrize("decimate", [False, True])
+def test_svg_draws_the_raster_shapes(decimate):
+    cvs = tickers_canvas(backend="svg", decimate=decimate,
+                         min_edge_spacing=30)
+    svg = io.StringIO()
+    cvs.render(svg)
+    root = ElementTree.fromstring(svg.getvalue())
+    width, height = cvs.get_size()
+    assert (root.get("width"), root.get("height")) == (str(width),
+                                                       str(height))
+
+    lines = []
+    bands = []
+    start = cvs.start
+    for name, history in cvs.signals:
+        shapes = cvs._get_shapes(history, start)
+        lines += shapes[0]
+        bands += shapes[1]
+        start += cvs.height + cvs.v_spacing
+    cause_lines = cvs.get_cause_lines()
+    paths = root.iter(SVG + "path")
+    drawn = {"#000000": [], "#4040ff": []}
+    for path in paths:
+        drawn[path.get("stroke")] += subpaths(path)
+    assert len(drawn["#000000"]) == len(lines)
+    for subpath, line in zip(drawn["#000000"], lines):
+        assert subpath == pytest.approx(line, abs=0.005)
+    assert len(drawn["#4040ff"]) == len(cause_lines)
+    for subpath, line in zip(drawn["#4040ff"], cause_lines):
+        assert subpath == pytest.approx(line, abs=0.005)
+    rects = list(root.iter(SVG + "rect"))[1:]
+    assert len(rects) == len(bands)
+    assert [text.text for text in root.iter(SVG + "text")] == [
+        name for name, _ in cvs.signals]
+
+
+def test_svg_needs_a_file():
+    with pytest.raises(ValueError):
+        tickers_canvas(backend="svg").render()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        Canvas({"backend": "pdf", "font_file": FONT})
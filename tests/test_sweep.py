@@ -0,0 +1,111 @@
+import copy
+import json
+
+import pytest
+
+from main import simulate
+from signals import analysis
+from sweep import Sweep, _values
+from tests.common import tickers_config
+
+
+def base():
+    data = tickers_config()
+    data["time"] = 3000
+    return data
+
+
+def serial(data, frequency, until_time):
+    data = copy.deepcopy(data)
+    for signal in data["signals"]:
+        if signal["name"] == "PXL_CLK":
+            signal["frequency"] = frequency
+    data["time"] = until_time
+    metrics = {}
+    for signal in simulate(data):
+        history = signal.history
+        shortest = analysis.min_pulse_width(history) or (None, None)
+        metrics[signal.name] = {"edges": len(history) - 1,
+                                "state": history[-1][1],
+                                "min_pulse": shortest[0],
+                                "min_pulse_at": shortest[1]}
+    return metrics
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_results_match_serial_runs(tmp_path, workers):
+    sweep = Sweep(base(), {"parameters": {
+        "signals.PXL_CLK.frequency": [0.02, 0.025175],
+        "time": {"start": 2000, "stop": 3000, "step": 500}},
+        "workers": workers})
+    assert len(sweep) == 6
+    results = sweep.save(str(tmp_path / "results.json"))
+    assert [result["index"] for result in results] == list(range(6))
+    with open(tmp_path / "results.json") as json_file:
+        assert json.load(json_file) == json.loads(json.dumps(results))
+    for result, variant in zip(results, sweep.variants()):
+        assert result["parameters"] == variant
+        assert result["signals"] == serial(
+            base(), variant["signals.PXL_CLK.frequency"], variant["time"])
+
+
+def test_progress():
+    sweep = Sweep(base(), {"parameters": {"time": [100, 200, 300]},
+                           "workers": 1})
+    calls = []
+    results = list(sweep.run(lambda done, total, result: calls.append(
+        (done, total, result["index"]))))
+    assert calls == [(1, 3, 0), (2, 3, 1), (3, 3, 2)]
+    assert len(results) == 3
+
+
+def test_default_workers(monkeypatch):
+    monkeypatch.setattr("os.cpu_count", lambda: None)
+    sweep = Sweep(base(), {"parameters": {"time": [100]}})
+    assert sweep.workers == 1
+    assert len(list(sweep.run())) == 1
+
+
+def test_values():
+    assert _values("a", [1, "x"]) == [1, "x"]
+    assert _values("a", {"start": 0, "stop": 1, "step": 0.1}) == (
+        pytest.approx([step / 10 for step in range(11)]))
+    assert _values("a", {"start": 1, "stop": 2, "num": 3}) == [1, 1.5, 2]
+    for values in ({"start": 0}, {"start": 0, "stop": 1}, 3):
+        with pytest.raises(ValueError):
+            _values("a", values)
+
+
+@pytest.mark.parametrize("path", ["signals.NOPE.period", "signals.CNT_1",
+                                  "signals.TC.true_state.CNT_1.x"])
+def test_bad_paths(path):
+    with pytest.raises(ValueError):
+        Sweep(base(), {"parameters": {path: [1]}})
+    with pytest.raises(ValueError):
+        Sweep(base(), {})
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_failed_variant_is_reported(workers):
+    sweep = Sweep(base(), {"parameters": {
+        "signals.PXL_CLK.frequency": [0.02, "fast", 0.025175]},
+        "workers": workers})
+    results = sorted(sweep.run(), key=lambda result: result["index"])
+    assert len(results) == 3
+    assert results[1]["error"].startswith("SchemaError: ")
+    assert results[1]["signals"] == {}
+    for result in (results[0], results[2]):
+        assert result["error"] is None
+        assert result["signals"] == serial(
+            base(), result["parameters"]["signals.PXL_CLK.frequency"], 3000)
+
+
+def test_variants_do_not_write_the_base_outputs(tmp_path):
+    data = base()
+    data["sink"] = str(tmp_path / "sink")
+    data["vcd_output"] = str(tmp_path / "out.vcd")
+    sweep = Sweep(data, {"parameters": {"time": [1000, 2000]},
+                         "workers": 2})
+    results = list(sweep.run())
+    assert [result["error"] for result in results] == [None, None]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,70 @@
+import math
+
+import pytest
+from PIL import Image
+
+from tests.common import tickers_canvas
+from tiles import TileRenderer
+
+
+def rendered(cvs):
+    cvs.render()
+    return cvs.image
+
+
+@pytest.mark.parametrize("settings", [
+    {}, {"decimate": True}, {"window_start": 700.5, "window_end": 2100}])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_tiff_matches_the_full_render(tmp_path, settings, workers):
+    cvs = tickers_canvas(**settings)
+    path = tmp_path / "diagram.tif"
+    TileRenderer(cvs, {"tile_size": 128, "workers": workers}).save(str(path))
+    with Image.open(path) as image:
+        assert image.size == cvs.get_size()
+        assert image.convert("RGB").tobytes() == rendered(cvs).tobytes()
+
+
+def test_pyramid(tmp_path):
+    cvs = tickers_canvas()
+    path = tmp_path / "diagram.dzi"
+    tile_size = 256
+    TileRenderer(cvs, {"tile_size": tile_size, "workers": 1}).save(str(path))
+    width, height = cvs.get_size()
+    levels = math.ceil(math.log2(max(width, height)))
+    directory = tmp_path / "diagram_files"
+    assert sorted(int(level.name) for level in directory.iterdir()) == list(
+        range(levels + 1))
+    # The full resolution level, put back together, is the diagram.
+    image = Image.new("RGB", (width, height))
+    for tile in (directory / str(levels)).iterdir():
+        column, row = map(int, tile.stem.split("_"))
+        with Image.open(tile) as part:
+            image.paste(part, (column * tile_size, row * tile_size))
+    assert image.tobytes() == rendered(cvs).tobytes()
+    with Image.open(directory / "0" / "0_0.png") as top:
+        assert top.size == (1, 1)
+    assert 'TileSize="256"' in path.read_text()
+
+
+def test_tile_size_is_checked():
+    with pytest.raises(ValueError):
+        TileRenderer(tickers_canvas(), {"tile_size": 100})
+
+
+def test_cause_lines_are_found_per_tile(tmp_path, monkeypatch):
+    cvs = tickers_canvas()
+    everything = len(cvs.get_cause_lines())
+    found = []
+    get_cause_lines = cvs.get_cause_lines
+
+    def recording(start=None, end=None):
+        assert start is not None
+        lines = get_cause_lines(start, end)
+        found.append(len(lines))
+        return lines
+    monkeypatch.setattr(cvs, "get_cause_lines", recording)
+    TileRenderer(cvs, {"tile_size": 128, "workers": 1}).save(
+        str(tmp_path / "diagram.tif"))
+    width, height = cvs.get_size()
+    assert len(found) == math.ceil(width / 128) * math.ceil(height / 128)
+    assert max(found) < everything
@@ -0,0 +1,142 @@
+import io
+
+import pytest
+
+from signals import vcd
+from signals.signal import Signal
+from tests.common import collection, tickers
+
+LOW, HIGH, DATA = Signal.LOW, Signal.HIGH, Signal.DATA
+UNDEFINED, IMPEDANCE = Signal.UNDEFINED, Signal.IMPEDANCE
+
+
+def read(text, block_size=None, monkeypatch=None):
+    if block_size is not None:
+        monkeypatch.setattr(vcd, "BLOCK_SIZE", block_size)
+    return {signal.name: list(signal.history)
+            for signal in vcd.read(io.BytesIO(text.encode()))}
+
+
+def dump(identifiers, changes):
+    # A dump of a 1 bit clock, a 4 bit bus and a real, under the given
+    # identifiers, with the changes after $dumpvars.
+    clk, bus, real = identifiers
+    return (
+        "$date today $end\n$version test $end\n$timescale 1ns $end\n"
+        "$scope module top $end\n"
+        f"$var wire 1 {clk} clk $end\n"
+        f"$scope module core $end\n$var wire 4 {bus} data [3:0] $end\n"
+        f"$var real 64 {real} level $end\n$upscope $end\n"
+        "$upscope $end\n$enddefinitions $end\n"
+        f"#0\n$dumpvars\n0{clk}\nbxxxx {bus}\nr0 {real}\n$end\n"
+        + changes.format(clk=clk, bus=bus, real=real))
+
+
+CHANGES = ("#10\n1{clk}\nb1010 {bus}\n#20\n0{clk}\nB0101 {bus}\n"
+           "r1.5 {real}\n$comment a b $end\n#30\nX{clk}\nbzzzz {bus}\n"
+           "#40\nZ{clk}\nbXX {bus}\nR-2e3 {real}\n#50\nx{clk}\nb10x1 {bus}\n"
+           "#60\nz{clk}\nbZZ {bus}\n#70 1{clk} b0 {bus}\n")
+
+EXPECTED = {
+    "clk": [(None, LOW), (10.0, HIGH), (20.0, LOW), (30.0, UNDEFINED),
+            (40.0, IMPEDANCE), (50.0, UNDEFINED), (60.0, IMPEDANCE),
+            (70.0, HIGH)],
+    "core.data[3:0]": [(None, UNDEFINED), (10.0, DATA), (20.0, DATA),
+                        (30.0, IMPEDANCE), (40.0, UNDEFINED), (50.0, DATA),
+                        (60.0, IMPEDANCE), (70.0, DATA)],
+    "core.level": [(None, DATA), (20.0, DATA), (40.0, DATA)],
+}
+
+
+@pytest.mark.parametrize("identifiers", [
+    ("!", '"', "#"),
+    # Longer than the identifiers read with numpy.
+    ("clock_signal", "data_bus_signal", "real_valued"),
+])
+@pytest.mark.parametrize("block_size", [None, 7, 64])
+def test_read(identifiers, block_size, monkeypatch):
+    assert read(dump(identifiers, CHANGES), block_size,
+                monkeypatch) == EXPECTED
+
+
+def test_read_timescale_and_shared_identifiers():
+    text = ("$timescale 10 ps $end\n$scope module top $end\n"
+            "$var wire 1 ! a $end\n$var wire 1 ! b $end\n"
+            "$var string 1 s state $end\n"
+            "$upscope $end\n$enddefinitions $end\n"
+            "#0\n1!\nsIDLE s\n#150\n0!\nsBUSY_2 s\n#1000000\n1!\n")
+    expected = [(None, HIGH), (1.5, LOW), (10000.0, HIGH)]
+    assert read(text) == {"a": expected, "b": expected,
+                          "state": [(None, "IDLE"), (1.5, "BUSY_2")]}
+
+
+def test_read_rejects_garbage():
+    with pytest.raises(ValueError):
+        read("$enddefinitions $end\n#0\nq!\n")
+    with pytest.raises(ValueError):
+        read("$timescale 3ns $end\n")
+
+
+def signals_with_buses():
+    bus = Signal("BUS", UNDEFINED)
+    data = Signal("DATA_ONLY", DATA)
+    mixed = Signal("MIXED", LOW)
+    for edge in range(1, 200):
+        time = edge * 2.5
+        bus.history.add(time, [DATA, DATA, UNDEFINED, IMPEDANCE][edge % 4])
+        data.history.add(time, DATA)
+        mixed.history.add(time, [HIGH, DATA, LOW, IMPEDANCE][edge % 4])
+    return [bus, data, mixed]
+
+
+def test_write_vectors():
+    signals = signals_with_buses()
+    text = io.StringIO()
+    vcd.write(text, signals)
+    text = text.getvalue()
+    assert "$var string" not in text
+    assert "$var wire 1 ! BUS $end" in text
+    assert "$var wire 1 \" DATA_ONLY $end" in text
+    assert "$var wire 2 # MIXED $end" in text
+    assert "\nbx !\n" in text and "\nbz !\n" in text
+    assert "\nb0 !\n" in text
+    assert "\nb10 #\n" in text and "\nb1 #\n" in text
+    histories = read(text)
+    for signal in signals[:2]:
+        assert histories[signal.name] == list(signal.history)
+    # Vector values other than all x or all z read back as DATA.
+    assert histories["MIXED"] == [
+        (time, state if state in (UNDEFINED, IMPEDANCE) else DATA)
+        for time, state in signals[2].history]
+
+
+def test_write_strings():
+    signals = signals_with_buses()
+    custom = Signal("CUSTOM", "IDLE")
+    custom.history.add(1, "READ BACK")
+    custom.history.add(2, "IDLE")
+    signals.append(custom)
+    text = io.StringIO()
+    vcd.write(text, signals, strings=True)
+    histories = read(text.getvalue())
+    assert histories["MIXED"] == list(signals[2].history)
+    assert histories["CUSTOM"] == [(None, "IDLE"), (1.0, "READ_BACK"),
+                                   (2.0, "IDLE")]
+
+
+def test_round_trip(tmp_path):
+    # On a grid of whole picoseconds the times are exact.
+    signals = tickers()
+    for signal in signals:
+        if "frequency" in signal:
+            del signal["frequency"]
+            signal["period"] = 40
+    sc = collection(signals)
+    sc.run(10**5)
+    path = str(tmp_path / "tickers.vcd")
+    vcd.write(path, sc.all, timescale="10ps")
+    read_back = {signal.name: signal for signal in vcd.read(path)}
+    assert {name: list(signal.history)
+            for name, signal in read_back.items()} == {
+        name: list(signal.history) for name, signal in sc.all.items()}
+    assert all(signal.visible for signal in read_back.values())
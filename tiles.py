@@ -0,0 +1,388 @@
+from array import array
+import copy
+import math
+import os
+import struct
+import zlib
+from concurrent.futures import (ProcessPoolExecutor, FIRST_COMPLETED,
+                                as_completed, wait)
+from contextlib import nullcontext
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from canvas import to_history
+from glyphs import get_label
+from signals.causes import CauseTable
+from signals.history import History
+
+# Tiles handed to each worker ahead of time. Bounds how many tile jobs, and
+# so how many sliced histories, are held in memory at once.
+QUEUE_DEPTH = 4
+# Tiles are mostly background, the fastest zlib level compresses them well.
+COMPRESS_LEVEL = 1
+
+
+class TileRenderer():
+    def __init__(self, canvas, data=None):
+        self.tile_size = 256
+        self.workers = os.cpu_count() or 1
+        self.output = None
+
+        if data:
+            if "tile_size" in data:
+                self.tile_size = data["tile_size"]
+            if "workers" in data:
+                self.workers = data["workers"]
+            if "output" in data:
+                self.output = data["output"]
+
+        if self.tile_size <= 0 or self.tile_size % 16:
+            raise ValueError("Tile size must be a positive multiple of 16.")
+
+        self.first, self.last = canvas._get_range()
+        self.width, self.height = canvas.get_size()
+        self.window = (canvas.window_start is not None or
+                       canvas.window_end is not None)
+
+        self.rows = []
+        start = canvas.start
+        for name, history in canvas.signals:
+            self.rows.append((name, to_history(history), start))
+            start = start + canvas.height + canvas.v_spacing
+        # Cause lines are worked out a tile at a time, from the causes
+        # whose span of time reaches into it, so they are never all held
+        # at once.
+        self.source = canvas
+
+        # Workers only need the drawing settings, not the signals.
+        self.canvas = copy.copy(canvas)
+        self.canvas.signals = []
+        self.canvas.causes = CauseTable()
+        self.canvas.image = None
+        self.canvas.draw = None
+
+        # Anything a transition draws stays within its slopes, so tiles
+        # include the edges this far outside of them.
+        self.margin = 2 * canvas.slope_time + 2
+        # Rows draw their label and lines around their start.
+        self.row_margin = canvas.height + canvas.v_spacing + canvas.font_size
+
+    def save(self, filename=None):
+        if filename is None:
+            filename = self.output
+        if filename is None:
+            raise ValueError("No output file given.")
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == ".dzi":
+            self.save_pyramid(filename)
+        elif extension in (".tif", ".tiff"):
+            self.save_tiff(filename)
+        else:
+            raise ValueError(f"Unsupported tile output '{filename}'.")
+
+    def save_pyramid(self, filename):
+        # Deep Zoom layout: the full resolution image is level `levels`,
+        # every level below halves it until a single pixel remains.
+        base = os.path.splitext(filename)[0] + "_files"
+        levels = math.ceil(math.log2(max(self.width, self.height, 1)))
+        with self._executor() as executor:
+            directory = os.path.join(base, str(levels))
+            os.makedirs(directory, exist_ok=True)
+            jobs = (((column, row), (box, os.path.join(
+                        directory, f"{column}_{row}.png")))
+                    for column, row, box in self._tiles(self.width,
+                                                        self.height))
+            for _ in self._map(executor, _render_tile, jobs):
+                pass
+
+            width, height = self.width, self.height
+            for level in range(levels - 1, -1, -1):
+                source = directory
+                directory = os.path.join(base, str(level))
+                os.makedirs(directory, exist_ok=True)
+                jobs = self._reduce_jobs(source, directory, width, height)
+                for _ in self._map(executor, _reduce_tile, jobs):
+                    pass
+                width = (width + 1) // 2
+                height = (height + 1) // 2
+
+        with open(filename, "w") as dzi_file:
+            dzi_file.write(
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+                f'Format="png" Overlap="0" TileSize="{self.tile_size}">\n'
+                f'  <Size Width="{self.width}" Height="{self.height}"/>\n'
+                '</Image>\n')
+
+    def save_tiff(self, filename):
+        # A tiled TIFF is written tile by tile, so the whole image never
+        # has to be in memory.
+        columns = -(-self.width // self.tile_size)
+        with open(filename, "wb") as tiff_file, self._executor() as executor:
+            writer = _TiffWriter(tiff_file, self.width, self.height,
+                                 self.tile_size)
+            jobs = (((row * columns + column), (box, None))
+                    for column, row, box in self._tiles(self.width,
+                                                        self.height))
+            for index, data in self._map(executor, _render_tile, jobs):
+                writer.write(index, data)
+            writer.close()
+
+    def _tiles(self, width, height):
+        size = self.tile_size
+        for row, y0 in enumerate(range(0, height, size)):
+            for column, x0 in enumerate(range(0, width, size)):
+                yield column, row, (x0, y0, min(x0 + size, width),
+                                    min(y0 + size, height))
+
+    def _job(self, box):
+        x0, y0, x1, y1 = box
+        canvas = self.canvas
+        multiplier = canvas.time_multiplier
+        low = (x0 - canvas.h_spacing - self.margin) / multiplier + self.first
+        high = (x1 - canvas.h_spacing + self.margin) / multiplier + self.first
+
+        rows = []
+        for name, history, start in self.rows:
+            if (start + self.row_margin < y0 or
+                    start - self.row_margin > y1):
+                continue
+            rows.append((name, start) + self._get_tile_history(history, low,
+                                                               high))
+        clip = (x0 - canvas.h_spacing - self.margin,
+                x1 - canvas.h_spacing + self.margin)
+
+        lines = np.array(self.source.get_cause_lines(low, high),
+                         dtype=np.float64).reshape(-1, 4)
+        xs = lines[:, 0::2]
+        ys = lines[:, 1::2]
+        crossing = ((xs.max(1) >= x0 - 1) & (xs.min(1) <= x1 + 1) &
+                    (ys.min(1) <= y1 + 1) & (ys.max(1) >= y0 - 1))
+        lines = (np.trunc(lines[crossing]) - (x0, y0, x0, y0)).tolist()
+        return box, clip, rows, lines
+
+    def _get_tile_history(self, history, low, high):
+        window = (self.first, self.last) if self.window else None
+        return tile_history(history, low, high, window)
+
+    def _reduce_jobs(self, source, directory, width, height):
+        tile_size = self.tile_size
+        for column, row, box in self._tiles((width + 1) // 2,
+                                            (height + 1) // 2):
+            children = []
+            for dy in (0, 1):
+                for dx in (0, 1):
+                    child = (2 * column + dx, 2 * row + dy)
+                    if (child[0] * tile_size < width and
+                            child[1] * tile_size < height):
+                        children.append(((dx * tile_size, dy * tile_size),
+                                         os.path.join(source, "%d_%d.png" %
+                                                      child)))
+            x0, y0, x1, y1 = box
+            size = (min(2 * (x1 - x0), width - 2 * x0),
+                    min(2 * (y1 - y0), height - 2 * y0))
+            target = os.path.join(directory, f"{column}_{row}.png")
+            yield (column, row), (children, size, target)
+
+    def _executor(self):
+        if self.workers <= 1:
+            _init_worker(self.canvas)
+            return nullcontext()
+        return ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                   initargs=(self.canvas,))
+
+    def _map(self, executor, function, jobs):
+        pending = {}
+        limit = self.workers * QUEUE_DEPTH
+        for key, args in jobs:
+            if function is _render_tile:
+                box, target = args
+                args = self._job(box) + (target, self.tile_size)
+            if executor is None:
+                yield key, function(*args)
+                continue
+            if len(pending) >= limit:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future.result()
+            pending[executor.submit(function, *args)] = key
+        for future in as_completed(pending):
+            yield pending[future], future.result()
+
+
+class _TiffWriter():
+    def __init__(self, file, width, height, tile_size):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        count = (-(-width // tile_size)) * (-(-height // tile_size))
+        self.offsets = [0] * count
+        self.counts = [0] * count
+        # Little endian header, the IFD offset is filled in on close.
+        self.file.write(struct.pack("<2sHI", b"II", 42, 0))
+
+    def write(self, index, data):
+        self.offsets[index] = self._tell()
+        self.counts[index] = len(data)
+        self.file.write(data)
+
+    def close(self):
+        bits = self._tell()
+        self.file.write(struct.pack("<3H", 8, 8, 8))
+        offsets = self._tell()
+        self.file.write(struct.pack(f"<{len(self.offsets)}I", *self.offsets))
+        counts = self._tell()
+        self.file.write(struct.pack(f"<{len(self.counts)}I", *self.counts))
+
+        count = len(self.offsets)
+        entries = [
+            (256, 4, 1, self.width),       # ImageWidth
+            (257, 4, 1, self.height),      # ImageLength
+            (258, 3, 3, bits),             # BitsPerSample
+            (259, 3, 1, 8),                # Compression: deflate
+            (262, 3, 1, 2),                # PhotometricInterpretation: RGB
+            (277, 3, 1, 3),                # SamplesPerPixel
+            (284, 3, 1, 1),                # PlanarConfiguration: chunky
+            (322, 4, 1, self.tile_size),   # TileWidth
+            (323, 4, 1, self.tile_size),   # TileLength
+            (324, 4, count, offsets),      # TileOffsets
+            (325, 4, count, counts),       # TileByteCounts
+        ]
+        if count == 1:
+            # A single offset and count fit in the entries themselves.
+            entries[-2] = (324, 4, 1, self.offsets[0])
+            entries[-1] = (325, 4, 1, self.counts[0])
+        ifd = self._tell()
+        self.file.write(struct.pack("<H", len(entries)))
+        for tag, kind, number, value in entries:
+            if kind == 3 and number == 1:
+                self.file.write(struct.pack("<HHIHH", tag, kind, number,
+                                            value, 0))
+            else:
+                self.file.write(struct.pack("<HHII", tag, kind, number,
+                                            value))
+        self.file.write(struct.pack("<I", 0))
+        self.file.seek(4)
+        self.file.write(struct.pack("<I", ifd))
+
+    def _tell(self):
+        position = self.file.tell()
+        if position >= 1 << 32:
+            raise ValueError("Tiled image is too large for a TIFF file.")
+        return position
+
+
+_canvas = None
+
+
+def _init_worker(canvas):
+    global _canvas
+    _canvas = canvas
+
+
+def _render_tile(box, clip, rows, lines, target, tile_size):
+    image = draw_tile(_canvas, box, clip, rows, lines)
+    if target is not None:
+        image.save(target)
+        return None
+    if image.size != (tile_size, tile_size):
+        # TIFF tiles are always full size, edge tiles are padded.
+        tile = Image.new("RGB", (tile_size, tile_size),
+                         color=_canvas.background)
+        tile.paste(image, (0, 0))
+        image = tile
+    return zlib.compress(image.tobytes(), COMPRESS_LEVEL)
+
+
+def draw_tile(canvas, box, clip, rows, lines):
+    # Pillow truncates coordinates towards zero. Shapes are computed at
+    # their place in the full diagram and truncated before moving them into
+    # the tile, so the tile gets the same pixels as the full render.
+    x0, y0, x1, y1 = box
+    base = canvas
+    canvas = copy.copy(canvas)
+    canvas.clip = clip
+    image = Image.new("RGB", (x1 - x0, y1 - y0), color=canvas.background)
+    draw = ImageDraw.Draw(image)
+    offset = np.array((x0, y0), dtype=np.float64)
+    for name, start, history, origin, end in rows:
+        canvas.end = base.end if end is None else end
+        _draw_label(draw, canvas, name, start, x0, y0)
+        polylines, bands = canvas._get_shapes(history, start, origin)
+        for band in bands:
+            draw.rectangle(_translate(band, offset), fill=canvas.foreground)
+        for line in polylines:
+            draw.line(_translate(line, offset), fill=canvas.foreground)
+    for line in lines:
+        draw.line(line, fill=canvas.linecolor)
+    return image
+
+
+def tile_history(history, low, high, window=None):
+    # The transitions between low and high, one more on either side,
+    # and the time of the transition before them as origin. Everything
+    # drawn inside the tile is then the same as in the full diagram.
+    # Unless the last transition is included, the row ends at the last
+    # one taken instead of running on to the end of the diagram.
+    # With a window of (first, last), only the transitions inside it are
+    # taken and times are shifted to start at first.
+    times = np.asarray(history.times)
+    if window is not None:
+        first, last = np.searchsorted(times, window)
+    else:
+        first, last = 0, len(times)
+    begin, stop = np.searchsorted(times, [low, high])
+    begin = int(min(max(begin - 1, first), max(last - 1, first)))
+    stop = int(max(min(stop + 1, last), begin + (last > first)))
+
+    if begin > first:
+        origin = times[begin - 1]
+        initial_state = history.states[history.codes[begin - 1]]
+    else:
+        origin = window[0] if window is not None else 0
+        initial_state = history.initial_state
+        if first:
+            initial_state = history.states[history.codes[first - 1]]
+    sliced = History(initial_state)
+    # Copied out as arrays, as the history may be a mapped file.
+    codes = np.asarray(history.codes)[begin:stop]
+    sliced.codes = array(codes.dtype.char)
+    sliced.codes.frombytes(codes.tobytes())
+    sliced.states = list(history.states)
+    sliced.state_codes = dict(history.state_codes)
+    times = times[begin:stop]
+    if window is not None and window[0]:
+        # Match the shifted times of the full windowed render.
+        times = times - window[0]
+        origin = origin - window[0]
+    sliced.times.frombytes(times.tobytes())
+    end = None
+    if stop < last:
+        end = sliced.times[-1]
+    return sliced, float(origin), end
+
+
+def _translate(coords, offset):
+    coords = np.trunc(np.asarray(coords, dtype=np.float64).reshape(-1, 2))
+    return (coords - offset).ravel().tolist()
+
+
+def _draw_label(draw, canvas, name, start, x0, y0):
+    if x0 > canvas.h_spacing:
+        # Labels end at h_spacing.
+        return
+    x, y = canvas._get_label(name, start)
+    left, top = int(x), int(y)
+    mask, (dx, dy) = get_label(name, canvas.font_file, canvas.font_size,
+                               (x - left, y - top))
+    draw.bitmap((left + dx - x0, top + dy - y0), mask, fill=canvas.foreground)
+
+
+def _reduce_tile(children, size, target):
+    image = Image.new("RGB", size)
+    for position, path in children:
+        with Image.open(path) as child:
+            image.paste(child, position)
+    image.reduce(2).save(target)